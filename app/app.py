@@ -10,10 +10,20 @@ import plotly.figure_factory as ff
 import pandas as pd
 import numpy as np
 import datetime
-import base64
-import urllib.request
-import os
-import stylecloud
+import flask
+import functools
+
+import store
+import rollups
+import range_index
+import dayframe
+from dayframe import DayFrame
+import topk
+from cache import CallbackCache
+from images import ImageCache
+import terms
+import moments
+import wordclouds
 
 
 #####   source dashboard: https://github.com/plotly/dash-sample-apps/blob/master/apps/dash-manufacture-spc-dashboard/app.py
@@ -126,8 +136,44 @@ def generate_modal():
 
 
 ####### Reading in Data
-# reads dataframe
-df = pd.read_pickle('data/final.pkl')
+# columnar store (see store.py), built from data/final.pkl the first time
+STORE_DIR = 'data/store'
+store.ensure_store(STORE_DIR, 'data/final.pkl')
+
+# columns used by the charts, the word cloud text and the view gains are read on demand
+DASHBOARD_COLUMNS = ['video_id', 'title', 'publishedAt', 'channelTitle', 'categoryIdName', 'trending_date',
+                     'view_count', 'likes', 'dislikes', 'comment_count', 'thumbnail_link', 'rank', 'avatar_url',
+                     'channel_type', 'curr_subs', 'country', 'rank_y', 'publish_cat', 'curr_subs_num']
+manifest = store.read_manifest(STORE_DIR)
+DATA_VERSION = manifest['version']
+# memory-mapped rows of the store, the pandas frame below only builds the indexes at startup
+table = store.read_videos_table(STORE_DIR, DASHBOARD_COLUMNS, days=manifest['days'])
+df = store.to_frame(table)
+
+# callback outputs shared by all workers, keyed by the dataset version (see cache.py)
+cache = CallbackCache('data/cache', DATA_VERSION)
+
+# per day aggregates behind the daily tab (see rollups.py)
+rollups.ensure_rollups(STORE_DIR)
+daily = rollups.DailyRollups(STORE_DIR)
+
+# thumbnails and avatars served from data/images (see images.py), the daily tables downloaded in the background
+images = ImageCache('data/images', 'data/test.jpg')
+images.register(server)
+images.add_urls(df['avatar_url'].astype(object))
+images.prefetch(daily.tables['top_rank']['thumbnail_link'])
+images.prefetch(daily.tables['channels']['avatar_url'])
+
+# day x term counts of title / desc / tags (see terms.py), word cloud images rendered in the background (see wordclouds.py)
+terms.ensure_terms(STORE_DIR)
+term_index = terms.TermIndex(STORE_DIR)
+TOP_TERMS = 20
+word_clouds = wordclouds.WordCloudRenderer('data/wordclouds', DATA_VERSION)
+word_clouds.register(server)
+
+# per day moments of the numeric columns behind the correlation chart (see moments.py)
+moments.ensure_moments(STORE_DIR)
+moment_index = moments.MomentIndex(STORE_DIR)
 
 # list of all possible dates
 date_list = np.unique(df['trending_date'])
@@ -142,14 +188,100 @@ for ind, elem in enumerate(date_list):
     temp['style'] = {'color': '#ffffff'}
     slider_marks[ind] = temp
 
-# no duplicates and keeps only the first occurance of trending (for publish date, etc)
-no_dups_f = df.sort_values('trending_date', ascending = True)
-no_dups_f = no_dups_f.drop_duplicates(subset='video_id', keep='first')
+# rows sorted by trending date with the row offset of every day, date filters are slices, and the
+# previous / next trending day of every row kept in the store by ingest.py (see dayframe.py)
+dayframe.ensure_occurrences(STORE_DIR)
+videos = DayFrame(df, date_list, dayframe.read_occurrences(STORE_DIR))
+df = videos.frame
 
-# no duplicates and keeps last occurance for views, comments, etc
-no_dups_l = df.sort_values('trending_date', ascending = True)
-no_dups_l = no_dups_l.drop_duplicates(subset='video_id', keep='last')  
+# no duplicates and keeps only the first occurance of trending (for publish date, etc)
+first_videos = DayFrame(df[videos.occurrences.prev_day == -1], date_list)
+no_dups_f = first_videos.frame
+
+# top 5 categories over all unique videos (for publish hour charts)
+top_5_categories = no_dups_f.groupby(['categoryIdName'], observed=True).agg('count')['title'].reset_index()
+top_5_categories = top_5_categories.sort_values('title', ascending = False)
+top_5_categories = top_5_categories['categoryIdName'].values[:5]
+
+# cumulative per day counts behind the weekly tab (see range_index.py)
+df_days = videos.day_codes()
+first_days = first_videos.day_codes()
+# videos ordered by views / likes / comments within every day, top k of any range (see topk.py),
+# the top rows are read from the memory-mapped table (stored in trending date order like videos.frame)
+top_videos = topk.TopK(videos, ['view_count', 'likes', 'comment_count'],
+                       table.select(['title', 'view_count', 'likes', 'comment_count']))
+day_positions = {day: ind for ind, day in enumerate(date_list_formatted)}
+
+weekly_categories = range_index.PrefixCounts(first_days, no_dups_f, ['categoryIdName'], len(date_list))
+weekly_publish_days = range_index.PrefixCounts(first_days, no_dups_f['publishedAt'].dt.floor('D').to_frame(), ['publishedAt'], len(date_list))
+weekly_publish_hours = range_index.PrefixCounts(first_days, no_dups_f, ['publish_cat', 'categoryIdName'], len(date_list))
+weekly_channels = range_index.PrefixCounts(df_days, df, ['channelTitle', 'avatar_url', 'channel_type','curr_subs'], len(date_list))
+weekly_countries = range_index.UniqueCounts(df_days, videos.occurrences.next_day, df, ['country'], len(date_list))
+weekly_sb_ranks = range_index.UniqueCounts(df_days, videos.occurrences.next_day, df, ['rank_y', 'channel_type'], len(date_list))
+
+# the callbacks only read the indexes above, release the pandas frames of the rows
+del df, videos, first_videos, no_dups_f, table
    
+# channel views do not depend on the date range, the figure is built once for the layout
+@functools.lru_cache(maxsize=1)
+def channel_views_figure():
+    # long table of channelTitle, date, views -> one column per channel
+    gains = store.read_view_gains(STORE_DIR)
+    final = gains.pivot(index = 'date', columns = 'channelTitle', values = 'views')
+    final = final.sort_index()
+    final = final.iloc[9:-1,:]
+    final = final.sort_index(axis = 1)
+    final.index = pd.to_datetime(final.index, format='%Y-%m-%d')
+    
+    # create the line chart
+    fig = go.Figure()
+
+    for column in final.columns.to_list():
+        fig.add_trace(
+            go.Scatter(
+                x = final.index,
+                y = final[column],
+                name = column
+            )
+        )
+    
+    # set only one line to be visible at all time
+    buttons = []
+    for ind, column in enumerate(final.columns.to_list()):
+        temp = {}
+        default_visible = [False] * len(final.columns)
+        default_visible[ind] = True
+        temp['label'] = column
+        temp['method'] = 'update'
+        temp['args'] = [{'visible': default_visible,
+                         'title': column,
+                          'showlegend': True}]
+        buttons.append(temp)
+
+    # add dropdown menu
+    fig.update_layout(
+        updatemenus=[go.layout.Updatemenu(
+            bgcolor = '#e7dff0',
+            active = 99,
+            bordercolor = '#FFFFFF',
+            font = dict(size=11, color='#000000'),
+            buttons=buttons,
+            showactive=False,
+            x=0.1,
+            xanchor="left",
+            y=1.1,
+            yanchor="top",
+            ),
+        ])  
+    
+    # add formatting
+    fig.update_layout(xaxis_title = 'Date', yaxis_title = 'Channel Video Views')
+    fig.update_layout(paper_bgcolor='#161a28', plot_bgcolor='#161a28', font_color = '#ffffff', autosize=True, 
+               margin=dict(l=10, r=10, t=10, b=10), showlegend = False, yaxis_showgrid=False, xaxis_showgrid = False)  #can add transition duration here
+               
+    return fig
+
+
 ########## Main App Layout
 app.layout = html.Div(
     id="big-app-container",
@@ -189,6 +321,14 @@ def render_tab_content(tab_switch):
                                 options=[{'label': elem, 'value': date_list[ind]} for ind, elem in enumerate(date_list_formatted)],
                                 value = date_list[0])],
                                 style={'marginTop': '3rem'}),
+                            html.Label(id="top_k_daily_label", className='col-sm-12 col-lg-2', children="Top Videos: ", style={'marginLeft': '5rem', 'marginTop': '3rem'}),
+                            html.Div(className = 'col-sm-12 col-md-3 col-lg-1', children =[ 
+                                dcc.Dropdown(
+                                id='top_k_daily',
+                                options=[{'label': str(k), 'value': k} for k in topk.K_OPTIONS],
+                                value = 10,
+                                clearable = False)],
+                                style={'marginTop': '3rem'}),
                         ], className = 'row'),
                         
                         html.Br(),
@@ -274,6 +414,9 @@ def render_tab_content(tab_switch):
         return [html.Div(
                     id="tab2-container",
                     children=[
+                        # range of the weekly summary the charts are drawn from, the whole range on first load
+                        dcc.Store(id='weekly_summary', data=WEEKLY_DEFAULT),
+                        
                         # Tab 2 date slider
                         html.Div([
                             html.Label(id="date_range_label", className='col-sm-12', children="Select Date Range: ", style={'marginLeft': '5rem', 'marginTop': '3rem'}),
@@ -287,6 +430,17 @@ def render_tab_content(tab_switch):
                                 marks=slider_marks,
                             )]),
                         
+                        html.Div(children = [
+                            html.Label(id="top_k_weekly_label", className='col-sm-12 col-lg-2', children="Top Videos: ", style={'marginLeft': '5rem', 'marginTop': '1rem'}),
+                            html.Div(className = 'col-sm-12 col-md-3 col-lg-1', children =[ 
+                                dcc.Dropdown(
+                                id='top_k_weekly',
+                                options=[{'label': str(k), 'value': k} for k in topk.K_OPTIONS],
+                                value = 10,
+                                clearable = False)],
+                                style={'marginTop': '1rem'}),
+                        ], className = 'row'),
+                        
                         html.Br(),
                         
                         # Tab 2 first row
@@ -334,8 +488,26 @@ def render_tab_content(tab_switch):
                             # wordcloud row
                             html.Div(className = 'col-lg-12',
                                 children = [
-                                    html.Div(className="section-banner", children='Word Cloud [Title, Desc, Tags] ..... (Might take several minutes to load)'),
-                                    html.Div(id='word_cloud_title')
+                                    html.Div(className="section-banner", children='Word Cloud [Title, Desc, Tags]'),
+                                    html.Div(id='word_cloud_title'),
+                                    dcc.Interval(id='word_cloud_interval', interval=2000, disabled=True)
+                            ])
+                        ], className = 'row'),
+                        
+                        html.Br(),
+                        
+                        # Tab 2 top terms row
+                        html.Div(children=[
+                            html.Div(className = 'col-lg-12',
+                                children = [
+                                    html.Div(className="section-banner", children='Top Terms of Unique Trending Videos'),
+                                    dcc.RadioItems(
+                                        id='top_terms_field',
+                                        options=[{'label': 'Title', 'value': 'title'}, {'label': 'Description', 'value': 'desc'},
+                                                 {'label': 'Tags', 'value': 'tags'}],
+                                        value='title',
+                                        labelStyle={'display': 'inline-block', 'marginRight': '1rem', 'color': '#ffffff'}),
+                                    dcc.Graph(id='top_terms_weekly')
                             ])
                         ], className = 'row'),
                         
@@ -385,7 +557,7 @@ def render_tab_content(tab_switch):
                             html.Div(className="col-sm-12 col-lg-6",
                                 children = [
                                     html.Div(className="section-banner", children='Channel Views within the past 2 weeks'),
-                                    dcc.Graph(id='channel_views_past_weekly')
+                                    dcc.Graph(id='channel_views_past_weekly', figure=channel_views_figure())
                             ]),
                         ], className = 'row'),
                     ])            
@@ -410,16 +582,73 @@ def update_click_output(button_click, close_click):
 
 
 # ========= Weekly callbacks =================
+###################### Weekly summary
+# every aggregate of the weekly charts is computed once per date range (and top k) and kept in
+# the callback cache; the slider only updates the range in weekly_summary and the charts read it
+WEEKLY_DEFAULT = {'start': 0, 'end': len(date_list) - 1, 'k': 10}
+
+def to_lists(frame):
+    # json friendly columns, so cached summaries read back from disk are the same
+    return {col: frame[col].tolist() for col in frame.columns}
+
+@cache.memoize
+def weekly_summary(start, end, k):
+    '''
+    Aggregates of every weekly chart over the days start to end, json lists (same from memory or disk)
+    :param k: int: number of top videos per metric
+    '''
+    summary = {}
+    summary['categories'] = to_lists(weekly_categories.counts(start, end))
+    
+    # correlation of unique videos from the moments of their first trending days, nan as None
+    corr = moment_index.corr(date_list_formatted[start:end + 1])
+    summary['corr'] = [[None if np.isnan(x) else x for x in row] for row in corr.values.tolist()]
+    
+    summary['top'] = {metric: to_lists(top_videos.frame(metric, start, end, k)[[metric, 'title']])
+                      for metric in ['view_count', 'likes', 'comment_count']}
+    
+    temp = weekly_publish_days.counts(start, end)
+    summary['publish_days'] = {'publishedAt': [elem.isoformat() for elem in temp['publishedAt']], 'count': temp['count'].tolist()}
+    
+    summary['publish_hours'] = to_lists(weekly_publish_hours.counts(start, end))
+    
+    temp = weekly_channels.counts(start, end)
+    temp = temp.sort_values('count', ascending = False)[:10]
+    summary['channels'] = to_lists(temp)
+    
+    summary['countries'] = to_lists(weekly_countries.counts(start, end))
+    summary['sb_ranks'] = to_lists(weekly_sb_ranks.counts(start, end))
+    return summary
+
+def summary_for(data):
+    '''
+    :param data: dict: start, end and k of the weekly_summary store
+    '''
+    return weekly_summary(data['start'], data['end'], data['k'])
+
+
+@app.callback(
+    Output('weekly_summary', 'data'),
+    [Input('date_slider', 'value'),
+     Input('top_k_weekly', 'value')])
+    
+def update_weekly_summary(value = [0, len(date_list) - 1], k = 10): 
+    # computed here once, the charts below get it from the cache
+    weekly_summary(value[0], value[1], k)
+    return {'start': value[0], 'end': value[1], 'k': k}
+
+
 ###################### Tab 2 Row 1 Charts
 @app.callback(
     Output('categories_graph_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_category_bar_weekly(value = [0, len(date_list) - 1]): 
-    # filter date
-    filtered_df = no_dups_f[(no_dups_f['trending_date'] >= date_list[value[0]]) & (no_dups_f['trending_date'] <= date_list[value[1]])]
-    
-    temp = filtered_df['categoryIdName'].value_counts().reset_index()
+    [Input('weekly_summary', 'data')])
+    
+@cache.memoize
+def update_category_bar_weekly(data = WEEKLY_DEFAULT): 
+    # unique videos by category in the date range
+    temp = pd.DataFrame(summary_for(data)['categories'])
+    temp = temp.sort_values('count', ascending = False)
+    temp.columns = ['index', 'categoryIdName']
     fig = px.bar(temp, x="index", y="categoryIdName", text='categoryIdName', labels={'index': 'Categories', 'categoryIdName': 'Count of Videos'})
     fig.update_traces(texttemplate='%{text:.0d}', textposition='inside')  #can add textposition here (inside/outside)
     fig.update_layout(paper_bgcolor='#161a28', plot_bgcolor='#161a28', font_color = '#ffffff', autosize=True, 
@@ -430,14 +659,12 @@ def update_category_bar_weekly(value = [0, len(date_list) - 1]):
 
 @app.callback(
     Output('correlation_variables_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_corr_weekly(value = [0, len(date_list) - 1]):
-    # filter date
-    filtered_df = no_dups_f[(no_dups_f['trending_date'] >= date_list[value[0]]) & (no_dups_f['trending_date'] <= date_list[value[1]])]
+    [Input('weekly_summary', 'data')])
     
-    # make correlation df and round to 2 decimals
-    filtered_df = filtered_df[['view_count', 'likes', 'dislikes', 'comment_count', 'rank', 'curr_subs_num']].corr()
+@cache.memoize
+def update_corr_weekly(data = WEEKLY_DEFAULT):
+    # correlation df of the unique videos, round to 2 decimals
+    filtered_df = pd.DataFrame(np.array(summary_for(data)['corr'], dtype=float), index = moments.COLUMNS, columns = moments.COLUMNS)
     curr_cols = list(filtered_df.columns)
     filtered_df = filtered_df[curr_cols[::-1]]
     filtered_df = np.around(filtered_df, 2)
@@ -456,17 +683,12 @@ def update_corr_weekly(value = [0, len(date_list) - 1]):
 ############### Tab 2 Row 2 Charts
 @app.callback(
     Output('most_viewed_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_viewed_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = df[(df['trending_date'] >= date_list[value[0]]) & (df['trending_date'] <= date_list[value[1]])]
-    
-    # no duplicates and keeps last occurance for views, comments, etc
-    filtered_df = filtered_df.sort_values('trending_date', ascending = True)
-    filtered_df = filtered_df.drop_duplicates(subset='video_id', keep='last')
+    [Input('weekly_summary', 'data')])
     
-    filtered_df = filtered_df.sort_values('view_count', ascending = True)
-    filtered_df = filtered_df[-10:]
+@cache.memoize
+def update_viewed_weekly(data = WEEKLY_DEFAULT): 
+    # top k of the last occurance of every video, in ascending order
+    filtered_df = pd.DataFrame(summary_for(data)['top']['view_count'])
     
     def shorten_title(x, num_chars):
         if len(x) < num_chars:
@@ -492,17 +714,12 @@ def update_viewed_weekly(value = [0, len(date_list) - 1]):
     
 @app.callback(
     Output('most_liked_weekly', 'figure'),
-    [Input('date_slider', 'value')])
+    [Input('weekly_summary', 'data')])
     
-def update_liked_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = df[(df['trending_date'] >= date_list[value[0]]) & (df['trending_date'] <= date_list[value[1]])]
-    
-    # no duplicates and keeps last occurance for views, comments, etc
-    filtered_df = filtered_df.sort_values('trending_date', ascending = True)
-    filtered_df = filtered_df.drop_duplicates(subset='video_id', keep='last')
-    
-    filtered_df = filtered_df.sort_values('likes', ascending = True)
-    filtered_df = filtered_df[-10:]
+@cache.memoize
+def update_liked_weekly(data = WEEKLY_DEFAULT): 
+    # top k of the last occurance of every video, in ascending order
+    filtered_df = pd.DataFrame(summary_for(data)['top']['likes'])
     
     def shorten_title(x, num_chars):
         if len(x) < num_chars:
@@ -528,17 +745,12 @@ def update_liked_weekly(value = [0, len(date_list) - 1]):
 
 @app.callback(
     Output('most_comment_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_comment_weekly(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] >= date_list[value[0]]) & (df['trending_date'] <= date_list[value[1]])]
+    [Input('weekly_summary', 'data')])
     
-    # no duplicates and keeps last occurance for views, comments, etc
-    filtered_df = filtered_df.sort_values('trending_date', ascending = True)
-    filtered_df = filtered_df.drop_duplicates(subset='video_id', keep='last')
-    
-    filtered_df = filtered_df.sort_values('comment_count', ascending = True)
-    filtered_df = filtered_df[-10:]
+@cache.memoize
+def update_comment_weekly(data = WEEKLY_DEFAULT): 
+    # top k of the last occurance of every video, in ascending order
+    filtered_df = pd.DataFrame(summary_for(data)['top']['comment_count'])
     
     def shorten_title(x, num_chars):
         if len(x) < num_chars:
@@ -571,64 +783,77 @@ def update_comment_weekly(value = date_list[0]):
 
     
 ################# Tab 2 Row 3 Charts    
-def return_html_image(filepath):
-    currfile = open(filepath, 'rb')
-    encoded_image = base64.b64encode(currfile.read())
-    decoded_image = html.Img(src='data:image/jpg;base64,{}'.format(encoded_image.decode()), id='word_cloud_title_img')
-    currfile.close()
-    return html.Div(children=decoded_image)
-
 @app.callback(
-    Output('word_cloud_title', 'children'),
-    [Input('date_slider', 'value')])
-    
-def update_word_cloud_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = no_dups_f[(no_dups_f['trending_date'] >= date_list[value[0]]) & (no_dups_f['trending_date'] <= date_list[value[1]])]
-    
-    # process title
-    filtered_df['cleaned_text'] = filtered_df['title_cleaned'].apply(lambda x: ' '.join(x))
-    long_string = ','.join(list(filtered_df['cleaned_text'].values))
-    stylecloud.gen_stylecloud(text=long_string, icon_name='fab fa-youtube', max_words=200, 
-                              palette='cartocolors.diverging.TealRose_7', background_color="black", 
-                              output_name='data/100.jpg')
-    
-    # process description
-    filtered_df['cleaned_text'] = filtered_df['desc_cleaned'].apply(lambda x: ' '.join(x))
-    long_string = ','.join(list(filtered_df['cleaned_text'].values))
-    stylecloud.gen_stylecloud(text=long_string, icon_name='fab fa-youtube', max_words=200, 
-                              palette='cartocolors.diverging.TealRose_7', background_color="black", 
-                              output_name='data/101.jpg')
-    
-    # process tags
-    def tags_split(x):
-        if x == '[none]':
-            return []
+    [Output('word_cloud_title', 'children'),
+     Output('word_cloud_interval', 'disabled')],
+    [Input('date_slider', 'value'),
+     Input('word_cloud_interval', 'n_intervals')])
+    
+def update_word_cloud_weekly(value = [0, len(date_list) - 1], n_intervals = 0): 
+    # images are rendered in the background, the interval polls until all three are ready
+    days = date_list_formatted[value[0]:value[1] + 1]
+    children = []
+    rendering = False
+    for field in ['title', 'desc', 'tags']:
+        state, src = word_clouds.src(field, days, lambda: term_index.top(field, days, wordclouds.MAX_WORDS))
+        if state == 'ready':
+            children.append(html.Div(children=html.Img(src=src, id='word_cloud_title_img')))
+        elif state == 'pending':
+            children.append(html.Div(children='Rendering word cloud...'))
+            rendering = True
         else:
-            return x.split('|')
+            # 'empty', the range has no words
+            children.append(html.Div(children='No words in the selected dates'))
     
-    filtered_df['tags_split'] = filtered_df['tags'].apply(lambda x: tags_split(x))
-    filtered_df['cleaned_text'] = filtered_df['tags_split'].apply(lambda x: ' '.join(x))
-    long_string = ','.join(list(filtered_df['cleaned_text'].values))
-    stylecloud.gen_stylecloud(text=long_string, icon_name='fas fa-hashtag', max_words=200, 
-                              palette='cartocolors.diverging.TealRose_7', background_color="black", 
-                              output_name='data/102.jpg')
+    return children, not rendering
+
+
+@app.callback(
+    Output('top_terms_weekly', 'figure'),
+    [Input('date_slider', 'value'),
+     Input('top_terms_field', 'value')])
     
-    final = return_html_image('data/100.jpg')
-    final2 = return_html_image('data/101.jpg')
-    final3 = return_html_image('data/102.jpg')
+@cache.memoize
+def update_top_terms_weekly(value = [0, len(date_list) - 1], field = 'title'): 
+    top = term_index.top(field, date_list_formatted[value[0]:value[1] + 1], TOP_TERMS)
+    filtered_df = pd.DataFrame({'term': list(top.keys()), 'count': list(top.values())})
+    filtered_df = filtered_df.sort_values('count', ascending = True)
     
-    return [final, final2, final3]
+    fig = px.bar(filtered_df, x="count", y="term", text='count', orientation='h', labels={'count': 'Count of Words', 'term': ''})
+    fig.update_traces(texttemplate='%{text:.0d}', textposition='inside')
+    fig.update_layout(paper_bgcolor='#161a28', plot_bgcolor='#161a28', font_color = '#ffffff', autosize=True, 
+                      margin=dict(l=10, r=10, t=10, b=10), xaxis_showgrid=False) #can add transition duration here
+    return fig
+
+
+###### Top terms API: /api/top_terms?field=title&start=2020-07-08&end=2020-07-14&n=20
+@server.route('/api/top_terms')
+def api_top_terms():
+    field = flask.request.args.get('field', 'title')
+    if field not in terms.FIELDS:
+        return flask.jsonify({'error': 'field must be one of ' + ', '.join(terms.FIELDS)}), 400
+    start = flask.request.args.get('start', date_list_formatted[0])
+    end = flask.request.args.get('end', date_list_formatted[-1])
+    n = flask.request.args.get('n', TOP_TERMS, type=int)
+    days = [day for day in date_list_formatted if start <= day <= end]
+    top = term_index.top(field, days, max(0, min(n, wordclouds.MAX_WORDS)))
+    return flask.jsonify({'field': field, 'start': start, 'end': end,
+                          'terms': [{'term': term, 'count': count} for term, count in top.items()]})
 
 
 
 ########## Tab 2 Row 4 Charts
 @app.callback(
     Output('trending_video_publish_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_publish_day_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = no_dups_f[(no_dups_f['trending_date'] >= date_list[value[0]]) & (no_dups_f['trending_date'] <= date_list[value[1]])]
-    filtered_df = filtered_df.resample('D', on='publishedAt').count()['video_id'].reset_index()
+    [Input('weekly_summary', 'data')])
+    
+@cache.memoize
+def update_publish_day_weekly(data = WEEKLY_DEFAULT): 
+    filtered_df = pd.DataFrame(summary_for(data)['publish_days'])
+    filtered_df['publishedAt'] = pd.to_datetime(filtered_df['publishedAt'])
+    # daily bins from the first to the last publish day, like resample
+    filtered_df = filtered_df.set_index('publishedAt')['count']
+    filtered_df = filtered_df.reindex(pd.date_range(filtered_df.index[0], filtered_df.index[-1], freq='D', name='publishedAt'), fill_value=0).reset_index()
     filtered_df.columns = ['Published Day', 'Count of Videos']
     filtered_df['color'] = '#636EFB'
     filtered_df.iloc[-1,2] = 'Yellow'
@@ -643,11 +868,10 @@ def update_publish_day_weekly(value = [0, len(date_list) - 1]):
 
 @app.callback(
     Output('published_hour_weekly', 'figure'),
-    [Input('date_slider', 'value')])
+    [Input('weekly_summary', 'data')])
     
-def update_publish_hour_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = no_dups_f[(no_dups_f['trending_date'] >= date_list[value[0]]) & (no_dups_f['trending_date'] <= date_list[value[1]])]
-        
+@cache.memoize
+def update_publish_hour_weekly(data = WEEKLY_DEFAULT): 
     def create_bins():
         ans = []
         for i in range(24):
@@ -659,11 +883,9 @@ def update_publish_hour_weekly(value = [0, len(date_list) - 1]):
     count_bins = pd.DataFrame()
     count_bins['bins'] = bins
 
-    temp = filtered_df.groupby(['publish_cat', 'categoryIdName']).agg('count')['title'].reset_index()
+    temp = pd.DataFrame(summary_for(data)['publish_hours']).rename(columns={'count': 'title'})
     # filter only top5 categories for the day
-    top_5 = no_dups_f.groupby(['categoryIdName']).agg('count')['title'].reset_index()
-    top_5 = top_5.sort_values('title', ascending = False)
-    top_5 = top_5['categoryIdName'].values[:5]
+    top_5 = top_5_categories
     
     def map_others(x):
         if x not in top_5:
@@ -705,27 +927,15 @@ def update_publish_hour_weekly(value = [0, len(date_list) - 1]):
 ###################### Tab 2 Row 5 Charts
 @app.callback(
     Output('top_channel_weekly', 'children'),
-    [Input('date_slider', 'value')])
+    [Input('weekly_summary', 'data')])
     
-def update_channel_table_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = df[(df['trending_date'] >= date_list[value[0]]) & (df['trending_date'] <= date_list[value[1]])]
-        
-    filtered_df = filtered_df.groupby(['channelTitle', 'avatar_url', 'channel_type','curr_subs']).agg('count')['video_id'].reset_index()
-    filtered_df = filtered_df.sort_values('video_id', ascending = False)
-    filtered_df = filtered_df[:10]
-    
-    images_decoded_list = [] 
-    # decode image to HTML to show in table
-    for idx, elem in enumerate(filtered_df['avatar_url'].values):
-        if elem != '':
-            urllib.request.urlretrieve(elem, 'data/' + str(idx) + '.jpg')
-            image_filename = 'data/' + str(idx) + '.jpg' # replace with your own image
-        else:
-            image_filename = 'data/test.jpg' # replace with your own image
-            
-        encoded_image = base64.b64encode(open(image_filename, 'rb').read())
-        decoded_image = html.Img(src='data:image/jpg;base64,{}'.format(encoded_image.decode()))
-        images_decoded_list.append(decoded_image)
+@cache.memoize
+def update_channel_table_weekly(data = WEEKLY_DEFAULT): 
+    # top 10 channels by trending count
+    filtered_df = pd.DataFrame(summary_for(data)['channels']).rename(columns={'count': 'video_id'})
+    
+    # cached avatar urls to show in table
+    images_decoded_list = [html.Img(src=images.src(elem)) for elem in filtered_df['avatar_url'].values]
     
     filtered_df['images'] = images_decoded_list    
     filtered_df.drop(['avatar_url'], axis = 1, inplace = True)
@@ -736,21 +946,18 @@ def update_channel_table_weekly(value = [0, len(date_list) - 1]):
 
 @app.callback(
     Output('country_origin_channel_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_channel_origin_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = df[(df['trending_date'] >= date_list[value[0]]) & (df['trending_date'] <= date_list[value[1]])]
-    
-    filtered_df = filtered_df.sort_values('trending_date', ascending = True)
-    filtered_df = filtered_df.drop_duplicates(subset='video_id', keep = 'last')
+    [Input('weekly_summary', 'data')])
     
+@cache.memoize
+def update_channel_origin_weekly(data = WEEKLY_DEFAULT): 
     # map into 3 letters iso-alpha code
     code_mapping = {'AU': 'AUS', 'CN': 'CHN', 'DE': 'DEU', 'ES': 'ESP', 'GB': 'GBR','GH': 'GHA','ID': 'IDN', 'IE': 'IRL', 'IN': 'IND', 'IT': 'ITA',
                     'JP': 'JPN', 'KR': 'KOR', 'MY': 'MYS', 'RU': 'RUS', 'US': 'USA', 'VN': 'VNM'}
     
-    filtered_df = filtered_df.groupby(['country']).agg('count')['video_id'].reset_index()
+    # unique videos by channel country in the date range
+    filtered_df = pd.DataFrame(summary_for(data)['countries'])
     filtered_df = filtered_df[filtered_df['country'] != '']
-    filtered_df['iso_alpha'] = filtered_df['country'].apply(lambda x: code_mapping[x])
+    filtered_df['iso_alpha'] = filtered_df['country'].map(code_mapping)
     filtered_df.columns = ['country', 'count_of_videos', 'iso_alpha']
     
     # create chloropleth map
@@ -768,16 +975,12 @@ def update_channel_origin_weekly(value = [0, len(date_list) - 1]):
 ####################### Tab 2 Row 6 Charts
 @app.callback(
     Output('sb_rank_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_sb_rank_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = df[(df['trending_date'] >= date_list[value[0]]) & (df['trending_date'] <= date_list[value[1]])]
-    
-    # drop duplicates
-    filtered_df = filtered_df.sort_values('trending_date', ascending = True)
-    filtered_df = filtered_df.drop_duplicates(subset='video_id', keep='last')
+    [Input('weekly_summary', 'data')])
     
-    filtered_df = filtered_df.groupby(['rank_y', 'channel_type']).agg('count')['video_id'].reset_index()
+@cache.memoize
+def update_sb_rank_weekly(data = WEEKLY_DEFAULT): 
+    # unique videos by social blade rank and channel type in the date range
+    filtered_df = pd.DataFrame(summary_for(data)['sb_ranks']).rename(columns={'count': 'video_id'})
     filtered_df.sort_values('video_id', inplace = True, ascending = False)
     def replace_empty(x):
         if x == '':
@@ -789,7 +992,7 @@ def update_sb_rank_weekly(value = [0, len(date_list) - 1]):
     filtered_df['video_id'] = filtered_df['video_id'].astype(int)
     
     # take top 5 category
-    top_5 = filtered_df.groupby(['channel_type']).agg('sum')['video_id'].reset_index()
+    top_5 = filtered_df.groupby(['channel_type'], observed=True).agg('sum')['video_id'].reset_index()
     top_5 = top_5.sort_values(by='video_id', ascending = False)
     top_5 = top_5['channel_type'].values[:5]
 
@@ -805,7 +1008,7 @@ def update_sb_rank_weekly(value = [0, len(date_list) - 1]):
     filtered_df = filtered_df.pivot(index = 'channel_type', columns = 'rank_y', values = 'video_id').reset_index()
     filtered_df = filtered_df.fillna(0)
     all_ranks = ['channel_type', 'A++', 'A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'D-', 'N/A']
-    filtered_df = filtered_df[all_ranks]
+    filtered_df = filtered_df.reindex(columns = all_ranks, fill_value = 0)
     
     # create stacked bar chart
     stacked_data = []
@@ -822,71 +1025,6 @@ def update_sb_rank_weekly(value = [0, len(date_list) - 1]):
     return fig
 
 
-@app.callback(
-    Output('channel_views_past_weekly', 'figure'),
-    [Input('date_slider', 'value')])
-    
-def update_channel_views_weekly(value = [0, len(date_list) - 1]): 
-    filtered_df = df.copy()
-    filtered_df = filtered_df[['channelTitle', 'past_view_gains']]
-        
-    temp = filtered_df['past_view_gains'].apply(pd.Series)
-    temp = temp.iloc[:,9:-1]
-    final = filtered_df.join(temp, how = 'left')
-    final = final.drop_duplicates(subset = 'channelTitle', keep='last')
-    final = final.sort_values('channelTitle', ascending = True)
-    final = final.T
-    final.columns = final.iloc[0,:]
-    final = final.iloc[2:,:]
-    final.index = pd.to_datetime(final.index, format='%Y-%m-%d')
-    
-    # create the line chart
-    fig = go.Figure()
-
-    for column in final.columns.to_list():
-        fig.add_trace(
-            go.Scatter(
-                x = final.index,
-                y = final[column],
-                name = column
-            )
-        )
-    
-    # set only one line to be visible at all time
-    buttons = []
-    for ind, column in enumerate(final.columns.to_list()):
-        temp = {}
-        default_visible = [False] * len(final.columns)
-        default_visible[ind] = True
-        temp['label'] = column
-        temp['method'] = 'update'
-        temp['args'] = [{'visible': default_visible,
-                         'title': column,
-                          'showlegend': True}]
-        buttons.append(temp)
-
-    # add dropdown menu
-    fig.update_layout(
-        updatemenus=[go.layout.Updatemenu(
-            bgcolor = '#e7dff0',
-            active = 99,
-            bordercolor = '#FFFFFF',
-            font = dict(size=11, color='#000000'),
-            buttons=buttons,
-            showactive=False,
-            x=0.1,
-            xanchor="left",
-            y=1.1,
-            yanchor="top",
-            ),
-        ])  
-    
-    # add formatting
-    fig.update_layout(xaxis_title = 'Date', yaxis_title = 'Channel Video Views')
-    fig.update_layout(paper_bgcolor='#161a28', plot_bgcolor='#161a28', font_color = '#ffffff', autosize=True, 
-               margin=dict(l=10, r=10, t=10, b=10), showlegend = False, yaxis_showgrid=False, xaxis_showgrid = False)  #can add transition duration here
-               
-    return fig
 
 
 
@@ -897,10 +1035,10 @@ def update_channel_views_weekly(value = [0, len(date_list) - 1]):
     Output('categories_graph_daily', 'figure'),
     [Input('date_selector', 'value')])
     
+@cache.memoize
 def update_category_bar_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
-    
-    temp = filtered_df['categoryIdName'].value_counts().reset_index()
+    temp = daily.get('categories', value)
+    temp.columns = ['index', 'categoryIdName']
     fig = px.bar(temp, x="index", y="categoryIdName", text='categoryIdName', labels={'index': 'Categories', 'categoryIdName': 'Count of Videos'})
     fig.update_traces(texttemplate='%{text:.0d}', textposition='inside')  #can add textposition here (inside/outside)
     fig.update_layout(paper_bgcolor='#161a28', plot_bgcolor='#161a28', font_color = '#ffffff', autosize=True, 
@@ -913,28 +1051,12 @@ def update_category_bar_daily(value = date_list[0]):
     Output('top_rank_daily', 'children'),
     [Input('date_selector', 'value')])
     
+@cache.memoize
 def update_trending_table_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
-    
-    filtered_df = filtered_df[filtered_df['rank'] <= 10]
-    filtered_df = filtered_df.sort_values('rank', ascending = True)
-    filtered_df = filtered_df[['rank', 'title', 'thumbnail_link', 'view_count']]
-    
-    images_decoded_list = [] 
-    # decode image to HTML to show in table
-    for idx, elem in enumerate(filtered_df['thumbnail_link'].values):
-        if elem != '':
-            try:
-                urllib.request.urlretrieve(elem, 'data/' + str(idx) + '.jpg')
-                image_filename = 'data/' + str(idx) + '.jpg' # replace with your own image
-            except:
-                image_filename = 'data/test.jpg'
-        else:
-            image_filename = 'data/test.jpg' # replace with your own image
-            
-        encoded_image = base64.b64encode(open(image_filename, 'rb').read())
-        decoded_image = html.Img(src='data:image/jpg;base64,{}'.format(encoded_image.decode()))
-        images_decoded_list.append(decoded_image)
+    filtered_df = daily.get('top_rank', value)
+    
+    # cached thumbnail urls to show in table
+    images_decoded_list = [html.Img(src=images.src(elem)) for elem in filtered_df['thumbnail_link'].values]
     
     filtered_df['images'] = images_decoded_list    
     filtered_df = filtered_df[['rank', 'title', 'images', 'view_count']]
@@ -948,13 +1070,14 @@ def update_trending_table_daily(value = date_list[0]):
 ############### Tab 1 Second Row Charts
 @app.callback(
     Output('most_viewed_daily', 'figure'),
-    [Input('date_selector', 'value')])
-    
-def update_viewed_bar_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
+    [Input('date_selector', 'value'),
+     Input('top_k_daily', 'value')])
     
-    filtered_df = filtered_df.sort_values('view_count', ascending = True)
-    filtered_df = filtered_df[-10:]
+@cache.memoize
+def update_viewed_bar_daily(value = date_list[0], k = 10): 
+    # top k of the day in ascending order
+    day = day_positions[rollups.day_key(value)]
+    filtered_df = top_videos.frame('view_count', day, day, k)[['view_count', 'title']]
     
     def shorten_title(x, num_chars):
         if len(x) < num_chars:
@@ -979,13 +1102,14 @@ def update_viewed_bar_daily(value = date_list[0]):
     
 @app.callback(
     Output('most_liked_daily', 'figure'),
-    [Input('date_selector', 'value')])
+    [Input('date_selector', 'value'),
+     Input('top_k_daily', 'value')])
     
-def update_likes_bar_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
-    
-    filtered_df = filtered_df.sort_values('likes', ascending = True)
-    filtered_df = filtered_df[-10:]
+@cache.memoize
+def update_likes_bar_daily(value = date_list[0], k = 10): 
+    # top k of the day in ascending order
+    day = day_positions[rollups.day_key(value)]
+    filtered_df = top_videos.frame('likes', day, day, k)[['likes', 'title']]
     
     def shorten_title(x, num_chars):
         if len(x) < num_chars:
@@ -1010,13 +1134,14 @@ def update_likes_bar_daily(value = date_list[0]):
 
 @app.callback(
     Output('most_comment_daily', 'figure'),
-    [Input('date_selector', 'value')])
-    
-def update_comment_bar_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
+    [Input('date_selector', 'value'),
+     Input('top_k_daily', 'value')])
     
-    filtered_df = filtered_df.sort_values('comment_count', ascending = True)
-    filtered_df = filtered_df[-10:]
+@cache.memoize
+def update_comment_bar_daily(value = date_list[0], k = 10): 
+    # top k of the day in ascending order
+    day = day_positions[rollups.day_key(value)]
+    filtered_df = top_videos.frame('comment_count', day, day, k)[['comment_count', 'title']]
     
     def shorten_title(x, num_chars):
         if len(x) < num_chars:
@@ -1051,9 +1176,9 @@ def update_comment_bar_daily(value = date_list[0]):
     Output('trending_video_publish_daily', 'figure'),
     [Input('date_selector', 'value')])
     
+@cache.memoize
 def update_publish_day_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
-    filtered_df = filtered_df.resample('D', on='publishedAt').count()['video_id'].reset_index()
+    filtered_df = daily.get('publish_days', value)
     filtered_df.columns = ['Published Day', 'Count of Videos']
     filtered_df['color'] = '#636EFB'
     filtered_df.iloc[-1,2] = 'Yellow'
@@ -1070,9 +1195,8 @@ def update_publish_day_daily(value = date_list[0]):
     Output('published_hour_daily', 'figure'),
     [Input('date_selector', 'value')])
     
+@cache.memoize
 def update_publish_hour_bar_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
-        
     def create_bins():
         ans = []
         for i in range(24):
@@ -1084,11 +1208,9 @@ def update_publish_hour_bar_daily(value = date_list[0]):
     count_bins = pd.DataFrame()
     count_bins['bins'] = bins
 
-    temp = filtered_df.groupby(['publish_cat', 'categoryIdName']).agg('count')['title'].reset_index()
+    temp = daily.get('publish_hours', value).rename(columns={'count': 'title'})
     # filter only top5 categories for the day
-    top_5 = no_dups_f.groupby(['categoryIdName']).agg('count')['title'].reset_index()
-    top_5 = top_5.sort_values('title', ascending = False)
-    top_5 = top_5['categoryIdName'].values[:5]
+    top_5 = top_5_categories
     
     def map_others(x):
         if x not in top_5:
@@ -1134,25 +1256,12 @@ def update_publish_hour_bar_daily(value = date_list[0]):
     Output('top_channel_daily', 'children'),
     [Input('date_selector', 'value')])
     
+@cache.memoize
 def update_channel_table_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
-        
-    filtered_df = filtered_df.groupby(['channelTitle', 'avatar_url', 'channel_type','curr_subs']).agg('count')['video_id'].reset_index()
-    filtered_df = filtered_df.sort_values('video_id', ascending = False)
-    filtered_df = filtered_df[:10]
-    
-    images_decoded_list = [] 
-    # decode image to HTML to show in table
-    for idx, elem in enumerate(filtered_df['avatar_url'].values):
-        if elem != '':
-            urllib.request.urlretrieve(elem, 'data/' + str(idx) + '.jpg')
-            image_filename = 'data/' + str(idx) + '.jpg' # replace with your own image
-        else:
-            image_filename = 'data/test.jpg' # replace with your own image
-            
-        encoded_image = base64.b64encode(open(image_filename, 'rb').read())
-        decoded_image = html.Img(src='data:image/jpg;base64,{}'.format(encoded_image.decode()))
-        images_decoded_list.append(decoded_image)
+    filtered_df = daily.get('channels', value).rename(columns={'count': 'video_id'})
+    
+    # cached avatar urls to show in table
+    images_decoded_list = [html.Img(src=images.src(elem)) for elem in filtered_df['avatar_url'].values]
     
     filtered_df['images'] = images_decoded_list    
     filtered_df.drop(['avatar_url'], axis = 1, inplace = True)
@@ -1165,15 +1274,14 @@ def update_channel_table_daily(value = date_list[0]):
     Output('country_origin_channel_daily', 'figure'),
     [Input('date_selector', 'value')])
     
+@cache.memoize
 def update_country_origin_channel_daily(value = date_list[0]): 
-    filtered_df = df[(df['trending_date'] == value)]
+    filtered_df = daily.get('countries', value)
     
     code_mapping = {'AU': 'AUS', 'CN': 'CHN', 'DE': 'DEU', 'ES': 'ESP', 'GB': 'GBR','GH': 'GHA','ID': 'IDN', 'IE': 'IRL', 'IN': 'IND', 'IT': 'ITA',
                     'JP': 'JPN', 'KR': 'KOR', 'MY': 'MYS', 'RU': 'RUS', 'US': 'USA', 'VN': 'VNM'}
     
-    filtered_df = filtered_df.groupby(['country']).agg('count')['video_id'].reset_index()
-    filtered_df = filtered_df[filtered_df['country'] != '']
-    filtered_df['iso_alpha'] = filtered_df['country'].apply(lambda x: code_mapping[x])
+    filtered_df['iso_alpha'] = filtered_df['country'].map(code_mapping)
     filtered_df.columns = ['country', 'count_of_videos', 'iso_alpha']
     fig = px.choropleth(filtered_df, locations ="iso_alpha",
                         color="count_of_videos",
@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.io.json as pio_json
+
+
+####### Callback output cache
+# Outputs are keyed by (callback, input values, dataset version). A small LRU dict in each
+# process sits in front of a directory shared by all gunicorn workers, evicted least recently
+# used first (file mtime is refreshed on every hit). Files hold the JSON Dash sends to the
+# browser, so a hit from another worker is a json.loads instead of rebuilding figures.
+# Entries of other dataset versions are never read, and are deleted when a worker starts or
+# a day is ingested.
+
+
+def purge(cache_dir, version):
+    '''
+    Delete the cached outputs of every dataset version but version
+    '''
+    if not os.path.isdir(cache_dir):
+        return
+    prefix = str(version) + '-'
+    for name in os.listdir(cache_dir):
+        if not name.startswith(prefix):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+class CallbackCache:
+    '''
+    :param cache_dir: str: directory shared by the workers
+    :param version: dataset version the process serves (store manifest version)
+    :param max_memory: int: outputs kept in this process
+    :param max_files: int: outputs kept on disk
+    '''
+    def __init__(self, cache_dir, version, max_memory=128, max_files=1024):
+        self.cache_dir = cache_dir
+        self.version = str(version)
+        self.max_memory = max_memory
+        self.max_files = max_files
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        purge(cache_dir, self.version)
+
+    def key(self, func, args, kwargs):
+        payload = json.dumps([func.__module__, func.__qualname__, args, kwargs], sort_keys=True, default=str)
+        return self.version + '-' + hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        '''
+        :return: (found, value)
+        '''
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return True, self.memory[key]
+
+        path = os.path.join(self.cache_dir, key + '.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            # missing, or evicted / half written by another worker
+            return False, None
+        self._remember(key, value)
+        return True, value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        path = os.path.join(self.cache_dir, key + '.json')
+        tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(pio_json.to_json_plotly(value))
+        os.replace(tmp, path)
+        self._evict_files()
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory:
+                self.memory.popitem(last=False)
+
+    def _evict_files(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                try:
+                    entries.append((os.stat(os.path.join(self.cache_dir, name)).st_mtime, name))
+                except FileNotFoundError:
+                    pass
+        if len(entries) <= self.max_files:
+            return
+        entries.sort()
+        for _, name in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def memoize(self, func):
+        '''
+        Decorator caching the output of a callback by its input values
+        '''
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.key(func, args, kwargs)
+            found, value = self.get(key)
+            if not found:
+                value = func(*args, **kwargs)
+                self.put(key, value)
+            return value
+        return wrapper
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import os
+
+import store
+
+
+####### Trending day access for the dashboard frames
+# Frames are kept sorted by trending_date with the row offset of every day, so the rows of a
+# day or a range of days are a slice. The trending days of every video are indexed too
+# (Occurrences): the first / last row of a video in a range are the rows whose previous / next
+# trending day falls outside of it (see range_index.py and topk.py). The index of the store
+# rows is kept in data/store/occurrences/ and appended to by ingest.py, O(new rows) per day.
+# data/store/occurrences/
+#     meta.json           store version the index was built from, 'days' in day code order
+#     rows.arrow          row_day, prev_day, next_day of every row, in store order
+#     videos.arrow        video_id, first_row, last_row of every video, in code order
+
+# next_day of the last row of a video
+NO_DAY = np.iinfo(np.int64).max
+
+
+def _grow(array, size, fill):
+    '''
+    array with room for size entries, doubling the capacity so appends are amortized O(new)
+    '''
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class Occurrences:
+    '''
+    Trending days of every video: first / last row per video, previous / next day per row.
+    Rows are appended in trending date order, every append costs O(new rows).
+    '''
+    def __init__(self):
+        self.n_rows = 0
+        self.codes = {}
+        self.row_day = np.zeros(0, dtype=np.int64)
+        self.prev_day_buf = np.zeros(0, dtype=np.int64)
+        self.next_day_buf = np.zeros(0, dtype=np.int64)
+        self.first_row_buf = np.zeros(0, dtype=np.int64)
+        self.last_row_buf = np.zeros(0, dtype=np.int64)
+
+    @property
+    def prev_day(self):
+        '''
+        Trending day of the previous row of the same video, -1 for its first row
+        '''
+        return self.prev_day_buf[:self.n_rows]
+
+    @property
+    def next_day(self):
+        '''
+        Trending day of the next row of the same video, NO_DAY for its last row
+        '''
+        return self.next_day_buf[:self.n_rows]
+
+    @property
+    def first_row(self):
+        return self.first_row_buf[:len(self.codes)]
+
+    @property
+    def last_row(self):
+        return self.last_row_buf[:len(self.codes)]
+
+    def append(self, videos, days):
+        '''
+        Index new rows, on trending days not before the days already indexed
+        :param videos: array of video ids of the new rows
+        :param days: np.array of int: trending day of the new rows, non decreasing
+        '''
+        videos = np.asarray(videos)
+        days = np.asarray(days, dtype=np.int64)
+        uniques_codes, uniques = pd.factorize(videos)
+        known = np.array([self.codes.setdefault(video, len(self.codes)) for video in uniques], dtype=np.int64)
+        codes = known[uniques_codes]
+        rows = self.n_rows + np.arange(len(videos))
+
+        end = self.n_rows + len(videos)
+        self.row_day = _grow(self.row_day, end, 0)
+        self.prev_day_buf = _grow(self.prev_day_buf, end, -1)
+        self.next_day_buf = _grow(self.next_day_buf, end, NO_DAY)
+        self.first_row_buf = _grow(self.first_row_buf, len(self.codes), -1)
+        self.last_row_buf = _grow(self.last_row_buf, len(self.codes), -1)
+        self.row_day[rows] = days
+
+        # previous row of the same video among the new rows, else the last row indexed before
+        order = np.argsort(codes, kind='stable')
+        same = codes[order][1:] == codes[order][:-1]
+        prev_row = np.full(len(videos), -1, dtype=np.int64)
+        prev_row[order[1:][same]] = rows[order[:-1][same]]
+        head = prev_row == -1
+        prev_row[head] = self.last_row_buf[codes[head]]
+
+        linked = prev_row != -1
+        self.prev_day_buf[rows[linked]] = self.row_day[prev_row[linked]]
+        self.next_day_buf[prev_row[linked]] = days[linked]
+
+        new_video = ~linked
+        self.first_row_buf[codes[new_video]] = rows[new_video]
+        last = np.append(~same, True)
+        self.last_row_buf[codes[order][last]] = rows[order][last]
+        self.n_rows = end
+
+
+class DayFrame:
+    '''
+    :param frame: pd.DataFrame with trending_date and video_id columns
+    :param dates: sorted trending dates the day positions refer to, the dates of frame by default
+    :param occurrences: Occurrences of the rows of frame (in trending date order) with day
+        positions in dates, e.g. read_occurrences of the store; indexed here by default
+    '''
+    def __init__(self, frame, dates=None, occurrences=None):
+        if not frame['trending_date'].is_monotonic_increasing:
+            frame = frame.sort_values('trending_date', ascending = True, kind='stable')
+        self.frame = frame.reset_index(drop=True)
+        # UTC nanoseconds, searchsorted on int64 instead of Timestamp objects
+        trending_date = pd.DatetimeIndex(self.frame['trending_date']).asi8
+        days = np.unique(trending_date) if dates is None else pd.DatetimeIndex(dates).asi8
+        # row offset of every day, offsets[i]:offsets[i + 1] are the rows of dates[i]
+        self.offsets = np.append(np.searchsorted(trending_date, days, side='left'), len(self.frame))
+        if occurrences is None:
+            occurrences = Occurrences()
+            occurrences.append(self.frame['video_id'].to_numpy(), self.day_codes())
+        elif occurrences.n_rows != len(self.frame):
+            raise ValueError('occurrences of %d rows for a frame of %d rows' % (occurrences.n_rows, len(self.frame)))
+        self.occurrences = occurrences
+
+    def __len__(self):
+        return len(self.frame)
+
+    def day_codes(self):
+        '''
+        Position in dates of the trending day of every row
+        '''
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+
+def _occurrences_dir(store_dir):
+    return os.path.join(store_dir, 'occurrences')
+
+
+def _write_occurrences(store_dir, occurrences):
+    n = occurrences.n_rows
+    store.write_table(pa.table({'row_day': occurrences.row_day[:n], 'prev_day': occurrences.prev_day,
+                                'next_day': occurrences.next_day}),
+                      os.path.join(_occurrences_dir(store_dir), 'rows.arrow'))
+    store.write_table(pa.table({'video_id': pa.array(list(occurrences.codes), pa.string()),
+                                'first_row': occurrences.first_row, 'last_row': occurrences.last_row}),
+                      os.path.join(_occurrences_dir(store_dir), 'videos.arrow'))
+
+
+def _column(table, name):
+    # one chunk as written by _write_occurrences, a view of the memory-mapped file
+    return table.column(name).combine_chunks().to_numpy()
+
+
+def read_occurrences(store_dir, videos=False):
+    '''
+    Occurrences of the rows of the store, day codes are positions in the store days
+    :param videos: bool: also read the per video index, needed to append. Without it the row
+        arrays are read only views of the memory-mapped file.
+    :return: Occurrences
+    '''
+    rows = store.read_table(os.path.join(_occurrences_dir(store_dir), 'rows.arrow'))
+    occurrences = Occurrences()
+    occurrences.n_rows = rows.num_rows
+    occurrences.row_day = _column(rows, 'row_day')
+    occurrences.prev_day_buf = _column(rows, 'prev_day')
+    occurrences.next_day_buf = _column(rows, 'next_day')
+    if videos:
+        table = store.read_table(os.path.join(_occurrences_dir(store_dir), 'videos.arrow'))
+        occurrences.codes = {video: code for code, video in enumerate(table.column('video_id').to_pylist())}
+        occurrences.first_row_buf = _column(table, 'first_row').copy()
+        occurrences.last_row_buf = _column(table, 'last_row').copy()
+        for name in ['row_day', 'prev_day_buf', 'next_day_buf']:
+            setattr(occurrences, name, getattr(occurrences, name).copy())
+    return occurrences
+
+
+def build_occurrences(store_dir):
+    '''
+    Rebuild the index of every row from the store
+    '''
+    manifest = store.read_manifest(store_dir)
+    days = sorted(manifest['days'])
+    occurrences = Occurrences()
+    for code, day in enumerate(days):
+        videos = store.read_videos(store_dir, ['video_id'], days=[day])['video_id'].to_numpy()
+        occurrences.append(videos, np.full(len(videos), code))
+    os.makedirs(_occurrences_dir(store_dir), exist_ok=True)
+    _write_occurrences(store_dir, occurrences)
+    store.write_json(os.path.join(_occurrences_dir(store_dir), 'meta.json'), {'version': manifest['version'], 'days': days})
+
+
+def append_occurrences(store_dir, day, day_df, version):
+    '''
+    Index the rows of one trending day, later than the days of the store
+    '''
+    meta_path = os.path.join(_occurrences_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta_path):
+        build_occurrences(store_dir)
+        return
+    meta = store.read_json(meta_path)
+    if meta['days'] and day <= meta['days'][-1]:
+        # a replaced day moves the rows of the days after it
+        build_occurrences(store_dir)
+        return
+
+    occurrences = read_occurrences(store_dir, videos=True)
+    occurrences.append(day_df['video_id'].to_numpy(), np.full(len(day_df), len(meta['days'])))
+    _write_occurrences(store_dir, occurrences)
+    meta['days'].append(day)
+    meta['version'] = version
+    store.write_json(meta_path, meta)
+
+
+def ensure_occurrences(store_dir):
+    '''
+    Build the index when missing or older than the store
+    '''
+    meta = os.path.join(_occurrences_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta) or store.read_json(meta)['version'] != store.read_manifest(store_dir)['version']:
+        build_occurrences(store_dir)
@@ -0,0 +1,19 @@
+import gc
+import os
+
+
+####### gunicorn settings (Procfile / Dockerfile: gunicorn --config gunicorn.conf.py app:server)
+# app.py is imported once in the master (preload_app) and the workers are forked from it, so
+# the dataset, rollups and range indexes are shared copy-on-write instead of loaded per worker.
+
+# $PORT on heroku, the port the Dockerfile exposes otherwise
+bind = '0.0.0.0:' + os.environ.get('PORT', '8050')
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+
+
+def pre_fork(server, worker):
+    # objects of the loaded app go to the permanent generation, a collection in a worker
+    # then never writes to (and copies) the pages holding them
+    gc.freeze()
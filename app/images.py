@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import flask
+
+
+####### Thumbnail and avatar images
+# Images are downloaded once into a directory named by the sha1 of their url, by a small
+# thread pool filled ahead of time (prefetch) or when a table first shows the url. Tables
+# link to /images/<sha1> instead of inlining base64 data, and the route waits at most the
+# download timeout before falling back to the placeholder image. Only urls of the dataset
+# (add_urls) are ever downloaded by the route. A failed download is retried once retry_after
+# seconds have passed, the placeholder is served until then.
+
+ROUTE = '/images/'
+
+
+class ImageCache:
+    '''
+    :param cache_dir: str: directory of the downloaded images
+    :param fallback: str: image served for missing urls and failed downloads
+    :param workers: int: concurrent downloads
+    :param timeout: float: seconds per download, and at most the route waits for one
+    :param retry_after: float: seconds before a failed download is tried again
+    '''
+    def __init__(self, cache_dir, fallback, workers=8, timeout=5, retry_after=600):
+        self.cache_dir = cache_dir
+        self.fallback = fallback
+        self.timeout = timeout
+        self.workers = workers
+        self.retry_after = retry_after
+        self.urls = {}
+        # key -> time.monotonic() of its last failed download
+        self.failed = {}
+        self._reset()
+        # threads and locks do not survive a fork (gunicorn --preload): a forked process starts
+        # empty and creates its own pool on its first download, so processes that never
+        # download (e.g. word cloud renderers) never start one
+        os.register_at_fork(after_in_child=self._reset)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _reset(self):
+        self.pool = None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        '''
+        Download pool of this process, created on first use (call with self.lock held)
+        '''
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+        return self.pool
+
+    def shutdown(self, wait=True):
+        '''
+        Stop the download pool, waiting for the queued downloads by default
+        '''
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _download(self, url, key):
+        path = self.path(key)
+        tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                content = response.read()
+            with open(tmp, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except Exception:
+            # dead link or no network, the placeholder is served until the retry
+            with self.lock:
+                self.failed[key] = time.monotonic()
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def fetch(self, url):
+        '''
+        Queue the download of url unless it is cached, queued or failed less than retry_after ago
+        :return: str: key of url
+        '''
+        key = self.key(url)
+        with self.lock:
+            if key in self.pending or os.path.exists(self.path(key)):
+                return key
+            if key in self.failed:
+                if time.monotonic() - self.failed[key] < self.retry_after:
+                    return key
+                del self.failed[key]
+            self.pending[key] = self._executor().submit(self._download, url, key)
+        return key
+
+    def add_urls(self, urls):
+        '''
+        Allow the route to download urls on demand
+        '''
+        for url in set(urls):
+            if url != '':
+                self.urls[self.key(url)] = url
+
+    def prefetch(self, urls):
+        '''
+        Queue the downloads of every distinct non empty url
+        '''
+        for url in set(urls):
+            if url != '':
+                self.urls[self.key(url)] = url
+                self.fetch(url)
+
+    def src(self, url):
+        '''
+        Image url for an html.Img, the placeholder for an empty url
+        '''
+        if url == '':
+            return ROUTE + 'fallback'
+        self.urls[self.key(url)] = url
+        return ROUTE + self.fetch(url)
+
+    def serve(self, key):
+        '''
+        Flask response of a cached image, waiting for a queued download up to the timeout
+        '''
+        if key in self.urls:
+            # outputs cached by another worker link to images this one never queued
+            self.fetch(self.urls[key])
+        with self.lock:
+            future = self.pending.get(key)
+        if future is not None:
+            try:
+                future.result(timeout=self.timeout)
+            except TimeoutError:
+                pass
+        path = self.path(key) if key in self.urls else self.fallback
+        if not os.path.exists(path):
+            path = self.fallback
+        return flask.send_file(os.path.abspath(path), mimetype='image/jpeg', max_age=0 if path == self.fallback else 86400)
+
+    def register(self, server):
+        '''
+        Add the image route to the flask server of the app
+        '''
+        server.add_url_rule(ROUTE + '<key>', 'images', self.serve)
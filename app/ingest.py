@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import argparse
+import datetime
+import os
+import time
+
+import store
+import cache
+import dayframe
+import rollups
+import terms
+import moments
+import transforms
+
+
+####### Daily ingestion of the Youtube API trending files (YY.DD.MM_ID_videos.csv)
+#   python ingest.py ../data                      ingest every file not in the store yet
+#   python ingest.py ../data --store data/store
+
+CSV_SUFFIX = '_ID_videos.csv'
+
+CSV_DTYPES = {'video_id': str, 'title': str, 'publishedAt': str, 'channelId': str, 'channelTitle': str,
+              'categoryId': np.int64, 'trending_date': str, 'tags': str, 'view_count': np.int64,
+              'likes': np.int64, 'dislikes': np.int64, 'comment_count': np.int64, 'thumbnail_link': str,
+              'comments_disabled': bool, 'ratings_disabled': bool, 'description': str}
+
+
+def new_files(csv_dir, manifest):
+    '''
+    Trending files of csv_dir that are not in the store yet, oldest first
+    '''
+    names = [name for name in os.listdir(csv_dir) if name.endswith(CSV_SUFFIX) and name not in manifest['files']]
+    # YY.DD.MM in the file name
+    return sorted(names, key=lambda name: datetime.datetime.strptime(name[:8], '%y.%d.%m'))
+
+
+def read_trending_csv(path):
+    return pd.read_csv(path, dtype=CSV_DTYPES, usecols=list(CSV_DTYPES))
+
+
+def clean(raw, channels):
+    '''
+    Cleaned rows of one trending file, with the columns of the store
+    :param raw: pd.DataFrame: rows of a trending file in API order
+    :param channels: pd.DataFrame: social blade attributes per channelId (see store.read_channels)
+    :return: pd.DataFrame
+    '''
+    df = raw.copy()
+    df['rank'] = np.arange(1, len(df) + 1)
+    df['categoryIdName'] = transforms.category_name(df['categoryId'])
+    df['trending_date'] = transforms.trending_date(df['trending_date'])
+    df['publishedAt'] = transforms.published_wib(df['publishedAt'])
+    df['title_cleaned'] = df['title'].apply(transforms.clean_title)
+    df['desc_cleaned'] = df['description'].apply(transforms.clean_desc)
+
+    # channels without social blade data keep empty attributes
+    df = pd.merge(df, channels, on='channelId', how='left')
+    df[store.CHANNEL_COLUMNS] = df[store.CHANNEL_COLUMNS].fillna('')
+    df['channel_type'] = transforms.channel_type(df['channel_type'], df['categoryIdName'])
+
+    df['time_to_trend'] = transforms.time_to_trend(df['trending_date'], df['publishedAt'])
+    df['publish_cat'] = transforms.publish_cat(df['publishedAt'])
+    df['curr_subs_num'] = transforms.curr_subs_num(df['curr_subs'])
+    df['curr_subs_cat'] = transforms.curr_subs_cat(df['curr_subs_num'])
+    return df
+
+
+def ingest(csv_dir, store_dir, cache_dir=None):
+    '''
+    Append every new trending file of csv_dir to the store, one partition, occurrence index, rollup, term index and moments update per day
+    :param cache_dir: str: dashboard callback cache, emptied of the older dataset versions
+    :return: list of ingested file names
+    '''
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        store.init_store(store_dir)
+    channels = store.read_channels(store_dir)
+
+    ingested = []
+    for name in new_files(csv_dir, store.read_manifest(store_dir)):
+        start = time.time()
+        day_df = clean(read_trending_csv(os.path.join(csv_dir, name)), channels)
+        day, manifest = store.add_day(store_dir, day_df, files=[name])
+        dayframe.append_occurrences(store_dir, day, day_df, manifest['version'])
+        rollups.append_rollups(store_dir, day, day_df, manifest['version'])
+        terms.append_terms(store_dir, day, day_df, manifest['version'])
+        moments.append_moments(store_dir, day, day_df, manifest['version'])
+        ingested.append(name)
+        print('Ingested', name, 'as', day, '(%d videos, %.2fs)' % (len(day_df), time.time() - start))
+
+    if ingested and cache_dir is not None:
+        cache.purge(cache_dir, store.read_manifest(store_dir)['version'])
+    return ingested
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Append new daily trending CSV files to the dashboard store')
+    parser.add_argument('csv_dir', help='directory of the YY.DD.MM_ID_videos.csv files')
+    parser.add_argument('--store', default='data/store', help='store directory of the dashboard')
+    parser.add_argument('--cache', default='data/cache', help='callback cache directory of the dashboard')
+    args = parser.parse_args()
+    ingest(args.csv_dir, args.store, args.cache)
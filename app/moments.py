@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+import store
+
+
+####### Per day moments of the numeric video columns
+# Counts, sums, sums of squares and cross products of the videos first trending on each day,
+# extended at every ingested day. Means, variances and the correlation matrix of any range of
+# days are assembled from the summed moments of its days, O(days x columns^2), without rows.
+# Moments are pairwise (rows where both columns are set), like DataFrame.corr() skips NaN.
+# data/store/moments/
+#     meta.json           store version the moments were built from, 'days' in array order
+#     moments.npz         n, sums, squares, products: float64 arrays of shape (days, columns, columns)
+
+COLUMNS = ['view_count', 'likes', 'dislikes', 'comment_count', 'rank', 'curr_subs_num']
+
+# [day, i, j] over the rows where columns i and j are both set:
+#     n: count, sums: sum of i, squares: sum of i ** 2, products: sum of i * j
+MOMENTS = ['n', 'sums', 'squares', 'products']
+
+
+def _moments_dir(store_dir):
+    return os.path.join(store_dir, 'moments')
+
+
+def day_moments(first_df):
+    '''
+    Moments of one trending day
+    :param first_df: pd.DataFrame: COLUMNS of the videos first trending on that day
+    :return: dict of moment -> np.array (columns, columns)
+    '''
+    values = first_df[COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = (~np.isnan(values)).astype(np.float64)
+    values = np.where(valid > 0, values, 0.0)
+    return {'n': valid.T @ valid,
+            'sums': values.T @ valid,
+            'squares': (values ** 2).T @ valid,
+            'products': values.T @ values}
+
+
+def _first_rows(day_df, seen):
+    return day_df[~day_df['video_id'].isin(seen)].drop_duplicates(subset='video_id', keep='first')
+
+
+def _stack(day_moments_list):
+    '''
+    dict of moment -> np.array (days, columns, columns)
+    '''
+    shape = (len(day_moments_list), len(COLUMNS), len(COLUMNS))
+    return {moment: np.array([day[moment] for day in day_moments_list], dtype=np.float64).reshape(shape) for moment in MOMENTS}
+
+
+def _read_moments(store_dir):
+    with np.load(os.path.join(_moments_dir(store_dir), 'moments.npz')) as arrays:
+        return {moment: arrays[moment] for moment in MOMENTS}
+
+
+def _write_moments(store_dir, arrays):
+    path = os.path.join(_moments_dir(store_dir), 'moments.npz')
+    # savez appends .npz to names without it
+    tmp = path[:-len('.npz')] + '.%d.tmp.npz' % os.getpid()
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def build_moments(store_dir):
+    '''
+    Rebuild the moments of every day from the store
+    '''
+    manifest = store.read_manifest(store_dir)
+    days = sorted(manifest['days'])
+    seen = set()
+    day_moments_list = []
+    for day in days:
+        first_df = _first_rows(store.read_videos(store_dir, ['video_id'] + COLUMNS, days=[day]), seen)
+        seen.update(first_df['video_id'])
+        day_moments_list.append(day_moments(first_df))
+    os.makedirs(_moments_dir(store_dir), exist_ok=True)
+    _write_moments(store_dir, _stack(day_moments_list))
+    store.write_json(os.path.join(_moments_dir(store_dir), 'meta.json'),
+                     {'version': manifest['version'], 'days': days, 'columns': COLUMNS})
+
+
+def append_moments(store_dir, day, day_df, version):
+    '''
+    Add (or replace) the moments of one trending day, later than the days of the store
+    '''
+    meta_path = os.path.join(_moments_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta_path):
+        build_moments(store_dir)
+        return
+    meta = store.read_json(meta_path)
+
+    seen = store.seen_before(store_dir, day)
+    row = _stack([day_moments(_first_rows(day_df, seen))])
+
+    arrays = _read_moments(store_dir)
+    if day in meta['days']:
+        for moment in MOMENTS:
+            arrays[moment][meta['days'].index(day)] = row[moment][0]
+    else:
+        arrays = {moment: np.concatenate([arrays[moment], row[moment]]) for moment in MOMENTS}
+        meta['days'].append(day)
+    _write_moments(store_dir, arrays)
+    meta['version'] = version
+    store.write_json(meta_path, meta)
+
+
+def ensure_moments(store_dir):
+    '''
+    Build the moments when missing, older than the store or of other columns
+    '''
+    meta = os.path.join(_moments_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta):
+        build_moments(store_dir)
+        return
+    meta = store.read_json(meta)
+    if meta['version'] != store.read_manifest(store_dir)['version'] or meta.get('columns') != COLUMNS:
+        build_moments(store_dir)
+
+
+class MomentIndex:
+    '''
+    Moments of every day, a range of days is a sum of them
+    '''
+    def __init__(self, store_dir):
+        self.rows = {day: row for row, day in enumerate(store.read_json(os.path.join(_moments_dir(store_dir), 'meta.json'))['days'])}
+        self.arrays = _read_moments(store_dir)
+
+    def totals(self, days):
+        '''
+        Moments summed over days
+        :param days: list of 'YYYY-MM-DD'
+        :return: dict of moment -> np.array (columns, columns)
+        '''
+        rows = [self.rows[day] for day in days if day in self.rows]
+        return {moment: self.arrays[moment][rows].sum(axis=0) for moment in MOMENTS}
+
+    def mean(self, days):
+        '''
+        Mean of every column over the videos first trending on days, pd.Series like DataFrame.mean()
+        '''
+        totals = self.totals(days)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.diag(totals['sums']) / np.diag(totals['n'])
+        return pd.Series(mean, index=COLUMNS)
+
+    def var(self, days):
+        '''
+        Sample variance (ddof 1) of every column, pd.Series like DataFrame.var()
+        '''
+        totals = self.totals(days)
+        n = np.diag(totals['n'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (np.diag(totals['squares']) - np.diag(totals['sums']) ** 2 / n) / (n - 1)
+        var[n < 2] = np.nan
+        return pd.Series(np.maximum(var, 0), index=COLUMNS)
+
+    def corr(self, days):
+        '''
+        Pearson correlation matrix, pd.DataFrame like DataFrame.corr() of the videos first trending on days
+        '''
+        totals = self.totals(days)
+        n, sums = totals['n'], totals['sums']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # centered sums over the rows of every pair, sums.T[i, j] is the sum of j on them
+            cross = totals['products'] - sums * sums.T / n
+            square = totals['squares'] - sums ** 2 / n
+            denominator = np.sqrt(square * square.T)
+            corr = cross / denominator
+        corr[(n < 1) | ~(square > 0) | ~(square.T > 0)] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=COLUMNS, columns=COLUMNS)
+
+
+if __name__ == '__main__':
+    # python moments.py data/store
+    build_moments(sys.argv[1])
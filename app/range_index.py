@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from dayframe import NO_DAY
+
+
+####### Range aggregates for the weekly tab
+# Counts over any [start, end] range of trending days from cumulative per-day arrays,
+# so a slider move costs one subtraction per key instead of a pass over the rows.
+
+
+def _factorize(frame, cols):
+    '''
+    Group code of every row and the group keys, sorted like groupby(cols)
+    '''
+    grouper = frame.groupby(cols, observed=True, sort=True)
+    keys = grouper.size().index.to_frame(index=False)
+    return grouper.ngroup().to_numpy(), keys
+
+
+def _day_key_counts(days, codes, n_days, n_keys):
+    '''
+    (n_days, n_keys) matrix of row counts per day and key
+    '''
+    counts = np.bincount(days * n_keys + codes, minlength=n_days * n_keys)
+    return counts.reshape(n_days, n_keys).astype(np.int32)
+
+
+def _to_frame(keys, counts):
+    # same shape as groupby(cols).agg('count')[...].reset_index(), only observed keys
+    nonzero = counts > 0
+    frame = keys[nonzero].reset_index(drop=True)
+    frame['count'] = counts[nonzero]
+    return frame
+
+
+class PrefixCounts:
+    '''
+    Row counts per key over a range of trending days
+    :param days: np.array of int: day code of every row (see dayframe.DayFrame.day_codes)
+    :param frame: pd.DataFrame holding the key columns of every row
+    :param cols: list of key columns
+    :param n_days: int
+    '''
+    def __init__(self, days, frame, cols, n_days):
+        codes, self.keys = _factorize(frame, cols)
+        self.cum = np.zeros((n_days + 1, len(self.keys)), dtype=np.int32)
+        np.cumsum(_day_key_counts(days, codes, n_days, len(self.keys)), axis=0, out=self.cum[1:])
+
+    def counts(self, start, end):
+        '''
+        Counts over days [start, end] as a dataframe of the key columns and 'count'
+        '''
+        return _to_frame(self.keys, self.cum[end + 1] - self.cum[start])
+
+
+class UniqueCounts:
+    '''
+    Distinct video counts per key over a range of trending days.
+
+    A video is counted once in [start, end] by the key of its last row in the range, like
+    drop_duplicates(subset='video_id', keep='last'): keys may change between the rows of a
+    video when ingest merges newer channel attributes. The last row in the range is its last
+    row ever, a row on day end continuing on the day after, or a row followed by a gap of days
+    reaching past end. The first two are prefix / per-day arrays, the few gap rows are checked
+    one by one.
+    :param days: np.array of int: day code of every row (see dayframe.DayFrame.day_codes)
+    :param next_day: np.array of int: day code of the next row of the same video, dayframe.NO_DAY for its last row (see dayframe.Occurrences)
+    :param frame: pd.DataFrame holding the key columns of every row
+    :param cols: list of key columns
+    :param n_days: int
+    '''
+    def __init__(self, days, next_day, frame, cols, n_days):
+        codes, self.keys = _factorize(frame, cols)
+        n_keys = len(self.keys)
+
+        last = next_day == NO_DAY
+        continued = ~last & (next_day == days + 1)
+        gap = ~last & ~continued
+
+        self.last_cum = np.zeros((n_days + 1, n_keys), dtype=np.int32)
+        np.cumsum(_day_key_counts(days[last], codes[last], n_days, n_keys), axis=0, out=self.last_cum[1:])
+        self.continued = _day_key_counts(days[continued], codes[continued], n_days, n_keys)
+        self.gap_days = days[gap]
+        self.gap_next = next_day[gap]
+        self.gap_codes = codes[gap]
+
+    def counts(self, start, end):
+        '''
+        Distinct videos over days [start, end] as a dataframe of the key columns and 'count'
+        '''
+        counts = self.last_cum[end + 1] - self.last_cum[start] + self.continued[end]
+        leaves = (self.gap_days >= start) & (self.gap_days <= end) & (self.gap_next > end)
+        counts += np.bincount(self.gap_codes[leaves], minlength=len(self.keys)).astype(np.int32)
+        return _to_frame(self.keys, counts)
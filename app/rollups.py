@@ -0,0 +1,162 @@
+import pyarrow as pa
+import pandas as pd
+import os
+import sys
+
+import store
+
+
+####### Daily rollups
+# Per trending day aggregates for the Daily tab, materialized once per ingested day.
+# data/store/rollups/
+#     meta.json           store version the rollups were built from
+#     <kind>.arrow        one table per rollup kind, rows of a day are contiguous and keyed by 'day'
+
+# rows kept for the top videos / channels tables
+TOP_N = 10
+
+# columns of the store the rollups are built from
+ROLLUP_COLUMNS = ['video_id', 'title', 'publishedAt', 'channelTitle', 'categoryIdName', 'view_count',
+                  'thumbnail_link', 'rank', 'avatar_url', 'channel_type', 'curr_subs',
+                  'country', 'publish_cat']
+
+
+def day_key(value):
+    '''
+    'YYYY-MM-DD' key of a trending date, from a Timestamp or the ISO string the date dropdown sends
+    '''
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def build_day(day_df):
+    '''
+    All rollups of a single trending day
+    :param day_df: pd.DataFrame: rows of one trending day
+    :return: dict of kind -> pd.DataFrame
+    '''
+    tables = {}
+
+    # category count
+    temp = day_df['categoryIdName'].astype(object).value_counts()
+    tables['categories'] = pd.DataFrame({'categoryIdName': temp.index, 'count': temp.values})
+
+    # top 10 ranked videos
+    temp = day_df[day_df['rank'] <= TOP_N].sort_values('rank', ascending = True)
+    tables['top_rank'] = temp[['rank', 'title', 'thumbnail_link', 'view_count']]
+
+    # publish day
+    temp = day_df.resample('D', on='publishedAt').count()['video_id']
+    tables['publish_days'] = pd.DataFrame({'publishedAt': temp.index, 'count': temp.values})
+
+    # publish hour x category
+    temp = day_df.groupby(['publish_cat', 'categoryIdName'], observed=True).agg('count')['title'].reset_index()
+    tables['publish_hours'] = pd.DataFrame({'publish_cat': temp['publish_cat'].values,
+                                            'categoryIdName': temp['categoryIdName'].astype(object).values,
+                                            'count': temp['title'].values})
+
+    # top channels by trending count
+    temp = day_df.groupby(['channelTitle', 'avatar_url', 'channel_type','curr_subs'], observed=True).agg('count')['video_id'].reset_index()
+    temp = temp.sort_values('video_id', ascending = False)[:TOP_N]
+    temp['channel_type'] = temp['channel_type'].astype(object)
+    tables['channels'] = temp.rename(columns={'video_id': 'count'})
+
+    # country of channels
+    temp = day_df.groupby(['country'], observed=True).agg('count')['video_id'].reset_index()
+    temp = temp[temp['country'] != '']
+    tables['countries'] = pd.DataFrame({'country': temp['country'].astype(object).values, 'count': temp['video_id'].values})
+
+    return tables
+
+
+def _rollup_dir(store_dir):
+    return os.path.join(store_dir, 'rollups')
+
+
+def _write_kind(store_dir, kind, frame):
+    store.write_table(pa.Table.from_pandas(frame, preserve_index=False),
+                      os.path.join(_rollup_dir(store_dir), kind + '.arrow'))
+
+
+def _stack(day_tables):
+    '''
+    dict of day -> dict of kind -> frame into dict of kind -> frame with a 'day' column
+    '''
+    stacked = {}
+    for day, tables in day_tables.items():
+        for kind, frame in tables.items():
+            frame = frame.reset_index(drop=True)
+            frame.insert(0, 'day', day)
+            stacked.setdefault(kind, []).append(frame)
+    return {kind: pd.concat(frames, ignore_index=True) for kind, frames in stacked.items()}
+
+
+def build_rollups(store_dir):
+    '''
+    Rebuild every rollup from the videos of the store
+    '''
+    manifest = store.read_manifest(store_dir)
+    day_tables = {}
+    for day in manifest['days']:
+        day_tables[day] = build_day(store.read_videos(store_dir, ROLLUP_COLUMNS, days=[day]))
+    os.makedirs(_rollup_dir(store_dir), exist_ok=True)
+    for kind, frame in _stack(day_tables).items():
+        _write_kind(store_dir, kind, frame)
+    store.write_json(os.path.join(_rollup_dir(store_dir), 'meta.json'), {'version': manifest['version']})
+
+
+def append_rollups(store_dir, day, day_df, version):
+    '''
+    Add (or replace) the rollups of one trending day without touching the other days
+    '''
+    os.makedirs(_rollup_dir(store_dir), exist_ok=True)
+    for kind, frame in _stack({day: build_day(day_df)}).items():
+        path = os.path.join(_rollup_dir(store_dir), kind + '.arrow')
+        if os.path.exists(path):
+            old = store.read_table(path).to_pandas()
+            frame = pd.concat([old[old['day'] != day], frame], ignore_index=True)
+        _write_kind(store_dir, kind, frame)
+    store.write_json(os.path.join(_rollup_dir(store_dir), 'meta.json'), {'version': version})
+
+
+def ensure_rollups(store_dir):
+    '''
+    Build the rollups when missing or older than the store
+    '''
+    meta = os.path.join(_rollup_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta) or store.read_json(meta)['version'] != store.read_manifest(store_dir)['version']:
+        build_rollups(store_dir)
+
+
+class DailyRollups:
+    '''
+    Rollup tables kept in memory with the row range of every day, so a lookup is a slice
+    '''
+    def __init__(self, store_dir):
+        self.tables = {}
+        self.offsets = {}
+        for name in sorted(os.listdir(_rollup_dir(store_dir))):
+            if not name.endswith('.arrow'):
+                continue
+            kind = name[:-len('.arrow')]
+            frame = store.read_table(os.path.join(_rollup_dir(store_dir), name)).to_pandas()
+            days = frame.pop('day')
+            # rows of a day are contiguous, record [start, stop) for each
+            starts = days.ne(days.shift()).to_numpy().nonzero()[0]
+            stops = list(starts[1:]) + [len(days)]
+            self.tables[kind] = frame
+            self.offsets[kind] = {days.iat[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+    def get(self, kind, value):
+        '''
+        Rollup of a kind for the trending day of value
+        :param kind: str: categories / top_rank / publish_days / publish_hours / channels / countries
+        :param value: Timestamp or date string
+        :return: pd.DataFrame
+        '''
+        start, stop = self.offsets[kind].get(day_key(value), (0, 0))
+        return self.tables[kind].iloc[start:stop].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # python rollups.py data/store
+    build_rollups(sys.argv[1])
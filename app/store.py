@@ -0,0 +1,246 @@
+import pyarrow as pa
+import pandas as pd
+import json
+import os
+import sys
+
+
+####### Columnar dataset store
+# data/store/
+#     manifest.json                 dataset version and trending days in the store
+#     videos/YYYY-MM-DD.arrow       one Arrow IPC file per trending day, read memory-mapped
+#     view_gains.arrow              social blade daily view gains per channel (long table)
+#     channels.arrow                latest social blade attributes per channel, merged into ingested days
+#     first_days.arrow              first trending day of every video, kept up to date by add_day
+
+# columns kept from final.pkl
+VIDEO_COLUMNS = ['video_id', 'title', 'publishedAt', 'channelId', 'channelTitle', 'categoryIdName',
+                 'trending_date', 'tags', 'view_count', 'likes', 'dislikes', 'comment_count',
+                 'thumbnail_link', 'rank', 'avatar_url', 'channel_type', 'curr_subs', 'country',
+                 'rank_y', 'time_to_trend', 'publish_cat', 'curr_subs_num', 'curr_subs_cat',
+                 'title_cleaned', 'desc_cleaned']
+
+# low cardinality string columns, stored dictionary encoded and loaded as pandas categoricals
+CATEGORICAL_COLUMNS = ['categoryIdName', 'channel_type', 'country']
+
+# social blade attributes of a channel
+CHANNEL_COLUMNS = ['channelId', 'avatar_url', 'channel_type', 'curr_subs', 'country', 'rank_y']
+
+# list / long text columns only the word clouds need
+TEXT_COLUMNS = ['tags', 'title_cleaned', 'desc_cleaned']
+
+
+def _day_name(trending_date):
+    return trending_date.strftime('%Y-%m-%d')
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, obj):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def read_manifest(store_dir):
+    return read_json(os.path.join(store_dir, 'manifest.json'))
+
+
+def _write_manifest(store_dir, manifest):
+    write_json(os.path.join(store_dir, 'manifest.json'), manifest)
+
+
+def write_table(table, path):
+    # write then rename so readers never see a half written file
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+
+
+def read_table(path, columns=None):
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def write_videos_day(store_dir, day_df):
+    '''
+    Write the rows of a single trending day as one partition of the store
+    '''
+    day_df = day_df[[col for col in VIDEO_COLUMNS if col in day_df.columns]].copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in day_df.columns:
+            day_df[col] = day_df[col].astype('category')
+    name = _day_name(day_df['trending_date'].iloc[0])
+    table = pa.Table.from_pandas(day_df, preserve_index=False)
+    write_table(table, os.path.join(store_dir, 'videos', name + '.arrow'))
+    return name
+
+
+def view_gains_long(df):
+    '''
+    Turn the past_view_gains dict column into a long table of channel, date and views.
+    Keeps the last row of every channel title like the dashboard does.
+    '''
+    channels = df.drop_duplicates(subset='channelTitle', keep='last')
+    rows = []
+    for channel_id, title, gains in zip(channels['channelId'], channels['channelTitle'], channels['past_view_gains']):
+        if isinstance(gains, dict):
+            for date, views in gains.items():
+                rows.append((channel_id, title, date, views))
+    return pd.DataFrame(rows, columns=['channelId', 'channelTitle', 'date', 'views'])
+
+
+def write_view_gains(store_dir, gains):
+    write_table(pa.Table.from_pandas(gains, preserve_index=False), os.path.join(store_dir, 'view_gains.arrow'))
+
+
+def write_channels(store_dir, channels):
+    write_table(pa.Table.from_pandas(channels, preserve_index=False), os.path.join(store_dir, 'channels.arrow'))
+
+
+def _first_days_path(store_dir):
+    return os.path.join(store_dir, 'first_days.arrow')
+
+
+def first_days(df):
+    '''
+    First trending day of every video of df
+    :return: pd.DataFrame of video_id and day ('YYYY-MM-DD')
+    '''
+    first = df.groupby('video_id', sort=False)['trending_date'].min()
+    return pd.DataFrame({'video_id': first.index.astype(str), 'day': first.dt.strftime('%Y-%m-%d').values})
+
+
+def write_first_days(store_dir, first):
+    write_table(pa.Table.from_pandas(first, preserve_index=False), _first_days_path(store_dir))
+
+
+def read_first_days(store_dir):
+    '''
+    First trending day of every video in the store, built from the partitions by stores written without it
+    '''
+    if not os.path.exists(_first_days_path(store_dir)):
+        write_first_days(store_dir, first_days(read_videos(store_dir, ['video_id', 'trending_date'])))
+    return read_table(_first_days_path(store_dir)).to_pandas()
+
+
+def seen_before(store_dir, day):
+    '''
+    Videos of the store trending on a day before day, without reading the partitions
+    :return: pd.Series of video ids
+    '''
+    first = read_first_days(store_dir)
+    return first['video_id'][first['day'] < day]
+
+
+def write_store(df, store_dir):
+    '''
+    Write a final.pkl shaped dataframe as a new store, one partition per trending day
+    '''
+    os.makedirs(os.path.join(store_dir, 'videos'), exist_ok=True)
+    days = []
+    for _, day_df in df.groupby('trending_date', sort=True):
+        days.append(write_videos_day(store_dir, day_df))
+    write_view_gains(store_dir, view_gains_long(df))
+    write_channels(store_dir, df.drop_duplicates(subset='channelId', keep='last')[CHANNEL_COLUMNS].astype(str))
+    write_first_days(store_dir, first_days(df))
+    version = read_manifest(store_dir)['version'] + 1 if os.path.exists(os.path.join(store_dir, 'manifest.json')) else 1
+    _write_manifest(store_dir, {'version': version, 'days': days, 'files': []})
+
+
+def init_store(store_dir):
+    '''
+    Empty store to ingest the first day into
+    '''
+    os.makedirs(os.path.join(store_dir, 'videos'), exist_ok=True)
+    write_view_gains(store_dir, pd.DataFrame({'channelId': [], 'channelTitle': [], 'date': [], 'views': []}, dtype=str).astype({'views': 'int64'}))
+    write_channels(store_dir, pd.DataFrame({col: [] for col in CHANNEL_COLUMNS}, dtype=str))
+    write_first_days(store_dir, pd.DataFrame({'video_id': [], 'day': []}, dtype=str))
+    _write_manifest(store_dir, {'version': 0, 'days': [], 'files': []})
+
+
+def add_day(store_dir, day_df, files=()):
+    '''
+    Write the partition of a new (or replaced) trending day and bump the dataset version
+    :param day_df: pd.DataFrame: cleaned rows of one trending day
+    :param files: list of source file names recorded as ingested
+    :return: (day, new manifest)
+    '''
+    day = write_videos_day(store_dir, day_df)
+    first = read_first_days(store_dir)
+    # videos trending again keep the day they were first seen
+    new = pd.DataFrame({'video_id': day_df['video_id'].unique().astype(str), 'day': day})
+    first = pd.concat([first, new], ignore_index=True).groupby('video_id', as_index=False, sort=False)['day'].min()
+    write_first_days(store_dir, first)
+    manifest = read_manifest(store_dir)
+    manifest['days'] = sorted(set(manifest['days']) | {day})
+    manifest['files'] = manifest['files'] + [name for name in files if name not in manifest['files']]
+    manifest['version'] += 1
+    _write_manifest(store_dir, manifest)
+    return day, manifest
+
+
+def read_videos_table(store_dir, columns=None, days=None):
+    '''
+    Video rows of the store as one Arrow table over the memory-mapped day files, nothing is copied
+    :param store_dir: str
+    :param columns: list of column names to read, all columns by default
+    :param days: list of 'YYYY-MM-DD' trending days to read, all days by default
+    :return: pa.Table
+    '''
+    if days is None:
+        days = read_manifest(store_dir)['days']
+    tables = [read_table(os.path.join(store_dir, 'videos', day + '.arrow'), columns) for day in days]
+    # days written before a column was added read it as nulls
+    return pa.concat_tables(tables, promote_options='default')
+
+
+def to_frame(table):
+    '''
+    pandas frame of a videos table
+    :return: pd.DataFrame with categorical categoryIdName / channel_type / country
+    '''
+    df = table.to_pandas(split_blocks=True)
+    # every partition has its own dictionary, order the categories so groupby sorts them like plain strings
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories), ordered=True)
+    return df
+
+
+def read_videos(store_dir, columns=None, days=None):
+    '''
+    Read the video rows of the store into pandas (see read_videos_table)
+    :return: pd.DataFrame with categorical categoryIdName / channel_type / country
+    '''
+    return to_frame(read_videos_table(store_dir, columns, days))
+
+
+def read_view_gains(store_dir):
+    '''
+    Social blade daily view gains as a long table of channelId, channelTitle, date and views
+    '''
+    return read_table(os.path.join(store_dir, 'view_gains.arrow')).to_pandas()
+
+
+def read_channels(store_dir):
+    return read_table(os.path.join(store_dir, 'channels.arrow')).to_pandas()
+
+
+def ensure_store(store_dir, pickle_path):
+    '''
+    Build the store from the legacy pickle the first time the app starts without one
+    '''
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        write_store(pd.read_pickle(pickle_path), store_dir)
+
+
+if __name__ == '__main__':
+    # python store.py data/final.pkl data/store
+    write_store(pd.read_pickle(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,211 @@
+import numpy as np
+import pyarrow as pa
+import scipy.sparse as sp
+import os
+import re
+import sys
+from collections import Counter
+
+import store
+
+
+####### Term frequency index of titles, descriptions and tags
+# Counts of every term in the videos first trending on each day, as a sparse day x term matrix
+# per field, extended by one row at every ingested day. The terms of any range of days are a
+# sum of its rows (word clouds, top terms chart and /api/top_terms).
+# data/store/terms/
+#     meta.json           store version the index was built from, 'days' in matrix row order
+#     <field>.npz         CSR day x term counts
+#     <field>.arrow       'term' of every matrix column
+
+# field -> text column of the store
+FIELDS = {'title': 'title_cleaned', 'desc': 'desc_cleaned', 'tags': 'tags'}
+
+# same tokens stylecloud (wordcloud.process_text) takes from the joined text
+TERM_PATTERN = re.compile(r"\w[\w']*")
+
+
+def _terms_dir(store_dir):
+    return os.path.join(store_dir, 'terms')
+
+
+def _stopwords():
+    from wordcloud import STOPWORDS
+    return STOPWORDS
+
+
+def field_text(field, values):
+    '''
+    Text of every video for a field, like the joined strings the word cloud used to be drawn from
+    '''
+    if field == 'tags':
+        return ['' if x == '[none]' else ' '.join(x.split('|')) for x in values]
+    return [' '.join(x) for x in values]
+
+
+def count_terms(texts, stopwords):
+    '''
+    Lowercase term counts of texts without stopwords, numbers and possessive 's
+    '''
+    counts = Counter()
+    for text in texts:
+        for term in TERM_PATTERN.findall(text):
+            if term.lower().endswith("'s"):
+                term = term[:-2]
+            if term.isdigit() or term.lower() in stopwords:
+                continue
+            counts[term.lower()] += 1
+    return counts
+
+
+def count_day(first_df):
+    '''
+    Term counts of one trending day
+    :param first_df: pd.DataFrame: text columns of the videos first trending on that day
+    :return: dict of field -> Counter
+    '''
+    stopwords = _stopwords()
+    return {field: count_terms(field_text(field, first_df[column].values), stopwords) for field, column in FIELDS.items()}
+
+
+def _first_rows(day_df, seen):
+    return day_df[~day_df['video_id'].isin(seen)].drop_duplicates(subset='video_id', keep='first')
+
+
+def _read_field(store_dir, field):
+    matrix = sp.load_npz(os.path.join(_terms_dir(store_dir), field + '.npz')).tocsr()
+    terms = store.read_table(os.path.join(_terms_dir(store_dir), field + '.arrow')).column('term').to_pylist()
+    return matrix, terms
+
+
+def _write_field(store_dir, field, matrix, terms):
+    path = os.path.join(_terms_dir(store_dir), field + '.npz')
+    # save_npz appends .npz to names without it
+    tmp = path[:-len('.npz')] + '.%d.tmp.npz' % os.getpid()
+    sp.save_npz(tmp, matrix.tocsr())
+    os.replace(tmp, path)
+    store.write_table(pa.table({'term': pa.array(terms, pa.string())}),
+                      os.path.join(_terms_dir(store_dir), field + '.arrow'))
+
+
+def _to_rows(day_counts, terms):
+    '''
+    Sparse rows of day_counts (list of Counter), adding unseen terms at the end of terms
+    '''
+    codes = {term: code for code, term in enumerate(terms)}
+    rows, cols, values = [], [], []
+    for row, counts in enumerate(day_counts):
+        for term, count in counts.items():
+            if term not in codes:
+                codes[term] = len(terms)
+                terms.append(term)
+            rows.append(row)
+            cols.append(codes[term])
+            values.append(count)
+    return sp.csr_matrix((np.array(values, dtype=np.int32), (rows, cols)), shape=(len(day_counts), len(terms)))
+
+
+def build_terms(store_dir):
+    '''
+    Rebuild the index of every day from the text columns of the store
+    '''
+    manifest = store.read_manifest(store_dir)
+    days = sorted(manifest['days'])
+    seen = set()
+    day_counts = []
+    for day in days:
+        first_df = _first_rows(store.read_videos(store_dir, ['video_id'] + list(FIELDS.values()), days=[day]), seen)
+        seen.update(first_df['video_id'])
+        day_counts.append(count_day(first_df))
+    os.makedirs(_terms_dir(store_dir), exist_ok=True)
+    for field in FIELDS:
+        terms = []
+        matrix = _to_rows([counts[field] for counts in day_counts], terms)
+        _write_field(store_dir, field, matrix, terms)
+    store.write_json(os.path.join(_terms_dir(store_dir), 'meta.json'), {'version': manifest['version'], 'days': days})
+
+
+def append_terms(store_dir, day, day_df, version):
+    '''
+    Add (or replace) the row of one trending day, later than the days of the store
+    '''
+    meta_path = os.path.join(_terms_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta_path):
+        build_terms(store_dir)
+        return
+    meta = store.read_json(meta_path)
+
+    seen = store.seen_before(store_dir, day)
+    counts = count_day(_first_rows(day_df, seen))
+
+    for field in FIELDS:
+        matrix, terms = _read_field(store_dir, field)
+        row = _to_rows([counts[field]], terms)
+        matrix.resize((matrix.shape[0], len(terms)))
+        if day in meta['days']:
+            matrix = matrix.tolil()
+            matrix[meta['days'].index(day)] = row
+        else:
+            matrix = sp.vstack([matrix, row])
+        _write_field(store_dir, field, matrix, terms)
+    if day not in meta['days']:
+        meta['days'].append(day)
+    meta['version'] = version
+    store.write_json(meta_path, meta)
+
+
+def ensure_terms(store_dir):
+    '''
+    Build the index when missing or older than the store
+    '''
+    meta = os.path.join(_terms_dir(store_dir), 'meta.json')
+    if not os.path.exists(meta) or store.read_json(meta)['version'] != store.read_manifest(store_dir)['version']:
+        build_terms(store_dir)
+
+
+class TermIndex:
+    '''
+    Day x term count matrices of every field, a range of days is a sum of rows
+    '''
+    def __init__(self, store_dir):
+        self.rows = {day: row for row, day in enumerate(store.read_json(os.path.join(_terms_dir(store_dir), 'meta.json'))['days'])}
+        self.matrix = {}
+        self.terms = {}
+        for field in FIELDS:
+            matrix, terms = _read_field(store_dir, field)
+            self.matrix[field] = matrix
+            self.terms[field] = np.array(terms, dtype=object)
+
+    def totals(self, field, days):
+        '''
+        Count of every term over days
+        :param days: list of 'YYYY-MM-DD'
+        :return: np.array aligned with self.terms[field]
+        '''
+        rows = [self.rows[day] for day in days if day in self.rows]
+        return np.asarray(self.matrix[field][rows].sum(axis=0)).ravel()
+
+    def top(self, field, days, n):
+        '''
+        Most frequent terms of the videos first trending on days
+        :return: dict of term -> count, at most n terms, most frequent first
+        '''
+        totals = self.totals(field, days)
+        if n <= 0:
+            return {}
+        if n < len(totals):
+            # terms above the n-th largest count, then the first terms tied with it
+            kth = np.partition(totals, len(totals) - n)[len(totals) - n]
+            above = np.flatnonzero(totals > kth)
+            top = np.concatenate([above, np.flatnonzero(totals == kth)[:n - len(above)]])
+        else:
+            top = np.arange(len(totals))
+        # ties by first appearance of the term
+        top = top[np.lexsort((top, -totals[top]))]
+        top = top[totals[top] > 0]
+        return {term: int(count) for term, count in zip(self.terms[field][top], totals[top])}
+
+
+if __name__ == '__main__':
+    # python terms.py data/store
+    build_terms(sys.argv[1])
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+####### Top K videos by a metric
+# Rows of every trending day are ordered once by metric, so the top K of a day is a slice and
+# the top K of a range merges the heads of its days: O(days x K) instead of sorting the rows.
+
+# choices of the top K dropdowns
+K_OPTIONS = [5, 10, 15, 20, 25]
+
+
+def top_k(values, k, tiebreak=None):
+    '''
+    Positions of the k largest values, largest first, via argpartition
+    :param tiebreak: np.array: among equal values the larger tiebreak comes first, position by default
+    '''
+    values = np.asarray(values)
+    tiebreak = np.arange(len(values)) if tiebreak is None else np.asarray(tiebreak)
+    if k < len(values):
+        # values above the k-th largest, then the ties with it by tiebreak
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)
+        ties = ties[np.argsort(-tiebreak[ties], kind='stable')][:k - len(above)]
+        top = np.concatenate([above, ties])
+    else:
+        top = np.arange(len(values))
+    return top[np.lexsort((-tiebreak[top], -values[top]))]
+
+
+class TopK:
+    '''
+    Top K rows of every video by metric over a range of days, counting each video by its last
+    row in the range (like drop_duplicates(keep='last') before sort_values(metric)[-K:])
+    :param videos: dayframe.DayFrame
+    :param metrics: list of numeric columns
+    :param table: pa.Table of the rows of videos.frame in the same order (e.g. the memory-mapped store),
+                  frame then converts only the top rows of it instead of keeping videos.frame
+    '''
+    def __init__(self, videos, metrics, table=None):
+        if table is not None and table.num_rows != len(videos):
+            raise ValueError('table has {} rows for {} videos'.format(table.num_rows, len(videos)))
+        self.table = table
+        self.videos_frame = videos.frame if table is None else None
+        self.offsets = videos.offsets
+        self.next_day = videos.occurrences.next_day
+        days = videos.day_codes()
+        rows = np.arange(len(videos))
+        self.values = {}
+        self.order = {}
+        for metric in metrics:
+            values = videos.frame[metric].to_numpy()
+            # rows grouped by day, largest metric first, later rows first among ties
+            self.values[metric] = values
+            self.order[metric] = np.lexsort((-rows, -values, days))
+
+    def _day_head(self, metric, day, end, k):
+        '''
+        First k rows of a day in metric order that are the last row of their video up to day end
+        '''
+        day_rows = self.order[metric][self.offsets[day]:self.offsets[day + 1]]
+        take = 2 * k
+        while True:
+            head = day_rows[:take]
+            head = head[self.next_day[head] > end]
+            if len(head) >= k or take >= len(day_rows):
+                return head[:k]
+            take *= 2
+
+    def rows(self, metric, start, end, k):
+        '''
+        Row positions of the top k over the days start to end, largest first
+        '''
+        candidates = [self._day_head(metric, day, end, k) for day in range(start, end + 1)]
+        candidates = np.concatenate(candidates) if candidates else np.array([], dtype=np.int64)
+        return candidates[top_k(self.values[metric][candidates], k, tiebreak=candidates)]
+
+    def frame(self, metric, start, end, k):
+        '''
+        Top k rows over the days start to end in ascending metric order, like sort_values(metric)[-k:]
+        '''
+        rows = self.rows(metric, start, end, k)[::-1]
+        if self.table is None:
+            return self.videos_frame.iloc[rows]
+        frame = self.table.take(rows).to_pandas()
+        frame.index = rows
+        return frame
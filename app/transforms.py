@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import datetime
+import re
+
+
+####### Cleaning transforms of 02_EDA_Clean.ipynb, vectorized over whole columns
+
+# category names mapping from Youtube API
+CATEGORY_MAPPING = {1: 'Film & Animation',
+                    2: 'Autos & Vehicles',
+                    10: 'Music',
+                    15: 'Pets & Animals',
+                    17: 'Sports',
+                    18: 'Short Movies',
+                    19: 'Travel & Events',
+                    20: 'Gaming',
+                    21: 'Videoblogging',
+                    22: 'People & Blogs',
+                    23: 'Comedy',
+                    24: 'Entertainment',
+                    25: 'News & Politics',
+                    26: 'Howto & Style',
+                    27: 'Education',
+                    28: 'Science & Technology',
+                    29: 'Nonprofits & Activism',
+                    30: 'Movies',
+                    31: 'Anime/Animation',
+                    32: 'Action/Adventure',
+                    33: 'Classics',
+                    34: 'Comedy',
+                    35: 'Documentary',
+                    36: 'Drama',
+                    37: 'Family',
+                    38: 'Foreign',
+                    39: 'Horror',
+                    40: 'Sci-Fi/Fantasy',
+                    41: 'Thriller',
+                    42: 'Shorts',
+                    43: 'Shows',
+                    44: 'Trailers'
+                   }
+
+# multiplier of the social blade subscriber suffix
+SUBS_SUFFIX = {'K': 1000, 'M': 1000000}
+
+
+def category_name(category_id):
+    '''
+    Youtube category name of every categoryId
+    '''
+    return category_id.map(CATEGORY_MAPPING)
+
+
+def trending_date(trending_date):
+    '''
+    yy.dd.mm trending date of the API files to the time the trending list is taken (20:00 UTC)
+    '''
+    return pd.to_datetime(trending_date, utc = True, format = '%y.%d.%m') + datetime.timedelta(hours=20)
+
+
+def published_wib(published_at):
+    '''
+    UTC publishedAt of the API to WIB (UTC+7)
+    '''
+    return pd.to_datetime(published_at) + datetime.timedelta(hours = 7)
+
+
+def time_to_trend(trending_date, published_at):
+    '''
+    Hours (with minutes as fraction) from publish to trending, same float ops as days_hours_minutes
+    '''
+    td = trending_date - published_at
+    days = td.dt.days
+    seconds = td.dt.seconds
+    return days * 24 + seconds // 3600 + ((seconds // 60) % 60) / 60
+
+
+def publish_cat(published_at):
+    '''
+    Publish time rounded to the closest half hour ('7:00', '7:30', ...), minutes >= 45 go to the next hour
+    '''
+    # label of every (hour, minute bucket): [0, 15) -> h:00, [15, 45) -> h:30, [45, 60) -> h+1:00
+    labels = np.array([label for hour in range(24) for label in (str(hour) + ':00', str(hour) + ':30', str(hour + 1) + ':00')], dtype=object)
+    hour = published_at.dt.hour.to_numpy()
+    # NaT has no hour or minute, the original formats it as 'nan:00'
+    missing = pd.isna(hour)
+    bucket = np.searchsorted([15, 45], np.where(missing, 0, published_at.dt.minute.to_numpy()), side='right')
+    final = labels[np.where(missing, 0, hour).astype(np.int64) * 3 + bucket]
+    final[missing] = 'nan:00'
+    return pd.Series(final, index=published_at.index)
+
+
+def curr_subs_num(curr_subs):
+    '''
+    Social blade subscriber strings ('1.23M', '950K') to numbers, -1 when unknown
+    '''
+    # channels repeat on every trending day, convert each distinct string once
+    codes, uniques = pd.factorize(curr_subs)
+    subs = pd.Series(uniques)
+    empty = subs == ''
+    subs = subs.where(~empty, '0K')
+    number = subs.str[:-1]
+    multiplier = subs.str[-1].map(SUBS_SUFFIX)
+    digits = number.str.replace('.', '', regex=False).astype(np.int64)
+    # digits after the point are scaled back, '1.23' -> 123 / 10**2
+    point_pos = 3 - number.str.find('.')
+    # like the original, a point at position 4 (point_pos -1) counts as no point
+    has_point = number.str.contains('.', regex=False) & (point_pos != -1)
+    scaled = (digits / (10.0 ** point_pos.where(has_point, 0)) * multiplier).astype(np.int64)
+    final = np.where(empty, -1, np.where(has_point, scaled, digits * multiplier))
+    return pd.Series(final[codes], index=curr_subs.index)
+
+
+def curr_subs_cat(curr_subs_num):
+    '''
+    Subscriber bucket of every curr_subs_num, 'N/A' when unknown
+    '''
+    conditions = [curr_subs_num == -1, curr_subs_num <= 500000, curr_subs_num <= 1000000,
+                  curr_subs_num <= 5000000, curr_subs_num <= 10000000]
+    choices = ['N/A', '<500k', '500k-1M', '1M-5M', '5M-10M']
+    return pd.Series(np.select(conditions, choices, default='>10M'), index=curr_subs_num.index, dtype=object)
+
+
+def channel_type(channel_type, category_name):
+    '''
+    Social blade channel type, the video category when social blade has none
+    '''
+    return channel_type.where(channel_type != '', category_name)
+
+
+####### Text cleaning (per document regexes, nltk stopwords)
+_stopwords = None
+
+
+def _get_stopwords():
+    global _stopwords
+    if _stopwords is None:
+        from nltk.corpus import stopwords
+        _stopwords = set(stopwords.words('english')) | set(stopwords.words('indonesian'))
+    return _stopwords
+
+
+def _tokens(no_punc):
+    # remove all foreign chars (korean, japanese / chinese)
+    no_punc = re.sub(r'[\uAC00-\uD7AF]+', '', no_punc)
+    no_punc = re.sub(r'[\u3000-\u303f\u3040-\u309f\u30a0-\u30ff\uff00-\uff9f\u4e00-\u9faf\u3400-\u4dbf]+', '', no_punc)
+    no_punc = re.sub(r'[^a-zA-Z\s0-9\u00C0-\u00FF]+','', no_punc)  #remove any remaining foreign chars
+    no_punc = re.sub(r'\s+', ' ', no_punc)  #remove multiple spaces
+    stop = _get_stopwords()
+    words = [i.lower() for i in no_punc.split(' ')]
+    return [word for word in words if word not in stop and len(word) > 1]
+
+
+def clean_title(x):
+    '''
+    Lowercase title words without punctuation, foreign characters, stopwords and single characters
+    '''
+    no_punc = re.sub(r'[^\w\s]','', x)  #strips all punctuation and emojis
+    no_punc = re.sub(r'\s+', ' ', no_punc)  #remove multiple spaces
+    return _tokens(no_punc)
+
+
+def clean_desc(x):
+    '''
+    Lowercase description words without urls, emails, punctuation, foreign characters, stopwords and single characters
+    '''
+    if pd.isnull(x) == True:
+        return []
+
+    no_punc = re.sub(r'https\S+', '', x) # remove all url
+    no_punc = re.sub(r'http\S+', '', no_punc) # remove all url
+    no_punc = re.sub(r'\S*@\S*\s?','', no_punc) # remove all emails
+    no_punc = re.sub(r'[^\w\s]','', no_punc)  #strips all punctuation and emojis
+    no_punc = re.sub(r'\s+', ' ', no_punc)  #remove multiple spaces
+    no_punc = re.sub(r'_*', '', no_punc) # repalce ____
+    no_punc = re.sub(r'[^a-zA-Z\s0-9\u00C0-\u00FF]', '', no_punc)  #remove indian, russian, etc others
+    return _tokens(no_punc)
@@ -0,0 +1,103 @@
+####### Row-wise cleaning functions as written in 02_EDA_Clean.ipynb
+# Kept unchanged as the reference the vectorized transforms.py is checked against (tests/test_transforms.py).
+
+category_mapping = {1: 'Film & Animation',
+                    2: 'Autos & Vehicles',
+                    10: 'Music',
+                    15: 'Pets & Animals',
+                    17: 'Sports',
+                    18: 'Short Movies',
+                    19: 'Travel & Events',
+                    20: 'Gaming',
+                    21: 'Videoblogging',
+                    22: 'People & Blogs',
+                    23: 'Comedy',
+                    24: 'Entertainment',
+                    25: 'News & Politics',
+                    26: 'Howto & Style',
+                    27: 'Education',
+                    28: 'Science & Technology',
+                    29: 'Nonprofits & Activism',
+                    30: 'Movies',
+                    31: 'Anime/Animation',
+                    32: 'Action/Adventure',
+                    33: 'Classics',
+                    34: 'Comedy',
+                    35: 'Documentary',
+                    36: 'Drama',
+                    37: 'Family',
+                    38: 'Foreign',
+                    39: 'Horror',
+                    40: 'Sci-Fi/Fantasy',
+                    41: 'Thriller',
+                    42: 'Shorts',
+                    43: 'Shows',
+                    44: 'Trailers'
+                   }
+
+
+# FILL MISSING CHANNEL GENRE WITH VIDEO TYPE
+def fill_missing_channel_type(x):
+    if x['channel_type'] != '':
+        return x['channel_type']
+    else:
+        return x['categoryIdName']
+
+
+# convert time_to_tend to hours
+def days_hours_minutes(td):
+    days = td.days
+    hours = td.seconds //3600
+    minutes = (td.seconds//60)%60
+    return days * 24 + hours + minutes / 60
+
+
+# get publishing hour category (based on hours:00/30)
+def get_publish_hour(x):
+    hour = x.hour
+    minute = x.minute
+    if hour == 24:
+        return '00:00'
+    if minute >= 45:
+        return str(str((hour + 1)) + ':00')
+    elif minute >= 15 and minute < 45:
+        return str(str(hour) + ':30')
+    else:
+        return str(str(hour) + ':00')
+
+
+def convert_curr_subs(x):
+    curr_subs = x['curr_subs']
+    if curr_subs == '':
+        return int(-1)
+    last_str = curr_subs[-1]
+    number = curr_subs[:-1]
+    point_pos = -1
+    if '.' in number:
+        point_pos = 3 - number.index('.')
+
+    if last_str == 'K':
+        last_str = 1000
+    elif last_str == 'M':
+        last_str = 1000000
+
+    if point_pos != -1:
+        final_num = int(number.replace('.','')) / (10 ** point_pos) * last_str
+    else:
+        final_num = int(number.replace('.','')) * last_str
+    return int(final_num)
+
+
+def curr_subs_cat(x):
+    if x == -1:
+        return 'N/A'
+    if x <= 500000:
+        return '<500k'
+    elif x <= 1000000:
+        return '500k-1M'
+    elif x <= 5000000:
+        return '1M-5M'
+    elif x <= 10000000:
+        return '5M-10M'
+    else:
+        return '>10M'
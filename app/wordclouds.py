@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import flask
+
+import cache
+
+
+####### Word clouds of the weekly tab
+# Drawn from the term counts of a range of days (see terms.py). Images are rendered by
+# stylecloud in a process pool, off the request thread, into
+# data/wordclouds/<version>-<sha1 of field and days>.jpg and served from /wordclouds/<key>.
+# Like the callback cache, images of older dataset versions are deleted on start and the
+# least recently used images go past max_files. A range without words is never rendered, a
+# render that fails is logged and queued again by the next poll.
+
+# stylecloud icon of every field
+ICONS = {'title': 'fab fa-youtube', 'desc': 'fab fa-youtube', 'tags': 'fas fa-hashtag'}
+
+MAX_WORDS = 200
+
+ROUTE = '/wordclouds/'
+
+logger = logging.getLogger(__name__)
+
+
+def render(frequencies, icon_name, path):
+    '''
+    Draw a word cloud of frequencies into path (runs in a worker process)
+    '''
+    import stylecloud
+
+    # stylecloud writes its icon mask into icon_dir, one per render so workers do not collide
+    icon_dir = tempfile.mkdtemp(prefix='stylecloud_')
+    tmp = '%s.%d.tmp.jpg' % (path[:-len('.jpg')], os.getpid())
+    try:
+        stylecloud.gen_stylecloud(text=frequencies, icon_name=icon_name, max_words=MAX_WORDS,
+                                  palette='cartocolors.diverging.TealRose_7', background_color="black",
+                                  icon_dir=icon_dir, output_name=tmp)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(icon_dir, ignore_errors=True)
+
+
+class WordCloudRenderer:
+    '''
+    Word cloud images cached by (dataset version, field, days), rendered in the background
+    :param cache_dir: str: directory of the rendered images
+    :param version: dataset version the process serves (store manifest version)
+    :param workers: int: rendering processes
+    :param max_files: int: images kept on disk
+    '''
+    def __init__(self, cache_dir, version, workers=2, max_files=256):
+        self.cache_dir = cache_dir
+        self.version = str(version)
+        self.workers = workers
+        self.max_files = max_files
+        # keys of the ranges without any word
+        self.empty = set()
+        self._reset()
+        # the pool's manager thread and locks do not survive a fork (gunicorn --preload): a forked
+        # process starts empty and creates its own pool on its first render, so the pool's own
+        # rendering processes never start one
+        os.register_at_fork(after_in_child=self._reset)
+        os.makedirs(cache_dir, exist_ok=True)
+        cache.purge(cache_dir, self.version)
+
+    def _reset(self):
+        self.pool = None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        '''
+        Rendering pool of this process, created on first use (call with self.lock held)
+        '''
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool
+
+    def shutdown(self, wait=True):
+        '''
+        Stop the rendering pool, waiting for the queued renders by default
+        '''
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def key(self, field, days):
+        return self.version + '-' + hashlib.sha1('|'.join([field] + list(days)).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.jpg')
+
+    def _done(self, key, future):
+        if future.exception() is not None:
+            # not cached, the next src call renders it again
+            logger.error('word cloud %s failed to render', key, exc_info=future.exception())
+        with self.lock:
+            self.pending.pop(key, None)
+        self._evict_files()
+
+    def _evict_files(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.jpg') and not name.endswith('.tmp.jpg'):
+                try:
+                    entries.append((os.stat(os.path.join(self.cache_dir, name)).st_mtime, name))
+                except FileNotFoundError:
+                    pass
+        if len(entries) <= self.max_files:
+            return
+        entries.sort()
+        for _, name in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def src(self, field, days, frequencies):
+        '''
+        Image url of the word cloud of field over days, queuing its rendering the first time
+        :param frequencies: function returning the dict of word -> count, only called to render
+        :return: (state, url): state 'ready' / 'pending' / 'empty' (no words), url None unless ready
+        '''
+        key = self.key(field, days)
+        try:
+            # a hit keeps the image out of the eviction
+            os.utime(self.path(key))
+            return 'ready', ROUTE + key
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            if key in self.empty:
+                return 'empty', None
+            if key in self.pending:
+                return 'pending', None
+            words = frequencies()
+            if not words:
+                self.empty.add(key)
+                return 'empty', None
+            future = self._executor().submit(render, words, ICONS[field], self.path(key))
+            self.pending[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return 'pending', None
+
+    def serve(self, key):
+        path = self.path(key)
+        if not re.fullmatch(re.escape(self.version) + r'-[0-9a-f]{40}', key) or not os.path.exists(path):
+            flask.abort(404)
+        return flask.send_file(os.path.abspath(path), mimetype='image/jpeg', max_age=86400)
+
+    def register(self, server):
+        '''
+        Add the word cloud route to the flask server of the app
+        '''
+        server.add_url_rule(ROUTE + '<key>', 'wordclouds', self.serve)
@@ -0,0 +1,260 @@
+'''
+Benchmarks for the hot paths of mgp.py and the dashboard callbacks of app/app.py
+
+    python benchmarks/bench.py --output results.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json
+    python benchmarks/bench.py --save-baseline benchmarks/baseline.json
+
+Corpora and trending frames are synthetic (see synthetic.py) and seeded, so two runs on the
+same machine measure the same work. Each result is the median of --repeat runs in seconds,
+after a warm up call, with short calls looped within a run (see measure).
+With --baseline, every result slower than the baseline by more than --tolerance is reported
+as a regression and the exit code is 1.
+'''
+import argparse
+import gc
+import importlib
+import inspect
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import plotly.io.json as pio_json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP_DIR = os.path.join(ROOT, 'app')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import synthetic
+from mgp import MovieGroupProcess
+
+
+def measure(func, repeat, warmup=True, min_time=0.1):
+    '''
+    Median wall time of one call of func over repeat runs, in seconds. An untimed first call
+    takes the one off costs (lazy imports, plotly validators) and sizes the runs: calls shorter
+    than min_time are looped within a run, so millisecond timings are not scheduler noise.
+    The garbage collector is off while timing, like timeit.
+    '''
+    number = 1
+    if warmup:
+        start = time.perf_counter()
+        func()
+        number = int(min_time / max(time.perf_counter() - start, 1e-6)) + 1
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        gc.enable()
+    return statistics.median(times)
+
+
+def bench_mgp(sizes, repeat, K=20, n_iters=3, n_score=1000):
+    '''
+    Time MovieGroupProcess.fit, score, choose_best_label and score_many on synthetic corpora
+    :param sizes: list of int: corpus sizes in documents
+    :return: dict of benchmark name -> seconds
+    '''
+    results = {}
+    for size in sizes:
+        docs, vocab_size = synthetic.corpus(size, seed=size)
+        sample = docs[:n_score]
+        for backend in ('dict', 'numpy'):
+            # the dict backend takes minutes per sweep past 1e5 documents
+            if backend == 'dict' and size > 100000:
+                continue
+            mgp = MovieGroupProcess(K=K, n_iters=n_iters, backend=backend, random_state=0)
+            results['mgp.fit.%s.%d' % (backend, size)] = measure(
+                lambda: mgp.fit(docs, vocab_size, verbose=False), 1, warmup=False)
+
+            name = '%s.%d' % (backend, size)
+            results['mgp.score.' + name] = measure(lambda: [mgp.score(doc) for doc in sample], repeat)
+            results['mgp.choose_best_label.' + name] = measure(
+                lambda: [mgp.choose_best_label(doc) for doc in sample], repeat)
+            results['mgp.score_many.' + name] = measure(lambda: mgp.score_many(sample), repeat)
+    return results
+
+
+def dash_value(value):
+    '''
+    Round trip a value through the JSON encoding Dash uses between browser and server
+    '''
+    return json.loads(pio_json.to_json_plotly(value))
+
+
+def callback_inputs(dashboard):
+    '''
+    Value for every callback input id, as the browser would send it on first load
+    '''
+    date_list = dashboard.date_list
+    return {
+        'date_selector': dash_value(date_list[-1]),
+        'date_slider': [0, len(date_list) - 1],
+        'app-tabs': 'tab1',
+        'learn-more-button': 0,
+        'markdown_close': 0,
+        'word_cloud_interval': 0,
+        'top_terms_field': 'title',
+        'top_k_daily': 10,
+        'top_k_weekly': 10,
+        'weekly_summary': {'start': 0, 'end': len(date_list) - 1, 'k': 10},
+    }
+
+
+def drain(dashboard):
+    '''
+    Wait for the word clouds and images a callback queued in the background, so their
+    rendering does not compete for CPU with the callbacks timed after it
+    '''
+    dashboard.word_clouds.shutdown()
+    dashboard.images.shutdown()
+
+
+def clear_cache(dashboard):
+    '''
+    Drop the memoized callback outputs of the memory and disk cache, so the next call computes them
+    '''
+    dashboard.cache.memory.clear()
+    for name in os.listdir(dashboard.cache.cache_dir):
+        os.remove(os.path.join(dashboard.cache.cache_dir, name))
+
+
+def bench_app(days, repeat, only=None):
+    '''
+    Time every date driven Dash callback of app/app.py on synthetic trending data
+    :param days: list of int: number of trending days in the synthetic frame
+    :param only: str: only run callbacks whose name contains this string
+    :return: dict of benchmark name -> seconds
+    '''
+    results = {}
+    cwd = os.getcwd()
+    sys.path.insert(0, APP_DIR)
+    try:
+        for n_days in days:
+            # app.py reads data/store and writes images under data/ relative to the working dir
+            workdir = tempfile.mkdtemp(prefix='bench_app_')
+            os.makedirs(os.path.join(workdir, 'data'))
+            shutil.copy(os.path.join(APP_DIR, 'data', 'test.jpg'), os.path.join(workdir, 'data'))
+            store = importlib.import_module('store')
+            rollups = importlib.import_module('rollups')
+            terms = importlib.import_module('terms')
+            moments = importlib.import_module('moments')
+            dayframe = importlib.import_module('dayframe')
+            store.write_store(synthetic.trending_frame(n_days), os.path.join(workdir, 'data', 'store'))
+            rollups.build_rollups(os.path.join(workdir, 'data', 'store'))
+            terms.build_terms(os.path.join(workdir, 'data', 'store'))
+            moments.build_moments(os.path.join(workdir, 'data', 'store'))
+            dayframe.build_occurrences(os.path.join(workdir, 'data', 'store'))
+            os.chdir(workdir)
+
+            start = time.perf_counter()
+            sys.modules.pop('app', None)
+            dashboard = importlib.import_module('app')
+            results['app.startup.%dd' % n_days] = time.perf_counter() - start
+            drain(dashboard)
+
+            values = callback_inputs(dashboard)
+            for spec in dashboard.app.callback_map.values():
+                ids = [item['id'] for item in spec['inputs']]
+                if not {'date_selector', 'date_slider', 'weekly_summary'} & set(ids):
+                    continue
+                # the undecorated callback, bypassing the output cache
+                func = inspect.unwrap(spec['callback'])
+                if only and only not in func.__name__:
+                    continue
+                args = [values.get(i) for i in ids]
+                if func.__name__ == 'update_weekly_summary':
+                    # a slider move computes the summary of the new range, time it without the cached one
+                    call = lambda: (clear_cache(dashboard), func(*args))
+                else:
+                    call = lambda: func(*args)
+                results['app.%s.%dd' % (func.__name__, n_days)] = measure(call, repeat)
+                drain(dashboard)
+
+            # aggregates the weekly charts share, cached after the first call in the loop above
+            if not only or only in 'weekly_summary':
+                summary = inspect.unwrap(dashboard.weekly_summary)
+                results['app.weekly_summary.%dd' % n_days] = measure(lambda: summary(0, len(dashboard.date_list) - 1, 10), repeat)
+
+            os.chdir(cwd)
+            shutil.rmtree(workdir)
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(APP_DIR)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Benchmarks slower than their baseline by more than the tolerance factor
+    :return: dict of benchmark name -> {'baseline', 'current', 'ratio'}
+    '''
+    regressions = {}
+    for name, seconds in results.items():
+        if name in baseline and seconds > baseline[name] * tolerance:
+            regressions[name] = {'baseline': baseline[name], 'current': seconds,
+                                 'ratio': seconds / baseline[name]}
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mgp-sizes', type=int, nargs='*', default=[1000, 10000, 100000],
+                        help='corpus sizes for the mgp benchmarks, up to 1000000')
+    parser.add_argument('--days', type=int, nargs='*', default=[7, 90, 365],
+                        help='trending days in the synthetic dashboard data')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-mgp', action='store_true', help='skip the mgp benchmarks')
+    parser.add_argument('--skip-app', action='store_true', help='skip the dashboard benchmarks')
+    parser.add_argument('--only', help='only report benchmarks whose name contains this string')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--save-baseline', help='write the results as a new baseline file')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown factor over the baseline reported as a regression')
+    args = parser.parse_args()
+
+    results = {}
+    if not args.skip_mgp:
+        results.update(bench_mgp(args.mgp_sizes, args.repeat))
+    if not args.skip_app:
+        results.update(bench_app(args.days, args.repeat, only=args.only))
+    if args.only:
+        results = {name: seconds for name, seconds in results.items() if args.only in name}
+
+    report = {
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        report['regressions'] = compare(results, baseline, args.tolerance)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                f.write(output + '\n')
+
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import datetime
+
+
+# category names used by the dashboard (subset of the Youtube API mapping in 02_EDA_Clean.ipynb)
+CATEGORIES = ['Music', 'Entertainment', 'People & Blogs', 'Gaming', 'Comedy', 'News & Politics',
+              'Sports', 'Film & Animation', 'Howto & Style', 'Education', 'Autos & Vehicles',
+              'Science & Technology', 'Travel & Events', 'Pets & Animals']
+
+# two letter country codes known to the choropleth code mapping of app.py, '' for unknown
+COUNTRIES = ['ID', 'ID', 'ID', 'ID', 'KR', 'US', 'MY', 'JP', 'IN', 'GB', '']
+
+# social blade ranks known to the sb rank chart of app.py, '' for unknown
+SB_RANKS = ['A++', 'A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'D-', '']
+
+
+def corpus(n_docs, vocab_size=20000, mean_len=12, seed=0):
+    '''
+    Synthetic tokenized corpus with a zipfian word distribution, shaped like title_cleaned
+    :param n_docs: int
+    :param vocab_size: int
+    :param mean_len: float: mean number of tokens per document
+    :param seed: int
+    :return: (list of list of str, vocab_size)
+    '''
+    rng = np.random.default_rng(seed)
+    lengths = np.maximum(1, rng.poisson(mean_len, n_docs))
+    words = np.minimum(rng.zipf(1.3, int(lengths.sum())), vocab_size) - 1
+    vocab = np.array(['w%d' % i for i in range(vocab_size)], dtype=object)
+    tokens = vocab[words].tolist()
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [tokens[offsets[i]:offsets[i + 1]] for i in range(n_docs)], vocab_size
+
+
+def get_publish_hour(x):
+    # same bucketing as get_publish_hour in 02_EDA_Clean.ipynb
+    hour = x.hour
+    minute = x.minute
+    if hour == 24:
+        return '00:00'
+    if minute >= 45:
+        return str(str((hour + 1)) + ':00')
+    elif minute >= 15 and minute < 45:
+        return str(str(hour) + ':30')
+    else:
+        return str(str(hour) + ':00')
+
+
+def trending_frame(n_days, videos_per_day=200, carry_over=0.5, seed=0):
+    '''
+    Synthetic dataframe with the columns and dtypes of data/final.pkl
+    :param n_days: int: number of trending days
+    :param videos_per_day: int: rows per trending day (the Youtube API returns 200)
+    :param carry_over: float: share of each day's videos that trended the day before
+    :param seed: int
+    :return: pd.DataFrame
+    '''
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2020-07-08', tz='UTC') + datetime.timedelta(hours=20)
+    n_channels = min(3000, max(300, n_days * 40))
+    words, _ = corpus(n_days * videos_per_day * 3, vocab_size=5000, mean_len=8, seed=seed)
+
+    # channel attributes come from social blade and are shared by all videos of a channel
+    view_dates = [(start + datetime.timedelta(days=d - 30)).strftime('%Y-%m-%d') for d in range(n_days + 31)]
+    channels = pd.DataFrame({
+        'channelId': ['UC%06d' % i for i in range(n_channels)],
+        'channelTitle': ['Channel %d' % i for i in range(n_channels)],
+        'avatar_url': '',
+        'country': rng.choice(COUNTRIES, n_channels),
+        'rank_y': rng.choice(SB_RANKS, n_channels),
+        'channel_type': rng.choice(CATEGORIES, n_channels),
+        'curr_subs_num': rng.integers(1000, 50000000, n_channels),
+    })
+    channels['curr_subs'] = [('%.1fM' % (x / 1e6)) if x >= 1e6 else ('%dK' % (x // 1000))
+                             for x in channels['curr_subs_num']]
+    channels['past_view_gains'] = [dict(zip(view_dates, rng.integers(0, 10000000, len(view_dates)).tolist()))
+                                   for _ in range(n_channels)]
+
+    rows = []
+    next_video = 0
+    previous = []
+    for day in range(n_days):
+        trending_date = start + datetime.timedelta(days=day)
+        kept = [v for v in previous if rng.random() < carry_over][:videos_per_day]
+        new = list(range(next_video, next_video + videos_per_day - len(kept)))
+        next_video += len(new)
+        today = kept + new
+        for rank, video in enumerate(today, 1):
+            rows.append((video, trending_date, rank))
+        previous = today
+
+    df = pd.DataFrame(rows, columns=['video', 'trending_date', 'rank'])
+    videos = df['video'].values
+    n_videos = next_video
+    video_channel = rng.integers(0, n_channels, n_videos)
+    # published up to a week before the first day the video trends, shifted to WIB
+    first_trending = pd.DatetimeIndex(df.groupby('video')['trending_date'].min())
+    published = first_trending - pd.to_timedelta(rng.integers(60, 7 * 24 * 60, n_videos), unit='m')
+
+    df['video_id'] = ['v%08d' % v for v in videos]
+    df['title'] = ['Synthetic trending video number %d' % v for v in videos]
+    df['publishedAt'] = published[videos]
+    df['categoryIdName'] = np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), n_videos)][videos]
+    df['tags'] = ['|'.join(words[v][:5]) if v % 5 else '[none]' for v in videos]
+    df['view_count'] = rng.integers(10000, 50000000, len(df))
+    df['likes'] = (df['view_count'] * rng.uniform(0.01, 0.1, len(df))).astype(int)
+    df['dislikes'] = (df['likes'] * rng.uniform(0.01, 0.2, len(df))).astype(int)
+    df['comment_count'] = (df['likes'] * rng.uniform(0.02, 0.3, len(df))).astype(int)
+    df['thumbnail_link'] = ''
+    df['title_cleaned'] = [words[v] for v in videos]
+    df['desc_cleaned'] = [words[v] + words[n_videos + v] + words[2 * n_videos + v] for v in videos]
+    df['publish_cat'] = df['publishedAt'].apply(get_publish_hour)
+    df['time_to_trend'] = (df['trending_date'] - df['publishedAt']).dt.total_seconds() / 3600
+    df['channelId'] = channels['channelId'].values[video_channel][videos]
+    df = pd.merge(df.drop(columns=['video']), channels, on='channelId', how='left')
+    return df
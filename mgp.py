@@ -1,10 +1,29 @@
-from numpy.random import multinomial
 from numpy import log, exp
 from numpy import argmax
+import numpy as np
+from bisect import bisect_right
+from itertools import accumulate, product
+from collections import Counter
+from math import lgamma
 import json
+import time
+
+try:
+    from scipy.special import gammaln
+except ImportError:
+    gammaln = np.vectorize(lgamma, otypes=[float])
+
+# first bytes of a file written by MovieGroupProcess.save
+_MAGIC = b'MGP\x01'
 
 class MovieGroupProcess:
-    def __init__(self, K=8, alpha=0.1, beta=0.1, n_iters=30):
+    __slots__ = ('K', 'alpha', 'beta', 'n_iters', 'backend', 'random_state', 'min_iters', 'max_transfer_rate',
+                 'stable_iters', 'll_tol', 'number_docs', 'vocab_size', 'iterations_run', 'history',
+                 'cluster_doc_count', 'cluster_word_count', '_cluster_word_distribution', 'word_index', 'vocab',
+                 'cluster_word_matrix', '_known_words')
+
+    def __init__(self, K=8, alpha=0.1, beta=0.1, n_iters=30, backend='dict', random_state=None,
+                 min_iters=27, max_transfer_rate=0.0, stable_iters=1, ll_tol=None):
         '''
         A MovieGroupProcess is a conceptual model introduced by Yin and Wang 2014 to
         describe their Gibbs sampling algorithm for a Dirichlet Mixture Model for the
@@ -29,21 +48,77 @@ class MovieGroupProcess:
             that students desire to sit with students of similar interests. A high beta means they are less
             concerned with affinity and are more influenced by the popularity of a table
         :param n_iters:
+        :param backend: str, 'dict' (default) or 'numpy'
+            'dict' keeps the cluster word counts as one dict per cluster keyed by word.
+            'numpy' maps words to integer ids and keeps a dense K x V int32 count matrix so that
+            a document is scored against all K clusters at once. During fit the corpus is held as
+            flat int32 arrays of word ids and counts rather than lists of strings. With 'numpy'
+            cluster_doc_count and cluster_word_count are arrays and cluster_word_distribution is a
+            read-only copy of the count matrix.
+        :param random_state: None, int or numpy.random.Generator
+            Seed or generator used for every random draw of the sampler. Two fits with the
+            same seed produce identical labels.
+        :param min_iters: int
+            fit never stops before this many iterations
+        :param max_transfer_rate: float between 0 and 1
+            fit can stop once the share of documents that changed cluster in an iteration is at most this
+        :param stable_iters: int
+            fit can stop once the number of populated clusters has not changed for this many iterations
+        :param ll_tol: float or None
+            when set, fit can stop only once the relative change of the log likelihood has stayed
+            below ll_tol for stable_iters iterations
+            fit stops when all of the above hold; the defaults give the original rule of zero transfers,
+            an unchanged cluster count and more than 26 iterations
         '''
+        if backend not in ('dict', 'numpy'):
+            raise ValueError("backend must be 'dict' or 'numpy', got %r" % (backend,))
+
         self.K = K
         self.alpha = alpha
         self.beta = beta
         self.n_iters = n_iters
+        self.backend = backend
+        self.random_state = check_random_state(random_state)
+        self.min_iters = min_iters
+        self.max_transfer_rate = max_transfer_rate
+        self.stable_iters = stable_iters
+        self.ll_tol = ll_tol
 
         # slots for computed variables
         self.number_docs = None
         self.vocab_size = None
+        self.iterations_run = 0
+        self.history = []
         self.cluster_doc_count = [0 for _ in range(K)]
         self.cluster_word_count = [0 for _ in range(K)]
         self.cluster_word_distribution = [{} for i in range(K)]
 
+        # numpy backend state: word <-> id tables and the K x V count matrix
+        self.word_index = {}
+        self.vocab = []
+        self.cluster_word_matrix = None
+
+        # dict backend: every word counted in vocab_size by partial_fit, including the words
+        # whose counts expired (the numpy backend keeps them in word_index)
+        self._known_words = None
+
+    @property
+    def cluster_word_distribution(self):
+        '''
+        List of K dicts mapping each word to its count in the cluster. The numpy backend
+        builds it from the count matrix when it is accessed, edits of the result are not kept.
+        '''
+        if self.backend == 'numpy' and self.cluster_word_matrix is not None:
+            return self._matrix_to_dicts()
+        return self._cluster_word_distribution
+
+    @cluster_word_distribution.setter
+    def cluster_word_distribution(self, value):
+        self._cluster_word_distribution = value
+
     @staticmethod
-    def from_data(K, alpha, beta, D, vocab_size, cluster_doc_count, cluster_word_count, cluster_word_distribution):
+    def from_data(K, alpha, beta, D, vocab_size, cluster_doc_count, cluster_word_count, cluster_word_distribution,
+                  random_state=None):
         '''
         Reconstitute a MovieGroupProcess from previously fit data
         :param K:
@@ -54,9 +129,10 @@ class MovieGroupProcess:
         :param cluster_doc_count:
         :param cluster_word_count:
         :param cluster_word_distribution:
+        :param random_state:
         :return:
         '''
-        mgp = MovieGroupProcess(K, alpha, beta, n_iters=30)
+        mgp = MovieGroupProcess(K, alpha, beta, n_iters=30, backend='dict', random_state=random_state)
         mgp.number_docs = D
         mgp.vocab_size = vocab_size
         mgp.cluster_doc_count = cluster_doc_count
@@ -64,23 +140,142 @@ class MovieGroupProcess:
         mgp.cluster_word_distribution = cluster_word_distribution
         return mgp
 
+    def save(self, path):
+        '''
+        Write the fitted model to a compact binary file: a JSON header followed by the
+        cluster counts, the cluster x word counts as a CSR matrix and the vocabulary table
+        :param path: str: output file
+        '''
+        if self.backend == 'numpy':
+            vocab = self.vocab
+            matrix = self.cluster_word_matrix
+            indptr = np.zeros(self.K + 1, dtype=np.int64)
+            indices, data = [], []
+            for z, row in enumerate(matrix):
+                nonzero = np.flatnonzero(row)
+                indices.append(nonzero)
+                data.append(row[nonzero])
+                indptr[z + 1] = indptr[z] + len(nonzero)
+        else:
+            vocab = sorted(self._vocabulary())
+            word_index = {word: i for i, word in enumerate(vocab)}
+            indptr = np.zeros(self.K + 1, dtype=np.int64)
+            indices, data = [], []
+            for z, words in enumerate(self._cluster_word_distribution):
+                ids = np.array(sorted(word_index[word] for word in words), dtype=np.int64)
+                indices.append(ids)
+                data.append(np.array([words[vocab[i]] for i in ids], dtype=np.int64))
+                indptr[z + 1] = indptr[z] + len(ids)
+
+        if any('\n' in word for word in vocab):
+            raise ValueError('words may not contain newlines')
+
+        arrays = {
+            'cluster_doc_count': np.asarray(self.cluster_doc_count, dtype=np.int64),
+            'cluster_word_count': np.asarray(self.cluster_word_count, dtype=np.int64),
+            'indptr': indptr,
+            'indices': np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, np.int32),
+            'data': np.concatenate(data).astype(np.int32) if data else np.zeros(0, np.int32),
+            'vocab': np.frombuffer('\n'.join(vocab).encode('utf-8'), dtype=np.uint8),
+        }
+
+        # lay the arrays out back to back after the header, each aligned to 64 bytes
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            offset += -(-array.nbytes // 64) * 64
+
+        header = json.dumps({
+            'K': self.K, 'alpha': self.alpha, 'beta': self.beta, 'n_iters': self.n_iters,
+            'number_docs': self.number_docs, 'vocab_size': self.vocab_size,
+            'n_words': len(vocab), 'arrays': layout,
+        }).encode('utf-8')
+        start = -(-(len(_MAGIC) + 8 + len(header)) // 64) * 64
+
+        with open(path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(start + layout[name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(start + offset)
+
     @staticmethod
-    def _sample(p):
+    def load(path, random_state=None):
+        '''
+        Read a model written by save. The result uses the numpy backend: the file is read in
+        one pass and the CSR counts are expanded into its dense K x V matrix and word index.
+        :param path: str
+        :param random_state: None, int or numpy.random.Generator
+        :return: MovieGroupProcess
         '''
-        Sample with probability vector p from a multinomial distribution
+        buf = np.fromfile(path, dtype=np.uint8)
+        if buf[:len(_MAGIC)].tobytes() != _MAGIC:
+            raise ValueError('%s is not a MovieGroupProcess file' % path)
+
+        header_size = int(buf[len(_MAGIC):len(_MAGIC) + 8].view(np.uint64)[0])
+        header_end = len(_MAGIC) + 8 + header_size
+        header = json.loads(buf[len(_MAGIC) + 8:header_end].tobytes().decode('utf-8'))
+        start = -(-header_end // 64) * 64
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            offset = start + spec['offset']
+            arrays[name] = buf[offset:offset + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+        K = header['K']
+        mgp = MovieGroupProcess(K, header['alpha'], header['beta'], header['n_iters'],
+                                backend='numpy', random_state=random_state)
+        mgp.number_docs = header['number_docs']
+        mgp.vocab_size = header['vocab_size']
+        mgp.cluster_doc_count = np.array(arrays['cluster_doc_count'], dtype=np.int64)
+        mgp.cluster_word_count = np.array(arrays['cluster_word_count'], dtype=np.int64)
+
+        vocab = arrays['vocab'].tobytes().decode('utf-8')
+        mgp.vocab = vocab.split('\n') if header['n_words'] else []
+        mgp.word_index = {word: i for i, word in enumerate(mgp.vocab)}
+
+        indptr = arrays['indptr']
+        rows = np.repeat(np.arange(K), np.diff(indptr))
+        mgp.cluster_word_matrix = np.zeros((K, len(mgp.vocab)), dtype=np.int32)
+        mgp.cluster_word_matrix[rows, arrays['indices']] = arrays['data']
+        return mgp
+
+    def _sample(self, p, u=None):
+        '''
+        Sample with probability vector p from a categorical distribution by inverse-CDF lookup
         :param p: list
-            List of probabilities representing probability vector for the multinomial distribution
+            List of probabilities representing probability vector for the categorical distribution
+        :param u: float in [0, 1)
+            Uniform draw to use, drawn from random_state when not given. fit draws a whole
+            sweep's worth of uniforms up front and passes them in.
         :return: int
             index of randomly selected output
         '''
-        return [i for i, entry in enumerate(multinomial(1, p)) if entry != 0][0]
+        if u is None:
+            u = self.random_state.random()
+        if isinstance(p, np.ndarray):
+            p = p.tolist()
+        cdf = list(accumulate(p))
+        return min(bisect_right(cdf, u * cdf[-1]), len(cdf) - 1)
 
-    def fit(self, docs, vocab_size):
+    def fit(self, docs, vocab_size, verbose=True, callback=None):
         '''
         Cluster the input documents
         :param docs: list of list
             list of lists containing the unique token set of each document
         :param V: total vocabulary size for each document
+        :param verbose: bool: print the transfers and populated clusters of every iteration
+        :param callback: callable or None
+            called after every iteration with a dict of iteration, seconds, transfers,
+            transfer_rate, clusters and log_likelihood. The same dicts are kept in self.history.
+            Returning True from the callback stops the fit.
+            log_likelihood costs a pass over the cluster counts, it is only computed when ll_tol
+            or a callback is set and is None otherwise.
         :return: list of length len(doc)
             cluster label for each document
         '''
@@ -89,71 +284,294 @@ class MovieGroupProcess:
         D = len(docs)
         self.number_docs = D
         self.vocab_size = vocab_size
+        self._known_words = None
+
+        if self.backend == 'numpy':
+            docs = self._init_numpy(docs)
 
-        # unpack to easy var names
-        m_z, n_z, n_z_w = self.cluster_doc_count, self.cluster_word_count, self.cluster_word_distribution
-        cluster_count = K
         d_z = [None for i in range(len(docs))]
+        self.iterations_run = 0
+        self.history = []
+        stable_clusters = 0
+        stable_ll = 0
+        track_ll = self.ll_tol is not None or callback is not None
 
         # initialize the clusters
+        initial = self.random_state.integers(K, size=D)
         for i, doc in enumerate(docs):
 
             # choose a random  initial cluster for the doc
-            z = self._sample([1.0 / K for _ in range(K)])
+            z = int(initial[i])
             d_z[i] = z
-            m_z[z] += 1
-            n_z[z] += len(doc)
-
-            for word in doc:
-                if word not in n_z_w[z]:
-                    n_z_w[z][word] = 0
-                n_z_w[z][word] += 1
+            self._add_doc(doc, z)
 
         for _iter in range(n_iters):
+            start = time.perf_counter()
             total_transfers = 0
+            uniforms = self.random_state.random(D)
 
             for i, doc in enumerate(docs):
 
                 # remove the doc from it's current cluster
                 z_old = d_z[i]
-
-                m_z[z_old] -= 1
-                n_z[z_old] -= len(doc)
-
-                for word in doc:
-                    n_z_w[z_old][word] -= 1
-
-                    # compact dictionary to save space
-                    if n_z_w[z_old][word] == 0:
-                        del n_z_w[z_old][word]
+                self._remove_doc(doc, z_old)
 
                 # draw sample from distribution to find new cluster
-                p = self.score(doc)
-                z_new = self._sample(p)
+                p = self._doc_probs(doc)
+                z_new = self._sample(p, uniforms[i])
 
                 # transfer doc to the new cluster
                 if z_new != z_old:
                     total_transfers += 1
 
                 d_z[i] = z_new
-                m_z[z_new] += 1
-                n_z[z_new] += len(doc)
+                self._add_doc(doc, z_new)
 
-                for word in doc:
-                    if word not in n_z_w[z_new]:
-                        n_z_w[z_new][word] = 0
-                    n_z_w[z_new][word] += 1
-
-            cluster_count_new = sum([1 for v in m_z if v > 0])
-            print("In stage %d: transferred %d clusters with %d clusters populated" % (
-            _iter, total_transfers, cluster_count_new))
-            if total_transfers == 0 and cluster_count_new == cluster_count and _iter>25:
-                print("Converged.  Breaking out.")
+            self.iterations_run = _iter + 1
+            cluster_count_new = sum([1 for v in self.cluster_doc_count if v > 0])
+            metrics = {
+                'iteration': _iter,
+                'seconds': time.perf_counter() - start,
+                'transfers': total_transfers,
+                'transfer_rate': total_transfers / D if D else 0.0,
+                'clusters': cluster_count_new,
+                'log_likelihood': self.log_likelihood() if track_ll else None,
+            }
+            self.history.append(metrics)
+            if verbose:
+                print("In stage %d: transferred %d clusters with %d clusters populated" % (
+                _iter, total_transfers, cluster_count_new))
+
+            # count how long the cluster count and the log likelihood have been steady
+            if len(self.history) > 1:
+                previous = self.history[-2]
+                stable_clusters = stable_clusters + 1 if cluster_count_new == previous['clusters'] else 0
+                if self.ll_tol is not None:
+                    change = abs(metrics['log_likelihood'] - previous['log_likelihood'])
+                    steady = change <= self.ll_tol * abs(previous['log_likelihood'])
+                    stable_ll = stable_ll + 1 if steady else 0
+            elif cluster_count_new == K:
+                stable_clusters = 1
+
+            stop = callback(metrics) if callback is not None else False
+            if (self.iterations_run >= self.min_iters
+                    and metrics['transfer_rate'] <= self.max_transfer_rate
+                    and stable_clusters >= self.stable_iters
+                    and (self.ll_tol is None or stable_ll >= self.stable_iters)):
+                if verbose:
+                    print("Converged.  Breaking out.")
+                break
+            if stop:
                 break
-            cluster_count = cluster_count_new
-        self.cluster_word_distribution = n_z_w
         return d_z
 
+    def partial_fit(self, new_docs, expired_docs=(), expired_labels=(), vocab_size=None, n_iters=5,
+                    verbose=True):
+        '''
+        Update a fitted model (or one restored with from_data or load) with a new batch of
+        documents instead of refitting the whole history. Expired documents are taken out of
+        their clusters, the new documents are placed by sampling from the current clusters and
+        then n_iters Gibbs sweeps run over the new documents only.
+        :param new_docs: list of list of str
+        :param expired_docs: list of list of str: documents previously added to the model
+        :param expired_labels: list of int: the labels fit or partial_fit returned for expired_docs
+        :param vocab_size: int: new total vocabulary size, by default grown by the number of
+            words the model had not seen before
+        :param n_iters: int: number of sweeps over the new documents
+        :param verbose: bool: print the transfers of every sweep
+        :return: list of length len(new_docs)
+            cluster label for each new document
+        '''
+        if len(expired_docs) != len(expired_labels):
+            raise ValueError('expired_docs and expired_labels must have the same length')
+
+        if self.backend != 'numpy':
+            self._known_words = self._vocabulary()
+
+        for doc, z in zip(expired_docs, expired_labels):
+            if self.backend == 'numpy':
+                ids, counts, length = self._encode(doc)
+                doc = ids[ids >= 0], counts[ids >= 0], length
+            self._remove_doc(doc, z)
+        self.number_docs -= len(expired_docs)
+
+        if self.backend == 'numpy':
+            n_words = len(self.vocab)
+            new_docs = self._encode_many(new_docs, grow=True)
+            new_words = len(self.vocab) - n_words
+            if new_words:
+                self.cluster_word_matrix = np.pad(self.cluster_word_matrix, ((0, 0), (0, new_words)))
+        else:
+            words = set(word for doc in new_docs for word in doc)
+            new_words = len(words - self._known_words)
+            self._known_words |= words
+        self.vocab_size = vocab_size if vocab_size is not None else self.vocab_size + new_words
+        self.number_docs += len(new_docs)
+
+        # place the new documents one at a time given everything placed before them
+        d_z = [None for _ in range(len(new_docs))]
+        uniforms = self.random_state.random(len(new_docs))
+        for i, doc in enumerate(new_docs):
+            self.number_docs -= 1
+            z = self._sample(self._doc_probs(doc), uniforms[i])
+            self.number_docs += 1
+            d_z[i] = z
+            self._add_doc(doc, z)
+
+        for _iter in range(n_iters):
+            total_transfers = 0
+            uniforms = self.random_state.random(len(new_docs))
+
+            for i, doc in enumerate(new_docs):
+                z_old = d_z[i]
+                self._remove_doc(doc, z_old)
+                z_new = self._sample(self._doc_probs(doc), uniforms[i])
+                if z_new != z_old:
+                    total_transfers += 1
+                d_z[i] = z_new
+                self._add_doc(doc, z_new)
+
+            if verbose:
+                print("In update stage %d: transferred %d clusters" % (_iter, total_transfers))
+            if total_transfers == 0:
+                break
+        return d_z
+
+    def _vocabulary(self):
+        '''
+        Words of the dict backend: the words in the clusters, and once partial_fit ran the words whose counts expired
+        '''
+        if self._known_words is not None:
+            return self._known_words
+        return set(word for words in self._cluster_word_distribution for word in words)
+
+    def _add_doc(self, doc, z):
+        '''
+        Add a document to cluster z
+        :param doc: list[str] for the dict backend, (ids, counts, length) for the numpy backend
+        :param z: int: cluster label
+        '''
+        self.cluster_doc_count[z] += 1
+        if self.backend == 'numpy':
+            ids, counts, length = doc
+            self.cluster_word_count[z] += length
+            self.cluster_word_matrix[z, ids] += counts
+            return
+
+        n_z_w = self._cluster_word_distribution[z]
+        self.cluster_word_count[z] += len(doc)
+        for word in doc:
+            if word not in n_z_w:
+                n_z_w[word] = 0
+            n_z_w[word] += 1
+
+    def _remove_doc(self, doc, z):
+        '''
+        Remove a document from cluster z
+        :param doc: list[str] for the dict backend, (ids, counts, length) for the numpy backend
+        :param z: int: cluster label
+        '''
+        self.cluster_doc_count[z] -= 1
+        if self.backend == 'numpy':
+            ids, counts, length = doc
+            self.cluster_word_count[z] -= length
+            self.cluster_word_matrix[z, ids] -= counts
+            return
+
+        n_z_w = self._cluster_word_distribution[z]
+        self.cluster_word_count[z] -= len(doc)
+        for word in doc:
+            n_z_w[word] -= 1
+
+            # compact dictionary to save space
+            if n_z_w[word] == 0:
+                del n_z_w[word]
+
+    def _doc_probs(self, doc):
+        '''
+        Cluster probability vector for a document in the backend's own representation
+        '''
+        if self.backend == 'numpy':
+            return self._score_ids(*doc)
+        return self.score(doc)
+
+    def _init_numpy(self, docs):
+        '''
+        Intern the corpus vocabulary and allocate the count arrays of the numpy backend
+        :param docs: list of list of str
+        :return: _EncodedDocs
+        '''
+        self.word_index = {}
+        self.vocab = []
+        encoded = self._encode_many(docs, grow=True)
+
+        self.cluster_doc_count = np.zeros(self.K, dtype=np.int64)
+        self.cluster_word_count = np.zeros(self.K, dtype=np.int64)
+        self.cluster_word_matrix = np.zeros((self.K, len(self.vocab)), dtype=np.int32)
+        return encoded
+
+    def _encode_many(self, docs, grow=False, chunk_size=2000):
+        '''
+        Convert a corpus to unique word ids and counts held in flat int32 arrays
+        :param docs: list of list of str
+        :param grow: bool: add unseen words to the vocabulary, otherwise they get id -1
+        :param chunk_size: int: documents converted per pass, bounds the temporaries
+        :return: _EncodedDocs
+        '''
+        if grow:
+            word_index, vocab = self.word_index, self.vocab
+            for doc in docs:
+                for word in doc:
+                    if word not in word_index:
+                        word_index[word] = len(vocab)
+                        vocab.append(word)
+
+        ids, counts, lengths, sizes = [], [], [], []
+        for start in range(0, len(docs), chunk_size):
+            chunk = docs[start:start + chunk_size]
+            rows, cols, cnts, lens = _doc_term_triplets(chunk, self.word_index, len(self.vocab))
+            ids.append(cols.astype(np.int32))
+            counts.append(cnts.astype(np.int32))
+            lengths.append(lens.astype(np.int32))
+            sizes.append(np.bincount(rows, minlength=len(chunk)))
+
+        encoded = _EncodedDocs()
+        encoded.ids = np.concatenate(ids) if ids else np.zeros(0, np.int32)
+        encoded.counts = np.concatenate(counts) if counts else np.zeros(0, np.int32)
+        encoded.lengths = np.concatenate(lengths) if lengths else np.zeros(0, np.int32)
+        encoded.doc_ptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        if sizes:
+            np.cumsum(np.concatenate(sizes), out=encoded.doc_ptr[1:])
+        return encoded
+
+    def _encode(self, doc, grow=False):
+        '''
+        Convert a token list to unique word ids and their counts
+        :param doc: list[str]
+        :param grow: bool: add unseen words to the vocabulary, otherwise they get id -1
+        :return: (ids, counts, length)
+        '''
+        word_index = self.word_index
+        if grow:
+            for word in doc:
+                if word not in word_index:
+                    word_index[word] = len(self.vocab)
+                    self.vocab.append(word)
+        ids = np.array([word_index.get(word, -1) for word in doc], dtype=np.int64)
+        ids, counts = np.unique(ids, return_counts=True)
+        return ids, counts, len(doc)
+
+    def _matrix_to_dicts(self):
+        '''
+        Convert the K x V count matrix into the list-of-dicts cluster_word_distribution
+        '''
+        vocab = self.vocab
+        distribution = []
+        for row in self.cluster_word_matrix:
+            nonzero = np.flatnonzero(row)
+            distribution.append({vocab[w]: int(row[w]) for w in nonzero})
+        return distribution
+
     def score(self, doc):
         '''
         Score a document
@@ -165,35 +583,183 @@ class MovieGroupProcess:
         :return: list[float]: A length K probability vector where each component represents
                               the probability of the document appearing in a particular cluster
         '''
+        if self.backend == 'numpy':
+            return list(self._score_ids(*self._encode(doc)))
+
         alpha, beta, K, V, D = self.alpha, self.beta, self.K, self.vocab_size, self.number_docs
-        m_z, n_z, n_z_w = self.cluster_doc_count, self.cluster_word_count, self.cluster_word_distribution
+        m_z, n_z, n_z_w = self.cluster_doc_count, self.cluster_word_count, self._cluster_word_distribution
 
-        p = [0 for _ in range(K)]
+        lp = [0 for _ in range(K)]
 
         #  We break the formula into the following pieces
         #  p = N1*N2/(D1*D2) = exp(lN1 - lD1 + lN2 - lD2)
         #  lN1 = log(m_z[z] + alpha)
-        #  lN2 = log(D - 1 + K*alpha)
-        #  lN2 = log(product(n_z_w[w] + beta)) = sum(log(n_z_w[w] + beta))
-        #  lD2 = log(product(n_z[d] + V*beta + i -1)) = sum(log(n_z[d] + V*beta + i -1))
+        #  lD1 = log(D - 1 + K*alpha)
+        #  lN2 = log(product over words w of product(n_z_w[w] + beta + j - 1 for j in 1..N_w))
+        #      = sum(lgamma(n_z_w[w] + beta + N_w) - lgamma(n_z_w[w] + beta)), N_w = occurrences of w in doc
+        #      = sum(log(n_z_w[w] + beta)) when every word occurs once
+        #  lD2 = log(product(n_z[d] + V*beta + i -1)) = lgamma(n_z[d] + V*beta + doc_size) - lgamma(n_z[d] + V*beta)
 
         lD1 = log(D - 1 + K * alpha)
         doc_size = len(doc)
+        word_counts = Counter(doc).items()
         for label in range(K):
             lN1 = log(m_z[label] + alpha)
             lN2 = 0
-            lD2 = 0
-            for word in doc:
-                lN2 += log(n_z_w[label].get(word, 0) + beta)
-            for j in range(1, doc_size +1):
-                lD2 += log(n_z[label] + V * beta + j - 1)
-            p[label] = exp(lN1 - lD1 + lN2 - lD2)
+            for word, count in word_counts:
+                n_w = n_z_w[label].get(word, 0) + beta
+                if count == 1:
+                    lN2 += log(n_w)
+                else:
+                    lN2 += lgamma(n_w + count) - lgamma(n_w)
+            lD2 = lgamma(n_z[label] + V * beta + doc_size) - lgamma(n_z[label] + V * beta)
+            lp[label] = lN1 - lD1 + lN2 - lD2
+
+        # shift by the max log probability so long documents do not underflow to zero
+        lp_max = max(lp)
+        p = [exp(l - lp_max) for l in lp]
 
         # normalize the probability vector
         pnorm = sum(p)
         pnorm = pnorm if pnorm>0 else 1
         return [pp/pnorm for pp in p]
 
+    def _score_ids(self, ids, counts, doc_size):
+        '''
+        Vectorized formula (3) of Yin and Wang 2014 over all K clusters at once
+        :param ids: np.ndarray: unique word ids of the document, -1 for unseen words
+        :param counts: np.ndarray: number of occurrences of each id
+        :param doc_size: int: number of tokens in the document
+        :return: np.ndarray: length K probability vector
+        '''
+        alpha, beta, K, V, D = self.alpha, self.beta, self.K, self.vocab_size, self.number_docs
+        m_z, n_z = self.cluster_doc_count, self.cluster_word_count
+
+        # unseen words have a count of zero in every cluster
+        known = ids >= 0
+        n_w = np.full((K, len(ids)), beta)
+        n_w[:, known] += self.cluster_word_matrix[:, ids[known]]
+
+        lN1 = log(m_z + alpha)
+        lD1 = log(D - 1 + K * alpha)
+        repeated = counts > 1
+        if repeated.any():
+            lN2 = log(n_w[:, ~repeated]).sum(axis=1)
+            lN2 += (gammaln(n_w[:, repeated] + counts[repeated]) - gammaln(n_w[:, repeated])).sum(axis=1)
+        else:
+            lN2 = log(n_w).sum(axis=1)
+        n_z_beta = n_z + V * beta
+        lD2 = gammaln(n_z_beta + doc_size) - gammaln(n_z_beta)
+        lp = lN1 - lD1 + lN2 - lD2
+        p = exp(lp - lp.max())
+
+        # normalize the probability vector
+        pnorm = p.sum()
+        pnorm = pnorm if pnorm>0 else 1
+        return p / pnorm
+
+    def score_many(self, docs, chunk_size=10000):
+        '''
+        Score a batch of documents in vectorized passes, one row per document as in score
+        :param docs: list of list of str
+        :param chunk_size: int: documents scored per pass, bounds the size of the temporaries
+        :return: np.ndarray: (len(docs), K) probability matrix
+        '''
+        probs = np.empty((len(docs), self.K))
+        word_index, matrix = self._count_arrays()
+        for start in range(0, len(docs), chunk_size):
+            chunk = docs[start:start + chunk_size]
+            probs[start:start + len(chunk)] = self._score_chunk(chunk, word_index, matrix)
+        return probs
+
+    def predict_many(self, docs, chunk_size=10000):
+        '''
+        Choose the highest probability label for each document, the batch version of choose_best_label
+        :param docs: list of list of str
+        :param chunk_size: int: see score_many
+        :return: (np.ndarray of labels, np.ndarray of their probabilities)
+        '''
+        probs = self.score_many(docs, chunk_size)
+        labels = probs.argmax(axis=1)
+        return labels, probs[np.arange(len(docs)), labels]
+
+    def _count_arrays(self):
+        '''
+        Word index and K x V count matrix of the model, built from the dicts for the dict backend
+        '''
+        if self.backend == 'numpy':
+            return self.word_index, self.cluster_word_matrix
+
+        vocab = sorted(set(word for words in self._cluster_word_distribution for word in words))
+        word_index = {word: i for i, word in enumerate(vocab)}
+        matrix = np.zeros((self.K, len(vocab)), dtype=np.int64)
+        for z, words in enumerate(self._cluster_word_distribution):
+            for word, count in words.items():
+                matrix[z, word_index[word]] = count
+        return word_index, matrix
+
+    def _score_chunk(self, docs, word_index, matrix):
+        '''
+        Formula (3) of Yin and Wang 2014 for a chunk of documents against all K clusters
+        :return: np.ndarray: (len(docs), K) probability matrix
+        '''
+        alpha, beta, K, V, D = self.alpha, self.beta, self.K, self.vocab_size, self.number_docs
+        m_z = np.asarray(self.cluster_doc_count, dtype=float)
+        n_z = np.asarray(self.cluster_word_count, dtype=float)
+        n_docs = len(docs)
+        n_words = matrix.shape[1]
+
+        # sparse document-term matrix as (row, column, count) triplets sorted by row,
+        # column -1 collects the words the model has never seen
+        rows, cols, counts, lengths = _doc_term_triplets(docs, word_index, n_words)
+
+        known = cols >= 0
+        n_w = np.full((K, len(cols)), beta)
+        n_w[:, known] += matrix[:, cols[known]]
+        terms = log(n_w)
+        repeated = counts > 1
+        if repeated.any():
+            n_rep = n_w[:, repeated]
+            terms[:, repeated] = gammaln(n_rep + counts[repeated]) - gammaln(n_rep)
+
+        # sum the word terms of each document
+        lN2 = np.zeros((n_docs, K))
+        starts = np.searchsorted(rows, np.arange(n_docs))
+        nonempty = np.bincount(rows, minlength=n_docs) > 0
+        if nonempty.any():
+            lN2[nonempty] = np.add.reduceat(terms, starts[nonempty], axis=1).T
+
+        lN1 = log(m_z + alpha)
+        lD1 = log(D - 1 + K * alpha)
+        n_z_beta = n_z + V * beta
+        lD2 = gammaln(n_z_beta[None, :] + lengths[:, None]) - gammaln(n_z_beta)[None, :]
+        lp = lN1 - lD1 + lN2 - lD2
+        p = exp(lp - lp.max(axis=1, keepdims=True))
+        return p / p.sum(axis=1, keepdims=True)
+
+    def log_likelihood(self):
+        '''
+        Log joint probability of the current cluster assignment and the documents under
+        the Dirichlet Multinomial Mixture model, usable to compare fits of the same corpus
+        :return: float
+        '''
+        alpha, beta, K, V, D = self.alpha, self.beta, self.K, self.vocab_size, self.number_docs
+        if not D or not V:
+            # no documents or no words: the empty assignment is certain
+            return 0.0
+        m_z = np.asarray(self.cluster_doc_count, dtype=float)
+        n_z = np.asarray(self.cluster_word_count, dtype=float)
+
+        if self.backend == 'numpy':
+            n_z_w = self.cluster_word_matrix[self.cluster_word_matrix > 0]
+        else:
+            n_z_w = np.array([count for words in self._cluster_word_distribution for count in words.values()])
+
+        ll = lgamma(K * alpha) - lgamma(D + K * alpha) + (gammaln(m_z + alpha) - lgamma(alpha)).sum()
+        ll += (lgamma(V * beta) - gammaln(n_z + V * beta)).sum()
+        ll += (gammaln(n_z_w + beta) - lgamma(beta)).sum()
+        return float(ll)
+
     def choose_best_label(self, doc):
         '''
         Choose the highest probability label for the input document
@@ -202,3 +768,150 @@ class MovieGroupProcess:
         '''
         p = self.score(doc)
         return argmax(p),max(p)
+
+
+class _EncodedDocs:
+    '''
+    Documents as unique word ids and their counts in flat arrays; the entries of document i
+    are ids[doc_ptr[i]:doc_ptr[i + 1]]. Indexing gives the (ids, counts, length) tuples used
+    by the numpy backend without keeping a pair of small arrays alive per document.
+    '''
+    __slots__ = ('doc_ptr', 'ids', 'counts', 'lengths')
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        start, end = self.doc_ptr[i], self.doc_ptr[i + 1]
+        return self.ids[start:end], self.counts[start:end], int(self.lengths[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _doc_term_triplets(docs, word_index, n_words):
+    '''
+    Sparse document-term matrix of a list of token lists
+    :param docs: list of list of str
+    :param word_index: dict: word -> id, unknown words get column -1
+    :param n_words: int: number of known words
+    :return: (rows, cols, counts, lengths): one (row, column, count) triplet per distinct
+             word of each document sorted by row, and the token count of each document
+    '''
+    lengths = np.array([len(doc) for doc in docs], dtype=np.int64)
+    ids = np.fromiter((word_index.get(word, -1) for doc in docs for word in doc),
+                      dtype=np.int64, count=int(lengths.sum()))
+    keys = np.repeat(np.arange(len(docs)), lengths) * (n_words + 1) + ids + 1
+    keys, counts = np.unique(keys, return_counts=True)
+    rows, cols = keys // (n_words + 1), keys % (n_words + 1) - 1
+    return rows, cols, counts, lengths
+
+
+def check_random_state(random_state):
+    '''
+    Turn a seed into a numpy.random.Generator
+    :param random_state: None, int or numpy.random.Generator
+    :return: numpy.random.Generator
+    '''
+    if isinstance(random_state, np.random.Generator):
+        return random_state
+    return np.random.default_rng(random_state)
+
+
+def compare_backends(docs, vocab_size, K=8, alpha=0.1, beta=0.1, n_iters=30, seed=0):
+    '''
+    Fit the same corpus with the dict and numpy backends from the same random seed
+    :param docs: list of list of str
+    :param vocab_size: int
+    :param seed: int: random_state given to both fits
+    :return: dict with the fit time of each backend, the speedup factor of the numpy
+             backend and whether both fits produced the same labels
+    '''
+    labels = {}
+    report = {}
+    for backend in ('dict', 'numpy'):
+        mgp = MovieGroupProcess(K, alpha, beta, n_iters, backend=backend, random_state=seed)
+        start = time.perf_counter()
+        labels[backend] = mgp.fit(docs, vocab_size, verbose=False)
+        report[backend + '_seconds'] = time.perf_counter() - start
+
+    report['speedup'] = report['dict_seconds'] / report['numpy_seconds']
+    report['labels_match'] = labels['dict'] == labels['numpy']
+    return report
+
+
+def _fit_config(docs, vocab_size, K, alpha, beta, seed, n_iters, backend):
+    '''
+    Fit a single configuration of fit_many, run inside a worker process
+    :return: (summary dict, labels as an int32 array), the model itself stays in the worker
+    '''
+    mgp = MovieGroupProcess(K, alpha, beta, n_iters, backend=backend, random_state=seed)
+    start = time.perf_counter()
+    labels = mgp.fit(docs, vocab_size, verbose=False)
+    summary = {
+        'K': K,
+        'alpha': alpha,
+        'beta': beta,
+        'seed': seed,
+        'log_likelihood': mgp.log_likelihood(),
+        'iterations': mgp.iterations_run,
+        'clusters': int(sum(1 for v in mgp.cluster_doc_count if v > 0)),
+        'seconds': time.perf_counter() - start,
+    }
+    return summary, np.asarray(labels, dtype=np.int32)
+
+
+def _from_labels(docs, vocab_size, summary, labels, n_iters, backend):
+    '''
+    Model of a fit_many configuration rebuilt from its final labels: the cluster counts
+    depend only on the documents and their labels, so no sampling is repeated
+    '''
+    mgp = MovieGroupProcess(summary['K'], summary['alpha'], summary['beta'], n_iters, backend=backend,
+                            random_state=summary['seed'])
+    mgp.number_docs = len(docs)
+    mgp.vocab_size = vocab_size
+    mgp.iterations_run = summary['iterations']
+    if backend == 'numpy':
+        docs = mgp._init_numpy(docs)
+    for doc, z in zip(docs, labels.tolist()):
+        mgp._add_doc(doc, z)
+    return mgp
+
+
+def fit_many(docs, vocab_size, configs, n_iters=30, backend='numpy', n_jobs=-1):
+    '''
+    Fit many (K, alpha, beta, seed) configurations in parallel on a process pool and keep
+    the one with the highest log likelihood
+    :param docs: list of list of str
+    :param vocab_size: int
+    :param configs: iterable of (K, alpha, beta, seed) tuples
+    :param n_iters: int: maximum number of iterations of every fit
+    :param backend: str: MovieGroupProcess backend used by every fit
+    :param n_jobs: int: number of worker processes, -1 uses every core
+    :return: (best MovieGroupProcess, labels of the best fit, list of summary dicts with the
+             log_likelihood, iterations and populated clusters of every configuration)
+    '''
+    from joblib import Parallel, delayed
+
+    # workers send back labels only, the best model is rebuilt from its labels afterwards
+    fits = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_config)(docs, vocab_size, K, alpha, beta, seed, n_iters, backend)
+        for K, alpha, beta, seed in configs)
+
+    summaries = [summary for summary, _ in fits]
+    best_summary, best_labels = max(fits, key=lambda fit: fit[0]['log_likelihood'])
+    best_model = _from_labels(docs, vocab_size, best_summary, best_labels, n_iters, backend)
+    return best_model, best_labels.tolist(), summaries
+
+
+def sweep(docs, vocab_size, Ks, alphas, betas, seeds=(0,), **kwargs):
+    '''
+    Grid search over K, alpha, beta and restarts with different seeds, see fit_many
+    :param Ks: list of int
+    :param alphas: list of float
+    :param betas: list of float
+    :param seeds: list of int: one restart per seed for every (K, alpha, beta)
+    :return: same as fit_many
+    '''
+    return fit_many(docs, vocab_size, product(Ks, alphas, betas, seeds), **kwargs)
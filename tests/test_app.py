@@ -0,0 +1,139 @@
+import importlib
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import moments
+import store
+import synthetic
+import wordclouds
+
+from conftest import ROOT
+
+
+####### Dashboard on a synthetic store
+N_DAYS = 10
+
+
+@pytest.fixture(scope='module')
+def dashboard(tmp_path_factory):
+    # app.py reads data/store and writes its caches under data/ relative to the working dir
+    workdir = str(tmp_path_factory.mktemp('dashboard'))
+    os.makedirs(os.path.join(workdir, 'data'))
+    shutil.copy(os.path.join(ROOT, 'app', 'data', 'test.jpg'), os.path.join(workdir, 'data'))
+    store.write_store(synthetic.trending_frame(N_DAYS, videos_per_day=80), os.path.join(workdir, 'data', 'store'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.modules.pop('app', None)
+    try:
+        dashboard = importlib.import_module('app')
+        yield dashboard
+        dashboard.word_clouds.shutdown()
+        dashboard.images.shutdown()
+    finally:
+        sys.modules.pop('app', None)
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope='module')
+def client(dashboard):
+    return dashboard.server.test_client()
+
+
+def test_api_top_terms(dashboard, client):
+    days = dashboard.date_list_formatted
+    response = client.get('/api/top_terms?field=tags&start=%s&end=%s&n=5' % (days[2], days[6]))
+    assert response.status_code == 200
+    expected = dashboard.term_index.top('tags', days[2:7], 5)
+    assert response.get_json() == {'field': 'tags', 'start': days[2], 'end': days[6],
+                                   'terms': [{'term': term, 'count': count} for term, count in expected.items()]}
+    assert len(expected) == 5
+
+
+def test_api_top_terms_defaults(dashboard, client):
+    # every day, title terms, TOP_TERMS of them
+    result = client.get('/api/top_terms').get_json()
+    days = dashboard.date_list_formatted
+    assert (result['field'], result['start'], result['end']) == ('title', days[0], days[-1])
+    expected = dashboard.term_index.top('title', days, dashboard.TOP_TERMS)
+    assert [(item['term'], item['count']) for item in result['terms']] == list(expected.items())
+
+
+def test_api_top_terms_limits(dashboard, client):
+    days = dashboard.date_list_formatted
+    # n is capped like the word clouds, a range without trending days has no terms
+    assert len(client.get('/api/top_terms?field=desc&n=100000').get_json()['terms']) == wordclouds.MAX_WORDS
+    assert client.get('/api/top_terms?n=-3').get_json()['terms'] == []
+    assert client.get('/api/top_terms?start=2000-01-01&end=2000-01-02').get_json()['terms'] == []
+    # dates are compared as YYYY-MM-DD strings, both ends included
+    single = client.get('/api/top_terms?start=%s&end=%s' % (days[3], days[3])).get_json()
+    assert [(item['term'], item['count']) for item in single['terms']] == list(dashboard.term_index.top('title', days[3:4], dashboard.TOP_TERMS).items())
+
+    response = client.get('/api/top_terms?field=comments')
+    assert response.status_code == 400
+    assert 'field must be one of' in response.get_json()['error']
+
+
+####### Weekly summary against the pandas code of the weekly callbacks it replaced
+@pytest.fixture(scope='module')
+def rows(dashboard):
+    df = store.read_videos(dashboard.STORE_DIR, dashboard.DASHBOARD_COLUMNS)
+    return df.sort_values('trending_date', ascending = True, kind='stable')
+
+
+def old_summary(dashboard, df, start, end, k):
+    '''
+    The aggregates every weekly callback computed from the rows of the date range
+    '''
+    date_list = dashboard.date_list
+    no_dups_f = df.drop_duplicates(subset='video_id', keep='first')
+    first = no_dups_f[(no_dups_f['trending_date'] >= date_list[start]) & (no_dups_f['trending_date'] <= date_list[end])]
+    filtered_df = df[(df['trending_date'] >= date_list[start]) & (df['trending_date'] <= date_list[end])]
+    last = filtered_df.drop_duplicates(subset='video_id', keep='last')
+
+    def counts(frame, cols):
+        temp = frame.groupby(cols, observed=True).agg('count')['video_id'].reset_index()
+        temp.columns = cols + ['count']
+        return {col: temp[col].astype(object).tolist() for col in temp.columns}
+
+    summary = {}
+    temp = first['categoryIdName'].value_counts()
+    summary['categories'] = temp[temp > 0].to_dict()
+    summary['corr'] = first[moments.COLUMNS].corr().values
+    summary['top'] = {}
+    for metric in ['view_count', 'likes', 'comment_count']:
+        temp = last.sort_values(metric, ascending = True)[-k:]
+        summary['top'][metric] = {metric: temp[metric].tolist(), 'title': temp['title'].tolist()}
+    temp = first.resample('D', on='publishedAt').count()['video_id']
+    summary['publish_days'] = {day.isoformat(): count for day, count in temp.items() if count > 0}
+    summary['publish_hours'] = counts(first, ['publish_cat', 'categoryIdName'])
+    temp = filtered_df.groupby(['channelTitle', 'avatar_url', 'channel_type','curr_subs'], observed=True).agg('count')['video_id'].reset_index()
+    temp = temp.sort_values('video_id', ascending = False)[:10]
+    summary['channels'] = {'channelTitle': temp['channelTitle'].tolist(), 'count': temp['video_id'].tolist()}
+    summary['countries'] = counts(last, ['country'])
+    summary['sb_ranks'] = counts(last, ['rank_y', 'channel_type'])
+    return summary
+
+
+def assert_summary_equal(summary, expected):
+    assert dict(zip(summary['categories']['categoryIdName'], summary['categories']['count'])) == expected['categories']
+    np.testing.assert_allclose(np.array(summary['corr'], dtype=float), expected['corr'], rtol=1e-9, atol=1e-12)
+    assert summary['top'] == expected['top']
+    assert dict(zip(summary['publish_days']['publishedAt'], summary['publish_days']['count'])) == expected['publish_days']
+    for kind in ['publish_hours', 'countries', 'sb_ranks']:
+        assert summary[kind] == expected[kind]
+    assert {col: summary['channels'][col] for col in ['channelTitle', 'count']} == expected['channels']
+
+
+@pytest.mark.parametrize('start, end, k', [(0, N_DAYS - 1, 10), (0, 0, 5), (2, 6, 25), (N_DAYS - 1, N_DAYS - 1, 10), (4, 8, 15)])
+def test_weekly_summary_matches_callbacks(dashboard, rows, start, end, k):
+    expected = old_summary(dashboard, rows, start, end, k)
+    # computed, then read back from the memory and the disk cache
+    assert_summary_equal(dashboard.weekly_summary(start, end, k), expected)
+    assert_summary_equal(dashboard.weekly_summary(start, end, k), expected)
+    dashboard.cache.memory.clear()
+    assert_summary_equal(dashboard.weekly_summary(start, end, k), expected)
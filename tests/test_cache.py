@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+
+import plotly.graph_objects as go
+import plotly.io.json as pio_json
+
+import cache
+from cache import CallbackCache
+
+from conftest import ROOT
+
+
+def counted(cache_, func):
+    '''
+    Memoized func and the list of arguments it was really called with
+    '''
+    calls = []
+
+    def callback(*args):
+        calls.append(args)
+        return func(*args)
+    callback.__qualname__ = func.__name__
+    return cache_.memoize(callback), calls
+
+
+def json_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.json'))
+
+
+def square(x):
+    return {'value': x * x}
+
+
+####### memoize
+def test_memoize_calls_once(tmp_path):
+    callback, calls = counted(CallbackCache(str(tmp_path), 1), square)
+    assert callback(3) == {'value': 9}
+    assert callback(3) == {'value': 9}
+    assert callback(4) == {'value': 16}
+    assert calls == [(3,), (4,)]
+    assert len(json_files(str(tmp_path))) == 2
+
+
+def test_figure_read_back_from_disk(tmp_path):
+    fig = go.Figure(go.Bar(x=['a', 'b'], y=[1, 2]))
+    CallbackCache(str(tmp_path), 1).put('1-fig', fig)
+    found, value = CallbackCache(str(tmp_path), 1).get('1-fig')
+    assert found
+    assert value == json.loads(pio_json.to_json_plotly(fig))
+
+
+def test_half_written_file_is_a_miss(tmp_path):
+    cache_ = CallbackCache(str(tmp_path), 1)
+    (tmp_path / '1-broken.json').write_text('{"value": ')
+    assert cache_.get('1-broken') == (False, None)
+
+
+####### LRU eviction
+def test_memory_lru(tmp_path):
+    cache_ = CallbackCache(str(tmp_path), 1, max_memory=2)
+    for key in ['1-a', '1-b', '1-c']:
+        cache_.put(key, key)
+    assert list(cache_.memory) == ['1-b', '1-c']
+    cache_.get('1-b')
+    cache_.put('1-d', 'd')
+    assert list(cache_.memory) == ['1-b', '1-d']
+    # out of memory but still on disk
+    assert cache_.get('1-a') == (True, '1-a')
+
+
+def test_file_lru(tmp_path):
+    cache_ = CallbackCache(str(tmp_path), 1, max_memory=0, max_files=2)
+    cache_.put('1-a', 'a')
+    cache_.put('1-b', 'b')
+    os.utime(str(tmp_path / '1-a.json'), (1, 1))
+    os.utime(str(tmp_path / '1-b.json'), (2, 2))
+    # a hit refreshes the file, b is now the least recently used
+    assert cache_.get('1-a') == (True, 'a')
+    cache_.put('1-c', 'c')
+    assert json_files(str(tmp_path)) == ['1-a.json', '1-c.json']
+
+
+####### dataset versions
+def test_version_in_key(tmp_path):
+    old = CallbackCache(str(tmp_path), 1)
+    new = CallbackCache(str(tmp_path), 2)
+    assert old.key(square, (3,), {}) != new.key(square, (3,), {})
+    assert new.key(square, (3,), {}).startswith('2-')
+
+
+def test_new_version_purges_old_outputs(tmp_path):
+    callback, calls = counted(CallbackCache(str(tmp_path), 1), square)
+    callback(3)
+    callback, calls = counted(CallbackCache(str(tmp_path), 2), square)
+    assert json_files(str(tmp_path)) == []
+    callback(3)
+    assert calls == [(3,)]
+
+
+def test_purge_keeps_current_version(tmp_path):
+    for name in ['1-a.json', '2-b.json', '12-c.json']:
+        (tmp_path / name).write_text('0')
+    cache.purge(str(tmp_path), 2)
+    assert json_files(str(tmp_path)) == ['2-b.json']
+    cache.purge(str(tmp_path / 'missing'), 2)
+
+
+####### sharing between processes
+WORKER = '''
+import sys
+from cache import CallbackCache
+cache = CallbackCache(sys.argv[1], 1)
+
+def square(x):
+    print('computed')
+    return {'value': x * x}
+print(cache.memoize(square)(int(sys.argv[2])))
+'''
+
+
+def run_worker(cache_dir, x):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'app'))
+    return subprocess.run([sys.executable, '-c', WORKER, cache_dir, str(x)], env=env,
+                          capture_output=True, text=True, check=True).stdout.split('\n')
+
+
+def test_shared_between_processes(tmp_path):
+    assert run_worker(str(tmp_path), 5)[:2] == ['computed', "{'value': 25}"]
+    # another process with the same version reads the output of the first
+    assert run_worker(str(tmp_path), 5)[:1] == ["{'value': 25}"]
+    assert run_worker(str(tmp_path), 6)[:1] == ['computed']
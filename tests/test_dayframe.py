@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dayframe
+import store
+from dayframe import DayFrame, NO_DAY, Occurrences
+
+
+####### Day offsets and per video occurrences against pandas
+def trending_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2020-07-08', tz='UTC') + pd.to_timedelta(rng.integers(0, 30, n), unit='D')
+    return pd.DataFrame({'trending_date': dates, 'video_id': rng.choice(['v%d' % i for i in range(n // 4)], n)})
+
+
+def test_offsets_and_occurrences():
+    videos = DayFrame(trending_frame(2000, 0))
+    df = videos.frame
+    assert df['trending_date'].is_monotonic_increasing
+    days = videos.day_codes()
+    assert len(videos) == len(days) == 2000
+    for day, date in enumerate(np.unique(df['trending_date'])):
+        begin, stop = videos.offsets[day], videos.offsets[day + 1]
+        assert (df['trending_date'].iloc[begin:stop] == date).all()
+        assert (days[begin:stop] == day).all()
+
+    by_video = pd.Series(days).groupby(df['video_id'])
+    prev, following = by_video.shift(1), by_video.shift(-1)
+    np.testing.assert_array_equal(videos.occurrences.prev_day, np.where(prev.isna(), -1, prev.fillna(0).astype(np.int64)))
+    np.testing.assert_array_equal(videos.occurrences.next_day, np.where(following.isna(), NO_DAY, following.fillna(0).astype(np.int64)))
+
+
+def test_dates_without_rows():
+    df = trending_frame(50, 1)
+    dates = pd.date_range('2020-07-01', '2020-08-31', tz='UTC')
+    videos = DayFrame(df, dates)
+    assert len(videos.offsets) == len(dates) + 1
+    np.testing.assert_array_equal(np.bincount(videos.day_codes(), minlength=len(dates)),
+                                  [(df['trending_date'] == date).sum() for date in dates])
+
+
+def test_incremental_append_matches_one_pass():
+    videos = DayFrame(trending_frame(2000, 2))
+    days = videos.day_codes()
+    ids = videos.frame['video_id'].to_numpy()
+    incremental = Occurrences()
+    for day in range(days.max() + 1):
+        begin, stop = videos.offsets[day], videos.offsets[day + 1]
+        incremental.append(ids[begin:stop], days[begin:stop])
+    np.testing.assert_array_equal(incremental.prev_day, videos.occurrences.prev_day)
+    np.testing.assert_array_equal(incremental.next_day, videos.occurrences.next_day)
+    first = videos.frame.drop_duplicates(subset='video_id', keep='first')
+    last = videos.frame.drop_duplicates(subset='video_id', keep='last')
+    codes = [incremental.codes[video] for video in first['video_id']]
+    np.testing.assert_array_equal(incremental.first_row[codes], first.index)
+    np.testing.assert_array_equal(incremental.last_row[[incremental.codes[video] for video in last['video_id']]], last.index)
+
+
+def test_store_index(tmp_path):
+    df = trending_frame(600, 3).sort_values('trending_date', kind='stable', ignore_index=True)
+    store_dir = str(tmp_path)
+    store.init_store(store_dir)
+    for _, day_df in df.groupby('trending_date'):
+        day, manifest = store.add_day(store_dir, day_df)
+        dayframe.append_occurrences(store_dir, day, day_df, manifest['version'])
+    appended = dayframe.read_occurrences(store_dir)
+    expected = DayFrame(df).occurrences
+    np.testing.assert_array_equal(appended.prev_day, expected.prev_day)
+    np.testing.assert_array_equal(appended.next_day, expected.next_day)
+    # the dashboard reads the rows memory-mapped
+    assert not appended.next_day.flags.writeable
+
+    dayframe.build_occurrences(store_dir)
+    rebuilt = dayframe.read_occurrences(store_dir, videos=True)
+    np.testing.assert_array_equal(rebuilt.next_day, expected.next_day)
+    assert DayFrame(store.read_videos(store_dir), occurrences=rebuilt).occurrences is rebuilt
+    with pytest.raises(ValueError):
+        DayFrame(df.iloc[:10], occurrences=rebuilt)
@@ -0,0 +1,114 @@
+import io
+
+import flask
+import pytest
+
+import images
+
+
+####### Image cache with a stubbed network
+FALLBACK = b'fallback image'
+
+
+class FakeNetwork:
+    '''
+    urlopen stand in: urls in self.broken fail, every other url answers its own bytes
+    '''
+    def __init__(self):
+        self.requests = []
+        self.broken = set()
+
+    def urlopen(self, url, timeout=None):
+        self.requests.append(url)
+        if url in self.broken:
+            raise OSError('unreachable ' + url)
+        return io.BytesIO(b'image of ' + url.encode('utf-8'))
+
+
+@pytest.fixture
+def network(monkeypatch):
+    network = FakeNetwork()
+    monkeypatch.setattr(images.urllib.request, 'urlopen', network.urlopen)
+    return network
+
+
+@pytest.fixture
+def image_cache(tmp_path, network):
+    fallback = tmp_path / 'test.jpg'
+    fallback.write_bytes(FALLBACK)
+    image_cache = images.ImageCache(str(tmp_path / 'images'), str(fallback), workers=2, timeout=5)
+    yield image_cache
+    image_cache.shutdown()
+
+
+@pytest.fixture
+def client(image_cache):
+    server = flask.Flask(__name__)
+    image_cache.register(server)
+    return server.test_client()
+
+
+def get(client, src):
+    response = client.get(src)
+    assert response.status_code == 200
+    data = response.get_data()
+    response.close()
+    return data
+
+
+def test_src_and_serve(image_cache, client, network):
+    url = 'https://i.ytimg.com/vi/a/default.jpg'
+    src = image_cache.src(url)
+    assert src == images.ROUTE + images.ImageCache.key(url)
+    # the route waits for the queued download
+    assert get(client, src) == b'image of ' + url.encode('utf-8')
+    # downloaded once, later requests read the file
+    assert image_cache.src(url) == src
+    assert get(client, src) == b'image of ' + url.encode('utf-8')
+    assert network.requests == [url]
+
+
+def test_fallback(image_cache, client, network):
+    assert image_cache.src('') == images.ROUTE + 'fallback'
+    assert get(client, images.ROUTE + 'fallback') == FALLBACK
+    # urls outside the dataset are never downloaded by the route
+    assert get(client, images.ROUTE + images.ImageCache.key('https://example.com/x.jpg')) == FALLBACK
+    assert network.requests == []
+
+
+def test_route_downloads_dataset_urls(image_cache, client, network):
+    # another worker rendered the table, this one only knows the dataset urls
+    url = 'https://yt3.ggpht.com/channel'
+    image_cache.add_urls([url, ''])
+    assert get(client, images.ROUTE + images.ImageCache.key(url)) == b'image of ' + url.encode('utf-8')
+    assert network.requests == [url]
+
+
+def test_prefetch(image_cache, network):
+    urls = ['https://i.ytimg.com/vi/%s/default.jpg' % name for name in 'abc']
+    image_cache.prefetch(urls + urls[:1] + [''])
+    image_cache.shutdown()
+    assert sorted(network.requests) == urls
+    for url in urls:
+        with open(image_cache.path(images.ImageCache.key(url)), 'rb') as f:
+            assert f.read() == b'image of ' + url.encode('utf-8')
+
+
+def test_failed_download_is_retried_later(image_cache, client, network, monkeypatch):
+    url = 'https://i.ytimg.com/vi/dead/default.jpg'
+    network.broken.add(url)
+    src = image_cache.src(url)
+    assert get(client, src) == FALLBACK
+    # within retry_after the failure is remembered, the placeholder is served without a request
+    assert image_cache.src(url) == src
+    assert get(client, src) == FALLBACK
+    assert network.requests == [url]
+
+    # the link works again once retry_after has passed
+    network.broken.clear()
+    now = images.time.monotonic()
+    monkeypatch.setattr(images.time, 'monotonic', lambda: now + image_cache.retry_after)
+    image_cache.src(url)
+    assert get(client, src) == b'image of ' + url.encode('utf-8')
+    assert network.requests == [url, url]
+    assert images.ImageCache.key(url) not in image_cache.failed
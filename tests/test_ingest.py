@@ -0,0 +1,121 @@
+import os
+import runpy
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dayframe
+import ingest
+import moments
+import rollups
+import store
+import terms
+import transforms
+
+from conftest import ROOT
+
+
+CSV_DIR = os.path.join(ROOT, 'data')
+CSV_FILES = sorted(name for name in os.listdir(CSV_DIR) if name.endswith(ingest.CSV_SUFFIX))
+
+
+@pytest.fixture(autouse=True)
+def stopwords(monkeypatch):
+    # the nltk stopword corpus is a separate download, a few words are enough here
+    monkeypatch.setattr(transforms, '_stopwords', {'the', 'and', 'dan', 'di', 'yang'})
+
+
+def copy_files(csv_dir, names):
+    os.makedirs(csv_dir, exist_ok=True)
+    for name in names:
+        shutil.copy(os.path.join(CSV_DIR, name), csv_dir)
+
+
+def test_new_files_order(tmp_path):
+    copy_files(str(tmp_path), CSV_FILES)
+    (tmp_path / 'notes.txt').write_text('not a trending file')
+    assert ingest.new_files(str(tmp_path), {'files': CSV_FILES[:2]}) == CSV_FILES[2:]
+
+
+def test_clean_day():
+    raw = ingest.read_trending_csv(os.path.join(CSV_DIR, CSV_FILES[0]))
+    channels = pd.DataFrame({col: [] for col in store.CHANNEL_COLUMNS}, dtype=str)
+    day_df = ingest.clean(raw, channels)
+    assert len(day_df) == len(raw)
+    assert list(day_df['rank']) == list(range(1, len(raw) + 1))
+    assert day_df['trending_date'].nunique() == 1
+    assert set(day_df['categoryIdName']) <= set(transforms.CATEGORY_MAPPING.values())
+    # no social blade data: the category stands in for the channel type
+    assert (day_df['channel_type'] == day_df['categoryIdName']).all()
+    assert (day_df['time_to_trend'] == transforms.time_to_trend(day_df['trending_date'], day_df['publishedAt'])).all()
+
+
+def test_ingest_new_files_only(tmp_path):
+    csv_dir, store_dir, cache_dir = str(tmp_path / 'csv'), str(tmp_path / 'store'), str(tmp_path / 'cache')
+    copy_files(csv_dir, CSV_FILES[:3])
+    assert ingest.ingest(csv_dir, store_dir, cache_dir) == CSV_FILES[:3]
+    assert ingest.ingest(csv_dir, store_dir, cache_dir) == []
+
+    # outputs cached for this version are purged once a later ingest adds days
+    os.makedirs(cache_dir, exist_ok=True)
+    old = os.path.join(cache_dir, '%d-key.json' % store.read_manifest(store_dir)['version'])
+    open(old, 'w').close()
+    copy_files(csv_dir, CSV_FILES[3:])
+    assert ingest.ingest(csv_dir, store_dir, cache_dir) == CSV_FILES[3:]
+    assert not os.path.exists(old)
+
+    manifest = store.read_manifest(store_dir)
+    assert manifest['files'] == CSV_FILES
+    assert len(manifest['days']) == len(CSV_FILES)
+    df = store.read_videos(store_dir)
+    assert len(df) == sum(len(pd.read_csv(os.path.join(CSV_DIR, name))) for name in CSV_FILES)
+    assert df['trending_date'].is_monotonic_increasing
+
+
+def test_ingest_matches_rebuild(tmp_path):
+    '''
+    Day by day updates of the first days, occurrences, rollups, term index and moments equal a rebuild of the whole store
+    '''
+    csv_dir, store_dir = str(tmp_path / 'csv'), str(tmp_path / 'store')
+    copy_files(csv_dir, CSV_FILES)
+    ingest.ingest(csv_dir, store_dir)
+    version = store.read_manifest(store_dir)['version']
+    # the first day index kept by add_day, appends never read the earlier partitions
+    first = store.read_first_days(store_dir).sort_values('video_id', ignore_index=True)
+    rebuilt = store.first_days(store.read_videos(store_dir, ['video_id', 'trending_date']))
+    pd.testing.assert_frame_equal(first, rebuilt.sort_values('video_id', ignore_index=True))
+
+    appended = {
+        'occurrences': dayframe.read_occurrences(store_dir),
+        'rollups': rollups.DailyRollups(store_dir).tables,
+        'terms': terms.TermIndex(store_dir),
+        'moments': moments.MomentIndex(store_dir),
+    }
+    dayframe.build_occurrences(store_dir)
+    rollups.build_rollups(store_dir)
+    terms.build_terms(store_dir)
+    moments.build_moments(store_dir)
+    rebuilt = dayframe.read_occurrences(store_dir)
+    for name in ['row_day', 'prev_day', 'next_day']:
+        np.testing.assert_array_equal(getattr(appended['occurrences'], name), getattr(rebuilt, name))
+    for kind, table in rollups.DailyRollups(store_dir).tables.items():
+        pd.testing.assert_frame_equal(appended['rollups'][kind], table)
+    rebuilt = terms.TermIndex(store_dir)
+    for field in terms.FIELDS:
+        assert list(appended['terms'].terms[field]) == list(rebuilt.terms[field])
+        assert (appended['terms'].matrix[field] != rebuilt.matrix[field]).nnz == 0
+    for moment in moments.MOMENTS:
+        np.testing.assert_array_equal(appended['moments'].arrays[moment], moments.MomentIndex(store_dir).arrays[moment])
+    assert store.read_json(os.path.join(store_dir, 'moments', 'meta.json'))['version'] == version
+
+
+def test_command_line(tmp_path, monkeypatch, capsys):
+    csv_dir, store_dir, cache_dir = str(tmp_path / 'csv'), str(tmp_path / 'store'), str(tmp_path / 'cache')
+    copy_files(csv_dir, CSV_FILES[:2])
+    monkeypatch.setattr(sys, 'argv', ['ingest.py', csv_dir, '--store', store_dir, '--cache', cache_dir])
+    runpy.run_path(os.path.join(ROOT, 'app', 'ingest.py'), run_name='__main__')
+    assert capsys.readouterr().out.count('Ingested') == 2
+    assert store.read_manifest(store_dir)['files'] == CSV_FILES[:2]
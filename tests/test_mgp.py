@@ -0,0 +1,271 @@
+import numpy as np
+import pytest
+
+from mgp import MovieGroupProcess, compare_backends, fit_many, sweep
+
+
+BACKENDS = ['dict', 'numpy']
+
+DOCS = [['apple', 'banana'], ['banana', 'cherry', 'apple'], ['kiwi'], ['kiwi', 'mango'],
+        ['mango', 'kiwi', 'kiwi'], ['apple', 'cherry'], ['banana'], ['mango']] * 3
+VOCAB_SIZE = 5
+
+
+####### fit convergence and metrics
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_fit_empty_corpus(backend):
+    mgp = MovieGroupProcess(K=3, n_iters=3, backend=backend, ll_tol=1e-3)
+    assert mgp.fit([], 0, verbose=False) == []
+    assert mgp.log_likelihood() == 0.0
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_log_likelihood_only_when_needed(backend):
+    mgp = MovieGroupProcess(K=3, n_iters=3, backend=backend, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    assert [metrics['log_likelihood'] for metrics in mgp.history] == [None] * len(mgp.history)
+
+    seen = []
+    mgp = MovieGroupProcess(K=3, n_iters=3, backend=backend, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False, callback=seen.append)
+    assert seen == mgp.history
+    assert seen[-1]['log_likelihood'] == pytest.approx(mgp.log_likelihood())
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_callback_stops_fit(backend):
+    mgp = MovieGroupProcess(K=3, n_iters=10, backend=backend, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False, callback=lambda metrics: metrics['iteration'] == 1)
+    assert mgp.iterations_run == 2
+
+
+####### backend state
+def test_dict_backend_is_default():
+    mgp = MovieGroupProcess(K=3, n_iters=3, random_state=0)
+    assert mgp.backend == 'dict'
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    assert isinstance(mgp.cluster_doc_count, list)
+    assert sum(mgp.cluster_doc_count) == len(DOCS)
+
+    # the notebooks read and edit the cluster dicts in place
+    mgp.cluster_word_distribution[0]['extra'] = 1
+    assert mgp.cluster_word_distribution[0]['extra'] == 1
+
+
+def test_numpy_backend_state_is_compact():
+    mgp = MovieGroupProcess(K=3, n_iters=3, backend='numpy', random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    assert mgp.cluster_word_matrix.dtype.name == 'int32'
+    assert mgp.cluster_word_matrix.shape == (3, VOCAB_SIZE)
+    assert not hasattr(mgp, '__dict__')
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        MovieGroupProcess(backend='sparse')
+
+
+####### dict and numpy backends
+def test_backends_same_labels():
+    report = compare_backends(DOCS, VOCAB_SIZE, K=4, n_iters=5, seed=3)
+    assert report['labels_match']
+
+
+def test_backends_same_scores():
+    models = {}
+    for backend in BACKENDS:
+        models[backend] = MovieGroupProcess(K=4, n_iters=5, backend=backend, random_state=3)
+        models[backend].fit(DOCS, VOCAB_SIZE, verbose=False)
+    assert models['dict'].cluster_doc_count == list(models['numpy'].cluster_doc_count)
+    assert models['dict'].cluster_word_distribution == models['numpy'].cluster_word_distribution
+    for doc in DOCS[:8] + [['unseen'], []]:
+        assert models['numpy'].score(doc) == pytest.approx(models['dict'].score(doc))
+
+
+####### random_state
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_same_seed_same_labels(backend):
+    fits = [MovieGroupProcess(K=4, n_iters=5, backend=backend, random_state=seed).fit(DOCS, VOCAB_SIZE, verbose=False)
+            for seed in (7, 7, np.random.default_rng(7))]
+    assert fits[0] == fits[1] == fits[2]
+
+
+def test_sample_inverse_cdf():
+    mgp = MovieGroupProcess(K=3)
+    p = [0.2, 0.3, 0.5]
+    assert [mgp._sample(p, u) for u in (0.0, 0.19, 0.2, 0.49, 0.5, 0.999)] == [0, 0, 1, 1, 2, 2]
+    assert mgp._sample(np.array(p), 0.3) == 1
+
+
+####### score with repeated words
+def naive_score(mgp, doc):
+    '''
+    Formula (3) of Yin and Wang 2014 with the products written out term by term
+    '''
+    K, V, D, alpha, beta = mgp.K, mgp.vocab_size, mgp.number_docs, mgp.alpha, mgp.beta
+    p = []
+    for z in range(K):
+        words = mgp.cluster_word_distribution[z]
+        numerator = (mgp.cluster_doc_count[z] + alpha) / (D - 1 + K * alpha)
+        for word in set(doc):
+            for j in range(doc.count(word)):
+                numerator *= words.get(word, 0) + beta + j
+        for i in range(len(doc)):
+            numerator /= mgp.cluster_word_count[z] + V * beta + i
+        p.append(numerator)
+    return [x / sum(p) for x in p]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_score_repeated_words(backend):
+    mgp = MovieGroupProcess(K=4, n_iters=5, backend=backend, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    for doc in [['kiwi', 'kiwi'], ['apple', 'apple', 'apple', 'banana'], ['mango', 'unseen', 'unseen']]:
+        assert mgp.score(doc) == pytest.approx(naive_score(mgp, doc))
+
+
+####### restarts and sweeps
+def test_fit_many_keeps_best_log_likelihood():
+    configs = [(3, 0.1, 0.1, 0), (3, 0.1, 0.1, 1), (5, 0.5, 0.2, 0)]
+    best, labels, summaries = fit_many(DOCS, VOCAB_SIZE, configs, n_iters=5, n_jobs=1)
+    assert [(s['K'], s['alpha'], s['beta'], s['seed']) for s in summaries] == configs
+    top = max(summaries, key=lambda s: s['log_likelihood'])
+    assert best.K == top['K']
+    assert best.log_likelihood() == pytest.approx(top['log_likelihood'])
+    assert len(labels) == len(DOCS)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_fit_many_best_model_matches_its_fit(backend):
+    best, labels, summaries = fit_many(DOCS, VOCAB_SIZE, [(3, 0.1, 0.1, 0), (4, 0.2, 0.1, 1)], n_iters=5,
+                                       backend=backend, n_jobs=1)
+    top = max(summaries, key=lambda s: s['log_likelihood'])
+    mgp = MovieGroupProcess(top['K'], top['alpha'], top['beta'], 5, backend=backend, random_state=top['seed'])
+    assert mgp.fit(DOCS, VOCAB_SIZE, verbose=False) == labels
+    assert list(best.cluster_doc_count) == list(mgp.cluster_doc_count)
+    assert best.cluster_word_distribution == mgp.cluster_word_distribution
+    assert best.iterations_run == mgp.iterations_run
+    assert best.score(DOCS[0]) == pytest.approx(mgp.score(DOCS[0]))
+
+
+def test_sweep_grid():
+    _, _, summaries = sweep(DOCS, VOCAB_SIZE, Ks=[2, 3], alphas=[0.1], betas=[0.1, 0.3], seeds=(0, 1), n_iters=3, n_jobs=1)
+    assert len(summaries) == 8
+
+
+####### save / load
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_save_load_round_trip(tmp_path, backend):
+    mgp = MovieGroupProcess(K=4, alpha=0.2, beta=0.05, n_iters=5, backend=backend, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    mgp.save(str(tmp_path / 'model.mgp'))
+
+    loaded = MovieGroupProcess.load(str(tmp_path / 'model.mgp'))
+    assert (loaded.K, loaded.alpha, loaded.beta, loaded.number_docs, loaded.vocab_size) == (4, 0.2, 0.05, len(DOCS), VOCAB_SIZE)
+    assert list(loaded.cluster_doc_count) == list(mgp.cluster_doc_count)
+    assert loaded.cluster_word_distribution == mgp.cluster_word_distribution
+    for doc in DOCS[:8] + [['unseen']]:
+        assert loaded.score(doc) == pytest.approx(mgp.score(doc))
+
+
+def test_save_unfitted_model(tmp_path):
+    MovieGroupProcess(K=2).save(str(tmp_path / 'empty.mgp'))
+    loaded = MovieGroupProcess.load(str(tmp_path / 'empty.mgp'))
+    assert loaded.vocab == [] and list(loaded.cluster_doc_count) == [0, 0]
+
+
+def test_load_rejects_other_files(tmp_path):
+    (tmp_path / 'other.bin').write_bytes(b'not a model at all')
+    with pytest.raises(ValueError):
+        MovieGroupProcess.load(str(tmp_path / 'other.bin'))
+
+
+def test_save_rejects_newline_words(tmp_path):
+    mgp = MovieGroupProcess(K=2, random_state=0)
+    mgp.fit([['a\nb'], ['c']], 2, verbose=False)
+    with pytest.raises(ValueError):
+        mgp.save(str(tmp_path / 'model.mgp'))
+
+
+####### batch scoring
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_score_many_matches_score(backend):
+    mgp = MovieGroupProcess(K=4, n_iters=5, backend=backend, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    docs = DOCS[:8] + [['unseen'], [], ['kiwi', 'kiwi', 'unseen']]
+    probs = mgp.score_many(docs, chunk_size=3)
+    assert probs.shape == (len(docs), 4)
+    for doc, row in zip(docs, probs):
+        assert row == pytest.approx(mgp.score(doc))
+
+    labels, best = mgp.predict_many(docs, chunk_size=3)
+    for doc, label, p in zip(docs, labels, best):
+        assert (label, p) == pytest.approx(mgp.choose_best_label(doc))
+
+
+def test_score_many_empty_batch():
+    mgp = MovieGroupProcess(K=3, n_iters=3, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    assert mgp.score_many([]).shape == (0, 3)
+
+
+####### partial_fit
+def cluster_totals(mgp, docs, labels):
+    '''
+    Cluster counts recomputed from documents and their labels
+    '''
+    doc_count = [0] * mgp.K
+    word_count = [0] * mgp.K
+    for doc, z in zip(docs, labels):
+        doc_count[z] += 1
+        word_count[z] += len(doc)
+    return doc_count, word_count
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_partial_fit_counts(backend):
+    old_docs, new_docs = DOCS[:16], DOCS[16:] + [['papaya', 'kiwi'], ['papaya']]
+    mgp = MovieGroupProcess(K=4, n_iters=5, backend=backend, random_state=0)
+    old_labels = mgp.fit(old_docs, VOCAB_SIZE, verbose=False)
+    new_labels = mgp.partial_fit(new_docs, expired_docs=old_docs[:4], expired_labels=old_labels[:4], verbose=False)
+
+    docs, labels = old_docs[4:] + new_docs, old_labels[4:] + new_labels
+    doc_count, word_count = cluster_totals(mgp, docs, labels)
+    assert mgp.number_docs == len(docs)
+    assert list(mgp.cluster_doc_count) == doc_count
+    assert list(mgp.cluster_word_count) == word_count
+    # papaya is the only word partial_fit has not seen before
+    assert mgp.vocab_size == VOCAB_SIZE + 1
+    assert sum(words.get('papaya', 0) for words in mgp.cluster_word_distribution) == 2
+
+
+def test_partial_fit_backends_agree():
+    labels = {}
+    for backend in BACKENDS:
+        mgp = MovieGroupProcess(K=4, n_iters=5, backend=backend, random_state=0)
+        old_labels = mgp.fit(DOCS[:16], VOCAB_SIZE, verbose=False)
+        labels[backend] = mgp.partial_fit(DOCS[16:], DOCS[:2], old_labels[:2], verbose=False)
+    assert labels['dict'] == labels['numpy']
+
+
+def test_partial_fit_expired_labels_length():
+    mgp = MovieGroupProcess(K=2, n_iters=2, random_state=0)
+    mgp.fit(DOCS, VOCAB_SIZE, verbose=False)
+    with pytest.raises(ValueError):
+        mgp.partial_fit([], expired_docs=DOCS[:2], expired_labels=[0], verbose=False)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_partial_fit_expired_words_stay_known(tmp_path, backend):
+    mgp = MovieGroupProcess(K=2, n_iters=2, backend=backend, random_state=0)
+    labels = mgp.fit([['a', 'b'], ['c'], ['d']], 4, verbose=False)
+    mgp.partial_fit([['c']], expired_docs=[['a', 'b']], expired_labels=labels[:1], verbose=False)
+    # a and b have no count left in any cluster but were counted in the vocabulary before
+    labels = mgp.partial_fit([['a', 'b']], verbose=False)
+    assert mgp.vocab_size == 4
+    mgp.partial_fit([], expired_docs=[['a', 'b']], expired_labels=labels, verbose=False)
+    mgp.save(str(tmp_path / 'model.mgp'))
+    loaded = MovieGroupProcess.load(str(tmp_path / 'model.mgp'))
+    for model in (mgp, loaded):
+        model.partial_fit([['a'], ['e']], verbose=False)
+        assert model.vocab_size == 5
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import moments
+import store
+
+
+####### Range moments against pandas on the first rows of every video
+DAYS = ['2020-07-%02d' % day for day in range(8, 18)]
+
+
+@pytest.fixture(scope='module')
+def trending(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    n = 1500
+    df = pd.DataFrame({'trending_date': pd.to_datetime(rng.choice(DAYS, n)).tz_localize('UTC'),
+                       'video_id': rng.choice(['v%d' % i for i in range(500)], n)})
+    for col in moments.COLUMNS:
+        values = rng.lognormal(8, 2, n)
+        # columns missing on different rows, corr() is pairwise
+        values[rng.random(n) < 0.1] = np.nan
+        df[col] = values
+    df = df.sort_values('trending_date', kind='stable').reset_index(drop=True)
+    store_dir = str(tmp_path_factory.mktemp('store'))
+    store.write_store(df.assign(channelId='', channelTitle='', avatar_url='', channel_type='', curr_subs='',
+                                country='', rank_y='', past_view_gains=None), store_dir)
+    moments.build_moments(store_dir)
+    return df, moments.MomentIndex(store_dir)
+
+
+def first_rows(df, days):
+    first = df.drop_duplicates(subset='video_id', keep='first')
+    return first[first['trending_date'].dt.strftime('%Y-%m-%d').isin(days)][moments.COLUMNS]
+
+
+@pytest.mark.parametrize('days', [DAYS, DAYS[:1], DAYS[3:7], DAYS[-2:]])
+def test_range_matches_pandas(trending, days):
+    df, index = trending
+    expected = first_rows(df, days)
+    pd.testing.assert_series_equal(index.mean(days), expected.mean(), rtol=1e-10)
+    pd.testing.assert_series_equal(index.var(days), expected.var(), rtol=1e-8)
+    pd.testing.assert_frame_equal(index.corr(days), expected.corr(), atol=1e-10)
+
+
+def test_too_few_rows():
+    day = {col: [1.0, np.nan] for col in moments.COLUMNS}
+    day['likes'] = [np.nan, np.nan]
+    frame = pd.DataFrame(day)
+    index = moments.MomentIndex.__new__(moments.MomentIndex)
+    index.rows = {'d': 0}
+    index.arrays = moments._stack([moments.day_moments(frame)])
+    # one value per column: no variance, no correlation, like pandas
+    pd.testing.assert_series_equal(index.mean(['d']), frame.mean())
+    pd.testing.assert_series_equal(index.var(['d']), frame.var())
+    pd.testing.assert_frame_equal(index.corr(['d']), frame.corr())
+    assert index.mean(['missing']).isna().all()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import range_index
+from dayframe import DayFrame
+
+
+####### Range counts against the groupby of the rows in the range
+N_DAYS = 20
+
+
+@pytest.fixture(scope='module')
+def videos():
+    rng = np.random.default_rng(0)
+    n = 3000
+    dates = pd.date_range('2020-07-08', periods=N_DAYS, tz='UTC')
+    df = pd.DataFrame({'trending_date': dates[rng.integers(0, N_DAYS, n)],
+                       'video_id': rng.choice(['v%d' % i for i in range(400)], n),
+                       # channel attributes change between the rows of a video
+                       'country': rng.choice(['ID', 'US', 'JP', ''], n),
+                       'rank_y': rng.choice(['A', 'B', ''], n),
+                       'channel_type': rng.choice(['Music', 'Gaming'], n)})
+    return DayFrame(df, dates)
+
+
+RANGES = [(0, N_DAYS - 1), (0, 0), (3, 9), (7, 8), (N_DAYS - 1, N_DAYS - 1), (12, 19)]
+
+
+def expected(frame, cols):
+    expected = frame.groupby(cols).agg('count')['video_id'].reset_index()
+    expected.columns = cols + ['count']
+    return expected
+
+
+@pytest.mark.parametrize('cols', [['country'], ['rank_y', 'channel_type']])
+@pytest.mark.parametrize('start, end', RANGES)
+def test_prefix_counts(videos, cols, start, end):
+    counts = range_index.PrefixCounts(videos.day_codes(), videos.frame, cols, N_DAYS)
+    in_range = videos.frame.iloc[videos.offsets[start]:videos.offsets[end + 1]]
+    pd.testing.assert_frame_equal(counts.counts(start, end), expected(in_range, cols), check_dtype=False)
+
+
+@pytest.mark.parametrize('cols', [['country'], ['rank_y', 'channel_type']])
+@pytest.mark.parametrize('start, end', RANGES)
+def test_unique_counts_by_last_row(videos, cols, start, end):
+    counts = range_index.UniqueCounts(videos.day_codes(), videos.occurrences.next_day, videos.frame, cols, N_DAYS)
+    in_range = videos.frame.iloc[videos.offsets[start]:videos.offsets[end + 1]]
+    last = in_range.drop_duplicates(subset='video_id', keep='last')
+    pd.testing.assert_frame_equal(counts.counts(start, end), expected(last, cols), check_dtype=False)
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import range_index
+import rollups
+import store
+import transforms
+from dayframe import DayFrame
+
+
+####### Rollups against the groupby of the rows app.py did before them
+N_DAYS = 12
+DAYS = pd.date_range('2020-07-08', periods=N_DAYS, tz='UTC')
+RANGES = [(0, N_DAYS - 1), (0, 0), (2, 6), (5, 5), (N_DAYS - 1, N_DAYS - 1), (7, 11)]
+
+
+def trending_frame():
+    '''
+    final.pkl shaped rows: videos trending over several days, channel attributes changing between
+    their rows, empty countries and social blade ranks
+    '''
+    rng = np.random.default_rng(0)
+    n = 1500
+    videos = np.array(['v%d' % i for i in range(250)])
+    channels = np.array(['channel %d' % i for i in range(30)])
+    video = rng.integers(0, len(videos), n)
+    published = pd.Timestamp('2020-07-01', tz='UTC') + pd.to_timedelta(rng.integers(0, 14 * 24 * 60, n), unit='min')
+    df = pd.DataFrame({'video_id': videos[video],
+                       'title': np.char.add('title ', videos[video]),
+                       'publishedAt': published,
+                       'channelId': np.char.add('id ', channels[video % len(channels)]),
+                       'channelTitle': channels[video % len(channels)],
+                       'categoryIdName': rng.choice(['Music', 'Comedy', 'Gaming', 'Sports', 'News & Politics', 'Education'], n),
+                       'trending_date': DAYS[rng.integers(0, N_DAYS, n)],
+                       'view_count': rng.integers(0, 10 ** 6, n),
+                       'likes': rng.integers(0, 1000, n),
+                       'comment_count': rng.integers(0, 100, n),
+                       'thumbnail_link': np.char.add('https://i.ytimg.com/vi/', videos[video]),
+                       'avatar_url': np.char.add('https://yt3.ggpht.com/', channels[video % len(channels)]),
+                       'channel_type': rng.choice(['Music', 'Entertainment', 'Games', 'People', 'Comedy', 'Film', 'Sports'], n),
+                       'curr_subs': rng.choice(['1M', '2.5M'], n),
+                       'country': rng.choice(['ID', 'US', 'JP', 'KR', ''], n),
+                       'rank_y': rng.choice(['A', 'B+', 'B', ''], n),
+                       'past_view_gains': None})
+    df['publish_cat'] = transforms.publish_cat(df['publishedAt'])
+    # a video trends at most once a day
+    df = df.drop_duplicates(subset=['video_id', 'trending_date'])
+    df = df.sort_values('trending_date', kind='stable', ignore_index=True)
+    # rank within the day
+    df['rank'] = df.groupby('trending_date').cumcount() + 1
+    return df
+
+
+@pytest.fixture(scope='module')
+def store_dir(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('store'))
+    store.write_store(trending_frame(), path)
+    rollups.build_rollups(path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def daily(store_dir):
+    return rollups.DailyRollups(store_dir)
+
+
+@pytest.fixture(scope='module')
+def df(store_dir):
+    # the rows as app.py reads them, with categorical columns
+    return store.read_videos(store_dir)
+
+
+def on_day(df, value):
+    return df[(df['trending_date'] == value)]
+
+
+def in_range(df, start, end):
+    return df[(df['trending_date'] >= DAYS[start]) & (df['trending_date'] <= DAYS[end])]
+
+
+def last_rows(frame):
+    frame = frame.sort_values('trending_date', ascending = True)
+    return frame.drop_duplicates(subset='video_id', keep='last')
+
+
+def first_rows(frame):
+    frame = frame.sort_values('trending_date', ascending = True)
+    return frame.drop_duplicates(subset='video_id', keep='first')
+
+
+def assert_counts_equal(result, expected):
+    # same rows and counts, in the same order
+    pd.testing.assert_frame_equal(result.astype(object), expected.astype(object))
+
+
+####### Daily tab: one rollup lookup per trending day
+DAILY_DAYS = [0, 3, N_DAYS - 1]
+
+
+@pytest.mark.parametrize('day', DAILY_DAYS)
+def test_categories(daily, df, day):
+    temp = on_day(df, DAYS[day])['categoryIdName'].astype(object).value_counts()
+    expected = pd.DataFrame({'categoryIdName': temp.index, 'count': temp.values})
+    assert_counts_equal(daily.get('categories', DAYS[day]), expected)
+
+
+@pytest.mark.parametrize('day', DAILY_DAYS)
+def test_top_rank(daily, df, day):
+    filtered_df = on_day(df, DAYS[day])
+    filtered_df = filtered_df[filtered_df['rank'] <= 10]
+    filtered_df = filtered_df.sort_values('rank', ascending = True)
+    expected = filtered_df[['rank', 'title', 'thumbnail_link', 'view_count']].reset_index(drop=True)
+    pd.testing.assert_frame_equal(daily.get('top_rank', DAYS[day]), expected)
+
+
+@pytest.mark.parametrize('day', DAILY_DAYS)
+def test_publish_days(daily, df, day):
+    expected = on_day(df, DAYS[day]).resample('D', on='publishedAt').count()['video_id'].reset_index()
+    result = daily.get('publish_days', DAYS[day])
+    np.testing.assert_array_equal(result['publishedAt'], expected['publishedAt'])
+    np.testing.assert_array_equal(result['count'], expected['video_id'])
+
+
+@pytest.mark.parametrize('day', DAILY_DAYS)
+def test_publish_hours(daily, df, day):
+    temp = on_day(df, DAYS[day]).groupby(['publish_cat', 'categoryIdName'], observed=True).agg('count')['title'].reset_index()
+    temp.columns = ['publish_cat', 'categoryIdName', 'count']
+    assert_counts_equal(daily.get('publish_hours', DAYS[day]), temp)
+
+
+@pytest.mark.parametrize('day', DAILY_DAYS)
+def test_channels(daily, df, day):
+    filtered_df = on_day(df, DAYS[day]).groupby(['channelTitle', 'avatar_url', 'channel_type','curr_subs'], observed=True).agg('count')['video_id'].reset_index()
+    filtered_df = filtered_df.sort_values('video_id', ascending = False)
+    expected = filtered_df[:10].rename(columns={'video_id': 'count'}).reset_index(drop=True)
+    assert_counts_equal(daily.get('channels', DAYS[day]), expected)
+
+
+@pytest.mark.parametrize('day', DAILY_DAYS)
+def test_countries(daily, df, day):
+    filtered_df = on_day(df, DAYS[day]).groupby(['country'], observed=True).agg('count')['video_id'].reset_index()
+    filtered_df = filtered_df[filtered_df['country'] != ''].reset_index(drop=True)
+    filtered_df.columns = ['country', 'count']
+    assert_counts_equal(daily.get('countries', DAYS[day]), filtered_df)
+
+
+def test_missing_day(daily):
+    # the date dropdown only offers stored days, any other date has empty rollups
+    assert len(daily.get('categories', '2021-01-01')) == 0
+
+
+@pytest.mark.parametrize('kind, cols', [('categories', ['categoryIdName']),
+                                        ('publish_hours', ['publish_cat', 'categoryIdName']),
+                                        ('countries', ['country'])])
+@pytest.mark.parametrize('start, end', RANGES)
+def test_daily_counts_add_up_over_ranges(daily, df, kind, cols, start, end):
+    # counts of every row are additive, the days of a range sum to the groupby of its rows
+    summed = pd.concat([daily.get(kind, DAYS[day]) for day in range(start, end + 1)])
+    summed = summed.groupby(cols, observed=True)['count'].sum().reset_index()
+    expected = in_range(df, start, end).astype({col: object for col in cols})
+    expected = expected.groupby(cols).agg('count')['video_id'].reset_index()
+    expected = expected[(expected[cols] != '').all(axis=1)].reset_index(drop=True)
+    expected.columns = cols + ['count']
+    assert_counts_equal(summed, expected)
+
+
+####### Weekly tab: counts of a slider range from the cumulative per day arrays
+@pytest.fixture(scope='module')
+def weekly(df):
+    # built like app.py
+    videos = DayFrame(df, DAYS)
+    first_videos = DayFrame(videos.frame[videos.occurrences.prev_day == -1], DAYS)
+    df_days = videos.day_codes()
+    first_days = first_videos.day_codes()
+    return {
+        'categories': range_index.PrefixCounts(first_days, first_videos.frame, ['categoryIdName'], N_DAYS),
+        'publish_hours': range_index.PrefixCounts(first_days, first_videos.frame, ['publish_cat', 'categoryIdName'], N_DAYS),
+        'countries': range_index.UniqueCounts(df_days, videos.occurrences.next_day, videos.frame, ['country'], N_DAYS),
+        'sb_ranks': range_index.UniqueCounts(df_days, videos.occurrences.next_day, videos.frame, ['rank_y', 'channel_type'], N_DAYS),
+    }
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_weekly_categories(weekly, df, start, end):
+    # unique videos by their first trending day, no_dups_f in app.py
+    no_dups_f = first_rows(df)
+    temp = in_range(no_dups_f, start, end)['categoryIdName'].value_counts()
+    result = weekly['categories'].counts(start, end)
+    assert dict(zip(result['categoryIdName'], result['count'])) == temp[temp > 0].to_dict()
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_weekly_publish_hours(weekly, df, start, end):
+    filtered_df = in_range(first_rows(df), start, end)
+    temp = filtered_df.groupby(['publish_cat', 'categoryIdName'], observed=True).agg('count')['title'].reset_index()
+    temp.columns = ['publish_cat', 'categoryIdName', 'count']
+    assert_counts_equal(weekly['publish_hours'].counts(start, end), temp)
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_weekly_countries(weekly, df, start, end):
+    filtered_df = last_rows(in_range(df, start, end))
+    filtered_df = filtered_df.groupby(['country'], observed=True).agg('count')['video_id'].reset_index()
+    filtered_df.columns = ['country', 'count']
+    assert_counts_equal(weekly['countries'].counts(start, end), filtered_df)
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_weekly_sb_ranks(weekly, df, start, end):
+    filtered_df = last_rows(in_range(df, start, end))
+    filtered_df = filtered_df.groupby(['rank_y', 'channel_type'], observed=True).agg('count')['video_id'].reset_index()
+    filtered_df.columns = ['rank_y', 'channel_type', 'count']
+    assert_counts_equal(weekly['sb_ranks'].counts(start, end), filtered_df)
@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import store
+
+
+####### Store round trips
+DAYS = pd.date_range('2020-07-08', periods=3, tz='UTC')
+
+
+def final_frame():
+    '''
+    Small final.pkl shaped frame: 3 trending days, videos trending on several days
+    '''
+    rows = []
+    for day_ind, day in enumerate(DAYS):
+        for video in range(day_ind, day_ind + 4):
+            channel = video % 3
+            rows.append({
+                'video_id': 'v%d' % video,
+                'title': 'title %d' % video,
+                'publishedAt': day - pd.Timedelta(hours=video + 1),
+                'channelId': 'c%d' % channel,
+                'channelTitle': 'channel %d' % channel,
+                'categoryIdName': ['Music', 'Comedy', 'Entertainment'][video % 3],
+                'trending_date': day,
+                'tags': ['tag%d' % video, 'shared'],
+                'view_count': 1000 * video + day_ind,
+                'likes': 10 * video,
+                'dislikes': video,
+                'comment_count': 5 * video,
+                'thumbnail_link': 'https://i.ytimg.com/vi/v%d/default.jpg' % video,
+                'rank': video - day_ind + 1,
+                'avatar_url': 'https://yt3.ggpht.com/c%d' % channel,
+                'channel_type': ['Music', 'Entertainment'][channel % 2],
+                'curr_subs': '%dK' % (channel + 1),
+                'country': ['ID', 'US', 'ID'][channel],
+                'rank_y': ['A', 'B+', 'B'][channel],
+                'time_to_trend': video + 1,
+                'publish_cat': video % 4,
+                'curr_subs_num': 1000.0 * (channel + 1),
+                'curr_subs_cat': 'small',
+                'title_cleaned': ['title', str(video)],
+                'desc_cleaned': ['desc'],
+                # the scrape of the last row of a channel is the one kept
+                'past_view_gains': {'2020-07-0%d' % d: 100 * channel + d + day_ind for d in range(1, 4)},
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def final():
+    return final_frame()
+
+
+@pytest.fixture
+def store_dir(tmp_path, final):
+    path = str(tmp_path / 'store')
+    store.write_store(final, path)
+    return path
+
+
+def test_write_read_round_trip(store_dir, final):
+    manifest = store.read_manifest(store_dir)
+    assert manifest == {'version': 1, 'days': [d.strftime('%Y-%m-%d') for d in DAYS], 'files': []}
+    assert sorted(os.listdir(os.path.join(store_dir, 'videos'))) == [day + '.arrow' for day in manifest['days']]
+
+    df = store.read_videos(store_dir)
+    assert list(df.columns) == store.VIDEO_COLUMNS
+    expected = final[store.VIDEO_COLUMNS]
+    for col in store.VIDEO_COLUMNS:
+        if col in store.CATEGORICAL_COLUMNS or col in store.TEXT_COLUMNS:
+            continue
+        pd.testing.assert_series_equal(df[col], expected[col], check_names=False)
+    # list columns come back as arrays
+    for col in store.TEXT_COLUMNS:
+        assert [list(value) for value in df[col]] == list(expected[col])
+
+
+def test_categorical_columns(store_dir, final):
+    df = store.read_videos(store_dir)
+    for col in store.CATEGORICAL_COLUMNS:
+        # one sorted ordered category set over the partitions, so groupby sorts like the strings
+        assert df[col].dtype == pd.CategoricalDtype(sorted(final[col].unique()), ordered=True)
+        assert list(df[col].astype(str)) == list(final[col])
+    counts = df.groupby('categoryIdName', observed=True).size()
+    pd.testing.assert_series_equal(counts, final.groupby('categoryIdName').size(), check_index_type=False,
+                                   check_categorical=False)
+
+
+def test_column_and_day_selection(store_dir, final):
+    days = store.read_manifest(store_dir)['days']
+    df = store.read_videos(store_dir, ['video_id', 'country', 'trending_date'], days=days[1:])
+    assert list(df.columns) == ['video_id', 'country', 'trending_date']
+    assert list(df['video_id']) == list(final['video_id'][final['trending_date'] >= DAYS[1]])
+
+    # the table stays in Arrow over the memory-mapped files, the frame converts it
+    table = store.read_videos_table(store_dir, ['video_id', 'view_count'], days=days[:2])
+    assert table.num_rows == (final['trending_date'] <= DAYS[1]).sum()
+    assert table.column('view_count').to_pylist() == list(final['view_count'][:table.num_rows])
+
+
+def test_view_gains_and_channels(store_dir, final):
+    gains = store.read_view_gains(store_dir)
+    assert list(gains.columns) == ['channelId', 'channelTitle', 'date', 'views']
+    # the last row of every channel holds its scrape
+    last = final.drop_duplicates(subset='channelTitle', keep='last')
+    expected = {(title, date): views for title, scrape in zip(last['channelTitle'], last['past_view_gains'])
+                for date, views in scrape.items()}
+    assert dict(zip(zip(gains['channelTitle'], gains['date']), gains['views'])) == expected
+    assert len(gains) == len(expected)
+
+    channels = store.read_channels(store_dir)
+    assert list(channels.columns) == store.CHANNEL_COLUMNS
+    assert sorted(channels['channelId']) == ['c0', 'c1', 'c2']
+
+
+def test_ensure_store(tmp_path, final):
+    path, pickle_path = str(tmp_path / 'store'), str(tmp_path / 'final.pkl')
+    final.to_pickle(pickle_path)
+    store.ensure_store(path, pickle_path)
+    assert store.read_manifest(path)['version'] == 1
+    # an existing store is kept, the pickle is not read again
+    os.remove(pickle_path)
+    store.ensure_store(path, pickle_path)
+    assert len(store.read_videos(path)) == len(final)
+    # a rewrite bumps the version
+    store.write_store(final, path)
+    assert store.read_manifest(path)['version'] == 2
+
+
+def test_add_day(tmp_path, final):
+    path = str(tmp_path / 'store')
+    store.init_store(path)
+    assert store.read_manifest(path) == {'version': 0, 'days': [], 'files': []}
+    assert len(store.read_view_gains(path)) == 0
+
+    # days added out of order are listed in order
+    day_frames = [day_df for _, day_df in final.groupby('trending_date')]
+    day, manifest = store.add_day(path, day_frames[1], files=['b.csv'])
+    assert day == '2020-07-09'
+    day, manifest = store.add_day(path, day_frames[0], files=['a.csv'])
+    assert manifest == {'version': 2, 'days': ['2020-07-08', '2020-07-09'], 'files': ['b.csv', 'a.csv']}
+    assert list(store.read_videos(path)['video_id']) == list(day_frames[0]['video_id']) + list(day_frames[1]['video_id'])
+
+    # replacing a day rewrites its partition
+    replaced = day_frames[1].iloc[:2]
+    day, manifest = store.add_day(path, replaced, files=['b.csv'])
+    assert manifest['version'] == 3 and manifest['days'] == ['2020-07-08', '2020-07-09'] and manifest['files'] == ['b.csv', 'a.csv']
+    assert len(store.read_videos(path, days=['2020-07-09'])) == 2
+
+    # first trending days follow the earliest partition of every video
+    store.add_day(path, day_frames[2])
+    first = store.read_first_days(path).set_index('video_id')['day']
+    expected = store.first_days(final).set_index('video_id')['day']
+    assert first.sort_index().to_dict() == expected.sort_index().to_dict()
+    assert sorted(store.seen_before(path, '2020-07-10')) == ['v0', 'v1', 'v2', 'v3', 'v4']
+
+
+def test_read_first_days_builds_missing_index(store_dir, final):
+    os.remove(os.path.join(store_dir, 'first_days.arrow'))
+    first = store.read_first_days(store_dir)
+    assert os.path.exists(os.path.join(store_dir, 'first_days.arrow'))
+    assert np.array_equal(first.sort_values('video_id')['day'],
+                          store.first_days(final).sort_values('video_id')['day'])
@@ -0,0 +1,63 @@
+from collections import Counter
+
+import pytest
+
+import store
+import synthetic
+import terms
+
+
+####### Top terms of a range of days against counting the rows of the range
+N_DAYS = 8
+RANGES = [(0, N_DAYS - 1), (0, 0), (2, 5), (N_DAYS - 1, N_DAYS - 1)]
+
+
+@pytest.fixture(scope='module')
+def trending():
+    # zipfian words, so counts tie around the n-th term
+    return synthetic.trending_frame(N_DAYS, videos_per_day=60)
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory, trending):
+    store_dir = str(tmp_path_factory.mktemp('store'))
+    store.write_store(trending, store_dir)
+    terms.build_terms(store_dir)
+    return terms.TermIndex(store_dir)
+
+
+def days_of(trending, start, end):
+    return sorted(trending['trending_date'].dt.strftime('%Y-%m-%d').unique())[start:end + 1]
+
+
+def plain_counts(trending, field, days):
+    '''
+    Counter of the words of the videos first trending on days (no_dups_f of the word clouds)
+    '''
+    first = trending.sort_values('trending_date', kind='stable').drop_duplicates(subset='video_id', keep='first')
+    first = first[first['trending_date'].dt.strftime('%Y-%m-%d').isin(days)]
+    counts = Counter()
+    for value in first[terms.FIELDS[field]]:
+        # synthetic words are lowercase 'w<n>' tokens, neither stopwords nor numbers
+        counts.update([] if value == '[none]' else value.split('|') if field == 'tags' else value)
+    return counts
+
+
+@pytest.mark.parametrize('field', list(terms.FIELDS))
+@pytest.mark.parametrize('start, end', RANGES)
+def test_top_matches_counter(index, trending, field, start, end):
+    days = days_of(trending, start, end)
+    counts = plain_counts(trending, field, days)
+    assert index.top(field, days, len(counts) + 10) == dict(counts)
+    assert index.top(field, days, 0) == {}
+    for n in [1, 20, 200]:
+        top = index.top(field, days, n)
+        assert top == {term: counts[term] for term in top}
+        # most frequent first, any of the terms tied at the n-th count
+        assert list(top.values()) == sorted(counts.values(), reverse=True)[:n]
+
+
+def test_days_outside_the_index(index, trending):
+    days = days_of(trending, 0, 1)
+    assert index.top('title', days + ['2021-01-01'], 20) == index.top('title', days, 20)
+    assert index.top('title', [], 20) == {}
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import topk
+from dayframe import DayFrame
+
+
+####### Top K against sorting the rows in the range
+N_DAYS = 15
+
+
+@pytest.fixture(scope='module')
+def videos():
+    rng = np.random.default_rng(0)
+    n = 2000
+    dates = pd.date_range('2020-07-08', periods=N_DAYS, tz='UTC')
+    df = pd.DataFrame({'trending_date': dates[rng.integers(0, N_DAYS, n)],
+                       'video_id': rng.choice(['v%d' % i for i in range(300)], n),
+                       # few distinct values, so ties cross the k-th place
+                       'view_count': rng.integers(0, 50, n),
+                       'likes': rng.random(n)})
+    return DayFrame(df, dates)
+
+
+@pytest.mark.parametrize('values, k', [([3, 1, 2], 2), ([1, 1, 1, 1], 2), ([5, 1, 5, 2, 5], 3), ([2, 1], 5), ([], 3)])
+def test_top_k_breaks_ties_by_position(values, k):
+    # largest first, later positions first among equal values
+    expected = sorted(range(len(values)), key=lambda i: (values[i], i), reverse=True)[:k]
+    assert list(topk.top_k(values, k)) == expected
+
+
+@pytest.mark.parametrize('metric', ['view_count', 'likes'])
+@pytest.mark.parametrize('start, end', [(0, N_DAYS - 1), (0, 0), (4, 9), (N_DAYS - 1, N_DAYS - 1)])
+@pytest.mark.parametrize('k', [1, 5, 25])
+def test_frame_matches_sort(videos, metric, start, end, k):
+    top = topk.TopK(videos, ['view_count', 'likes'])
+    in_range = videos.frame.iloc[videos.offsets[start]:videos.offsets[end + 1]]
+    # stable, so among ties the later rows are the last ones
+    expected = in_range.drop_duplicates(subset='video_id', keep='last').sort_values(metric, kind='stable')[-k:]
+    pd.testing.assert_frame_equal(top.frame(metric, start, end, k), expected)
+
+
+@pytest.mark.parametrize('start, end', [(0, N_DAYS - 1), (4, 9)])
+def test_frame_from_table(videos, start, end):
+    # same rows and index read from an Arrow table of the rows instead of the frame
+    table = pa.Table.from_pandas(videos.frame, preserve_index=False)
+    top = topk.TopK(videos, ['view_count'], table.select(['video_id', 'view_count']))
+    expected = topk.TopK(videos, ['view_count']).frame('view_count', start, end, 10)
+    pd.testing.assert_frame_equal(top.frame('view_count', start, end, 10), expected[['video_id', 'view_count']])
+
+
+def test_table_must_match_rows(videos):
+    table = pa.Table.from_pandas(videos.frame.iloc[:10], preserve_index=False)
+    with pytest.raises(ValueError):
+        topk.TopK(videos, ['view_count'], table)
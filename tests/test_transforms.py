@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import transforms
+import transforms_reference as ref
+
+
+####### Vectorized transforms against the row-wise originals of 02_EDA_Clean.ipynb
+def random_frame(n, seed):
+    '''
+    Seeded columns covering the branches of the originals: half hour boundaries, negative
+    time to trend, every subscriber format and missing social blade data
+    '''
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame()
+    df['categoryId'] = rng.choice(list(transforms.CATEGORY_MAPPING), n)
+    df['categoryIdName'] = transforms.category_name(df['categoryId'])
+    df['trending_date'] = pd.Timestamp('2020-07-08 20:00', tz='UTC') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+    df['publishedAt'] = df['trending_date'] - pd.to_timedelta(rng.integers(-3 * 3600, 30 * 86400, n), unit='s')
+    subs = rng.integers(1, 100000000, n)
+    formats = rng.integers(0, 4, n)
+    df['curr_subs'] = ['' if f == 0 else ('%.2fM' % (x / 1e6) if f == 1 else ('%.1fK' % (x / 1e3 % 1000) if f == 2 else '%dK' % (x / 1e3 % 1000)))
+                       for x, f in zip(subs, formats)]
+    df['channel_type'] = np.where(rng.random(n) < 0.3, '', rng.choice(list(transforms.CATEGORY_MAPPING.values()), n))
+    return df
+
+
+def edge_frame():
+    '''
+    Hand picked boundaries: minutes 14/15/44/45 and 23:45 (-> 24:00), publish after the
+    trending time, subscriber strings with and without a point, bucket limits
+    '''
+    published = pd.to_datetime(['2020-07-08 10:14:59', '2020-07-08 10:15', '2020-07-08 10:44', '2020-07-08 10:45',
+                                '2020-07-08 23:45', '2020-07-08 00:00', '2020-07-09 21:30', '2020-07-01 05:59'], utc=True)
+    return pd.DataFrame({
+        'categoryId': [1, 2, 10, 24, 34, 44, 22, 25],
+        'trending_date': pd.Timestamp('2020-07-09 20:00', tz='UTC'),
+        'publishedAt': published,
+        'curr_subs': ['', '1.23M', '950K', '12.5K', '1234.5K', '10M', '500K', '0.5M'],
+        'channel_type': ['', 'Music', '', 'Gaming', '', '', 'Comedy', ''],
+    }).assign(categoryIdName=lambda df: transforms.category_name(df['categoryId']))
+
+
+def empty_frame():
+    return pd.DataFrame({
+        'categoryId': pd.Series([], dtype='int64'),
+        'categoryIdName': pd.Series([], dtype=object),
+        'trending_date': pd.Series([], dtype='datetime64[ns, UTC]'),
+        'publishedAt': pd.Series([], dtype='datetime64[ns, UTC]'),
+        'curr_subs': pd.Series([], dtype=object),
+        'channel_type': pd.Series([], dtype=object),
+    })
+
+
+FRAMES = {'random': lambda: random_frame(5000, 0), 'edges': edge_frame, 'empty': empty_frame}
+
+
+def row_wise(df, func, columns=None):
+    '''
+    func applied row by row (on a Series, or on the rows of columns), like the notebook
+    '''
+    if columns is None:
+        return [func(x) for x in df]
+    return [func(row) for _, row in df[columns].iterrows()]
+
+
+def assert_same(got, expected):
+    assert len(got) == len(expected)
+    # NaN only equals NaN
+    pd.testing.assert_series_equal(pd.Series(list(got), dtype=object), pd.Series(list(expected), dtype=object))
+
+
+@pytest.fixture(params=list(FRAMES))
+def df(request):
+    return FRAMES[request.param]()
+
+
+def test_category_name(df):
+    assert_same(transforms.category_name(df['categoryId']), row_wise(df['categoryId'], lambda x: ref.category_mapping[x]))
+
+
+def test_time_to_trend(df):
+    assert_same(transforms.time_to_trend(df['trending_date'], df['publishedAt']),
+                row_wise(df['trending_date'] - df['publishedAt'], ref.days_hours_minutes))
+
+
+def test_publish_cat(df):
+    assert_same(transforms.publish_cat(df['publishedAt']), row_wise(df['publishedAt'], ref.get_publish_hour))
+
+
+def test_curr_subs_num(df):
+    assert_same(transforms.curr_subs_num(df['curr_subs']), row_wise(df, ref.convert_curr_subs, ['curr_subs']))
+
+
+def test_curr_subs_cat(df):
+    num = transforms.curr_subs_num(df['curr_subs'])
+    assert_same(transforms.curr_subs_cat(num), row_wise(num, ref.curr_subs_cat))
+
+
+def test_channel_type(df):
+    assert_same(transforms.channel_type(df['channel_type'], df['categoryIdName']),
+                row_wise(df, ref.fill_missing_channel_type, ['channel_type', 'categoryIdName']))
+
+
+####### Missing values
+def test_missing_dates():
+    trending = pd.Series([pd.NaT, pd.Timestamp('2020-07-09 20:00', tz='UTC'), pd.Timestamp('2020-07-09 20:00', tz='UTC')])
+    published = pd.Series([pd.Timestamp('2020-07-08 10:50', tz='UTC'), pd.NaT, pd.Timestamp('2020-07-08 10:50', tz='UTC')])
+    assert_same(transforms.time_to_trend(trending, published), row_wise(trending - published, ref.days_hours_minutes))
+    assert_same(transforms.publish_cat(published), row_wise(published, ref.get_publish_hour))
+
+
+def test_missing_subscribers_and_types():
+    num = pd.Series([np.nan, -1, 500000, 500001, 10000001])
+    assert_same(transforms.curr_subs_cat(num), row_wise(num, ref.curr_subs_cat))
+
+    df = pd.DataFrame({'channel_type': [np.nan, '', 'Music'], 'categoryIdName': ['Gaming', np.nan, np.nan]})
+    assert_same(transforms.channel_type(df['channel_type'], df['categoryIdName']),
+                row_wise(df, ref.fill_missing_channel_type, ['channel_type', 'categoryIdName']))
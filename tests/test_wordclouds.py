@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import wait
+
+import flask
+import pytest
+from werkzeug.exceptions import NotFound
+
+import wordclouds
+from wordclouds import WordCloudRenderer
+
+
+DAYS = ['2020-07-08', '2020-07-09']
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    renderer = WordCloudRenderer(str(tmp_path), 3, workers=1, max_files=2)
+    yield renderer
+    renderer.shutdown()
+
+
+def test_key_has_version(tmp_path, renderer):
+    key = renderer.key('title', DAYS)
+    assert key.startswith('3-')
+    other = WordCloudRenderer(str(tmp_path), 4, workers=1)
+    assert other.key('title', DAYS) != key
+    assert other.key('title', DAYS)[2:] == key[2:]
+
+
+def test_older_versions_purged_on_start(tmp_path):
+    for name in ['2-old.jpg', '3-current.jpg']:
+        (tmp_path / name).write_bytes(b'jpg')
+    WordCloudRenderer(str(tmp_path), 3, workers=1)
+    assert sorted(os.listdir(str(tmp_path))) == ['3-current.jpg']
+
+
+def test_ready_image_is_not_rendered(renderer):
+    key = renderer.key('tags', DAYS)
+    open(renderer.path(key), 'wb').close()
+    frequencies = pytest.fail
+    assert renderer.src('tags', DAYS, frequencies) == ('ready', wordclouds.ROUTE + key)
+
+
+def wait_renders(renderer):
+    wait(list(renderer.pending.values()))
+    deadline = time.time() + 10
+    while renderer.pending and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_no_words(renderer):
+    # nothing to draw, known without rendering
+    assert renderer.src('title', DAYS, dict) == ('empty', None)
+    assert renderer.pool is None
+    assert renderer.src('title', DAYS, pytest.fail) == ('empty', None)
+
+
+def broken_render(frequencies, icon_name, path):
+    raise RuntimeError('stylecloud failed')
+
+
+def placeholder_render(frequencies, icon_name, path):
+    with open(path, 'wb') as f:
+        f.write(b'jpg')
+
+
+def test_failed_render_is_retried(renderer, monkeypatch, caplog):
+    monkeypatch.setattr(wordclouds, 'render', broken_render)
+    assert renderer.src('title', DAYS, lambda: {'word': 3}) == ('pending', None)
+    wait_renders(renderer)
+    assert 'failed to render' in caplog.text
+    # logged, not remembered: the next poll queues it again
+    monkeypatch.setattr(wordclouds, 'render', placeholder_render)
+    assert renderer.src('title', DAYS, lambda: {'word': 3}) == ('pending', None)
+    wait_renders(renderer)
+    key = renderer.key('title', DAYS)
+    assert renderer.src('title', DAYS, pytest.fail) == ('ready', wordclouds.ROUTE + key)
+
+
+def test_least_recently_used_evicted(renderer):
+    keys = [renderer.key(field, DAYS) for field in ['title', 'desc', 'tags']]
+    for mtime, key in enumerate(keys):
+        open(renderer.path(key), 'wb').close()
+        os.utime(renderer.path(key), (mtime, mtime))
+    # title is used again, desc is now the oldest image
+    renderer.src('title', DAYS, dict)
+    renderer._evict_files()
+    assert sorted(os.listdir(renderer.cache_dir)) == sorted([keys[0] + '.jpg', keys[2] + '.jpg'])
+
+
+def test_serve_only_current_keys(tmp_path, renderer):
+    key = renderer.key('title', DAYS)
+    open(renderer.path(key), 'wb').close()
+    (tmp_path / ('2-' + key[2:] + '.jpg')).write_bytes(b'jpg')
+    with flask.Flask(__name__).test_request_context():
+        assert renderer.serve(key).status_code == 200
+        for bad in ['2-' + key[2:], '../' + key, renderer.key('desc', DAYS)]:
+            with pytest.raises(NotFound):
+                renderer.serve(bad)
+
+
+def test_forked_process_starts_without_pool(renderer):
+    renderer.src('title', DAYS, lambda: {'word': 3})
+    assert renderer.pool is not None
+    pid = os.fork()
+    if pid == 0:
+        # a gunicorn worker, or a rendering process of the pool itself
+        os._exit(0 if renderer.pool is None and renderer.pending == {} else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0